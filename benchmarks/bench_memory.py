@@ -0,0 +1,75 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from harness import Benchmark, make_gameboy
+
+OPS = 50000
+
+# Region name, first address, number of bytes exercised
+REGIONS = (
+    ('rom', 0x0150, 0x100),
+    ('vram', 0x8000, 0x100),
+    ('wram', 0xC000, 0x100),
+    ('echo', 0xE000, 0x100),
+    ('oam', 0xFE00, 0xA0),
+    ('io', 0xFF40, 0x0C),
+    ('hram', 0xFF80, 0x7E),
+)
+
+
+def get_benchmarks(roms, quick=False):
+    """
+    MemoryPool reads and writes by region
+    """
+    ops = OPS // 4 if quick else OPS
+    memory = make_gameboy(roms['load']).memory
+    benchmarks = []
+    for region, start, size in REGIONS:
+        # Shorts stay inside the region
+        addresses = [start + i % (size - 1) for i in range(ops)]
+
+        def read_byte(addresses=addresses, read=memory.read_byte):
+            for address in addresses:
+                read(address)
+            return len(addresses)
+
+        def read_short(addresses=addresses, read=memory.read_short):
+            for address in addresses:
+                read(address)
+            return len(addresses)
+
+        benchmarks.append(Benchmark('memory.read_byte.{}'.format(region), 'ops/s', read_byte))
+        benchmarks.append(Benchmark('memory.read_short.{}'.format(region), 'ops/s', read_short))
+
+        if region not in ('rom', 'io'):
+            # Writing rom or the I/O registers would change what the other benchmarks measure
+            def write_byte(addresses=addresses, write=memory.write_byte):
+                for address in addresses:
+                    write(address, address & 0xFF)
+                return len(addresses)
+
+            benchmarks.append(Benchmark('memory.write_byte.{}'.format(region), 'ops/s', write_byte))
+    return benchmarks
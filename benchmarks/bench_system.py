@@ -0,0 +1,45 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from harness import Benchmark, make_gameboy
+
+FRAMES = 4
+
+
+def get_benchmarks(roms, quick=False):
+    """
+    Whole machine frames per second, each synthetic rom
+    """
+    frames = 1 if quick else FRAMES
+    benchmarks = []
+    for name, path in sorted(roms.items()):
+        gb = make_gameboy(path)
+
+        def run(gb=gb):
+            return gb.run_frames(frames).frames
+
+        benchmarks.append(Benchmark('system.frames.{}'.format(name), 'frames/s', run))
+    return benchmarks
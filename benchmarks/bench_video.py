@@ -0,0 +1,83 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from harness import Benchmark, make_gameboy
+
+FRAMES = 20
+LINES = 2000
+
+
+def fill_sprites(memory):
+    """
+    40 sprites with tile data, spread over the screen so every line draws some
+    """
+    mem = memory.mem
+    for i in range(0x8000, 0x8800):
+        mem[i] = (i * 37) & 0xFF
+    for sprite in range(40):
+        base = 0xFE00 + sprite * 4
+        mem[base] = 16 + (sprite * 4) % 144
+        mem[base + 1] = 8 + (sprite * 17) % 160
+        mem[base + 2] = sprite
+        mem[base + 3] = (sprite & 3) << 5
+    memory.oam_dirty = True
+
+
+def get_benchmarks(roms, quick=False):
+    """
+    The video on its own: scanline rendering, and whole frames of video events without the CPU
+    """
+    frames = FRAMES // 4 if quick else FRAMES
+    lines = LINES // 4 if quick else LINES
+    benchmarks = []
+
+    for name, sprites in (('empty', False), ('sprites', True)):
+        gb = make_gameboy(roms['load'])
+        if sprites:
+            fill_sprites(gb.memory)
+        # Sprites on (bit 1)
+        gb.memory.mem[0xFF40] = 0x93
+        video = gb.video
+
+        def render(video=video):
+            for i in range(lines):
+                video.mode_LY_counter = i % 144
+                video.render_scanline()
+            return lines
+
+        def events(gb=gb):
+            # Jump the clock from event to event, as if the CPU ran straight through to each one
+            cpu = gb.cpu
+            scheduler = gb.scheduler
+            target = gb.video.frame_count + frames
+            while gb.video.frame_count < target:
+                cpu.cycles = scheduler.deadline
+                scheduler.run_due(cpu.cycles)
+            return frames
+
+        benchmarks.append(Benchmark('video.render_scanline.{}'.format(name), 'lines/s', render))
+        benchmarks.append(Benchmark('video.frame_events.{}'.format(name), 'frames/s', events))
+    return benchmarks
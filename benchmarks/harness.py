@@ -0,0 +1,79 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import os
+import sys
+import time
+import contextlib
+
+# The benchmarks run from a checkout, without pygb being installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pygb.utility import GBTypes
+
+
+class Benchmark:
+    """
+    A named measurement. The callable does one round of work and returns how many operations it did.
+    """
+    def __init__(self, name, unit, func):
+        self.name = name
+        self.unit = unit
+        self.func = func
+
+    def measure(self, repeats):
+        """
+        Run the benchmark several times
+        :return: Dict with the best and median rate in operations per second
+        """
+        # One unmeasured round first, so caches and lazily built tables do not count against the first round
+        self.func()
+        rates = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            ops = self.func()
+            elapsed = time.perf_counter() - start
+            rates.append(ops / elapsed if elapsed > 0 else 0.0)
+        rates.sort()
+        return {
+            'unit': self.unit,
+            'best': rates[-1],
+            'median': rates[len(rates) // 2],
+            'repeats': repeats,
+        }
+
+
+def make_gameboy(rom_path):
+    """
+    A GameBoy with the rom loaded, its header print out suppressed
+    """
+    from pygb.gameboy import GameBoy
+
+    gb = GameBoy(GBTypes.gameboy_classic)
+    with contextlib.redirect_stdout(io.StringIO()):
+        gb.load_rom(rom_path)
+    return gb
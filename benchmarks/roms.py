@@ -0,0 +1,96 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import tempfile
+
+# Sets up the import path before pygb is imported
+import harness
+
+from pygb.cpu.assembler import build_rom
+
+
+def loop(body, repeat=16):
+    """
+    Repeat the body, then jump back to the start
+    """
+    return 'start:\n' + body * repeat + '    JP start\n'
+
+
+# Synthetic instruction mixes, from the instructions the CPU implements
+MIXES = {
+    'load': loop("""
+    LD B, A
+    LD C, B
+    LD D, C
+    LD E, D
+    LD H, E
+    LD L, H
+    LD A, L
+"""),
+
+    'alu': loop("""
+    XOR A
+    INC A
+    DEC B
+    INC C
+    XOR B
+    CP 0x10
+    XOR 0x55
+"""),
+
+    'memory': loop("""
+    LD HL, 0xC000
+    LD (HL), B
+    LD A, (HL)
+    INC (HL)
+    LD (HL), 0x42
+    LDH (0xFF00+0x80), A
+    LDH A, (0xFF00+0x80)
+    LD A, 0xC100
+"""),
+
+    'branch': loop("""
+    LD B, 16
+    DEC B
+    JR NZ, 0xFD
+""", 4),
+}
+
+
+def write_roms(directory=None):
+    """
+    Assemble and write a rom for every mix
+    :return: Dict of mix name to rom path
+    """
+    directory = directory or tempfile.mkdtemp(prefix='pygb-bench-')
+    paths = {}
+    for name, source in sorted(MIXES.items()):
+        path = os.path.join(directory, '{}.gb'.format(name))
+        with open(path, 'wb') as f:
+            f.write(build_rom(source, title=name))
+        paths[name] = path
+    return paths
@@ -0,0 +1,164 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+
+import harness
+import roms
+import bench_cpu
+import bench_memory
+import bench_video
+import bench_system
+
+SUITES = {
+    'cpu': bench_cpu,
+    'memory': bench_memory,
+    'video': bench_video,
+    'system': bench_system,
+}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Report fields which have to match the baseline for the rates to be comparable
+COMPARABLE_FIELDS = ('quick', 'implementation', 'python', 'machine', 'host')
+
+
+def run_suites(names, quick, repeats, pattern=''):
+    rom_dir = None
+    results = {}
+    try:
+        paths = roms.write_roms()
+        rom_dir = os.path.dirname(next(iter(paths.values())))
+        for name in names:
+            for benchmark in SUITES[name].get_benchmarks(paths, quick):
+                if pattern not in benchmark.name:
+                    continue
+                results[benchmark.name] = benchmark.measure(repeats)
+                print('{:<40} {:>14.1f} {}'.format(benchmark.name, results[benchmark.name]['best'],
+                                                   benchmark.unit), file=sys.stderr)
+    finally:
+        if rom_dir is not None:
+            shutil.rmtree(rom_dir, ignore_errors=True)
+    return results
+
+
+def get_mismatch(report, baseline):
+    """
+    Rates from a quick run, another interpreter or another host can not be compared against each other
+    :return: Description of the first field which differs from the baseline, or None if they are comparable
+    """
+    for field in COMPARABLE_FIELDS:
+        if report.get(field) != baseline.get(field):
+            return '{} is {} but the baseline has {}'.format(field, report.get(field), baseline.get(field))
+    return None
+
+
+def compare(results, baseline, threshold=None):
+    """
+    Compare the best rates against a baseline
+    :param threshold: Fraction slower than the baseline which counts as a regression, None to only report ratios
+    :return: List of (name, baseline rate, rate, ratio) for every regression
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        base = baseline[name]['best']
+        ratio = result['best'] / base if base else 1.0
+        print('{:<40} {:>7.1%} of baseline'.format(name, ratio), file=sys.stderr)
+        if threshold is not None and ratio < 1.0 - threshold:
+            regressions.append((name, base, result['best'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure pygb hot path throughput.')
+    parser.add_argument('--suite', dest='suites', action='append', choices=sorted(SUITES),
+                        help='Suite to run, may be repeated. Every suite by default.')
+    parser.add_argument('--filter', dest='filter', action='store', default='',
+                        help='Only run benchmarks whose name contains this')
+    parser.add_argument('--quick', dest='quick', action='store_true', help='Less work per round, for smoke runs')
+    parser.add_argument('--repeats', dest='repeats', action='store', type=int, default=5,
+                        help='Rounds per benchmark, the best is kept')
+    parser.add_argument('--output', dest='output', action='store', default='',
+                        help='Write the JSON results here instead of stdout')
+    parser.add_argument('--baseline', dest='baseline', action='store', default=DEFAULT_BASELINE,
+                        help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', dest='threshold', action='store', type=float, default=None,
+                        help='Fraction slower than the baseline which fails the run, e.g. 0.1. Without it the ratios '
+                             'to the baseline are only reported')
+    parser.add_argument('--save-baseline', dest='save_baseline', action='store_true',
+                        help='Store the results as the new baseline instead of comparing')
+    args = parser.parse_args(argv)
+
+    # Tracing would dominate every measurement
+    import pygb.settings
+    pygb.settings.DEBUG = False
+
+    results = run_suites(args.suites or sorted(SUITES), args.quick, args.repeats, args.filter)
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'host': platform.node(),
+        'quick': args.quick,
+        'results': results,
+    }
+
+    if len(args.output) > 0:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        return 0
+
+    if not os.path.isfile(args.baseline):
+        print('No baseline at {}, nothing to compare'.format(args.baseline), file=sys.stderr)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    mismatch = get_mismatch(report, baseline)
+    if mismatch is not None:
+        print('Not comparing against {}: {}'.format(args.baseline, mismatch), file=sys.stderr)
+        return 0
+    regressions = compare(results, baseline['results'], args.threshold)
+    for name, base, rate, ratio in regressions:
+        print('REGRESSION {}: {:.1f} -> {:.1f} ({:.1%})'.format(name, base, rate, ratio), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
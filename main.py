@@ -25,14 +25,37 @@ SOFTWARE.
 """
 
 import os
+import sys
 import argparse
+import contextlib
 
-from pygb.utility import GBTypes
-from pygb.gameboy import GameBoy
+import pygb.settings
 
 parser = argparse.ArgumentParser(description='Process some integers.')
 parser.add_argument('--rom', dest='rom', action='store', default='',
                     help='The rom to load')
+parser.add_argument('--movie', dest='movie', action='store', default='',
+                    help='Play back this input movie file')
+parser.add_argument('--link-listen', dest='link_listen', action='store', default='',
+                    help='Wait for another pygb to connect a link cable on this Unix socket path')
+parser.add_argument('--link-connect', dest='link_connect', action='store', default='',
+                    help='Connect a link cable to another pygb listening on this Unix socket path')
+parser.add_argument('--wav', dest='wav', action='store', default='',
+                    help='Record the audio to this WAV file')
+parser.add_argument('--raw-audio', dest='raw_audio', action='store', default='',
+                    help='Stream raw s16le stereo audio to this file or pipe, - for stdout')
+parser.add_argument('--sample-rate', dest='sample_rate', action='store', type=int, default=44100,
+                    choices=[44100, 48000], help='The audio output sample rate')
+parser.add_argument('--speed', dest='speed', action='store', type=float, default=1.0,
+                    help='Emulation speed as a multiple of real time, above 1 for turbo, 0 for uncapped')
+parser.add_argument('--profile', dest='profile', action='store', default='',
+                    help='Profile the rom, writing collapsed stacks here and a report on exit')
+parser.add_argument('--sym', dest='sym', action='store', default='',
+                    help='RGBDS or no$gmb .sym file to name functions in the profile')
+parser.add_argument('--state-hash', dest='state_hash', action='store', default='',
+                    help='Write a digest of the machine state every frame to this file')
+parser.add_argument('--no-cache', dest='no_cache', action='store_true',
+                    help='Do not reuse or store rom analysis in the artefact cache')
 args = parser.parse_args()
 
 
@@ -41,9 +64,84 @@ def main():
     Create a gameboy object, load the rom, and run the CPU
     """
     if len(args.rom) > 0 and os.path.isfile(args.rom):
-        gb = GameBoy(GBTypes.gameboy_classic)
-        gb.load_rom(args.rom)
+        with contextlib.ExitStack() as stack:
+            audio_stream = None
+            if args.raw_audio == '-':
+                # Stdout carries the audio, so the instruction trace is off and any other text goes to stderr. This
+                # has to happen before the emulator is imported, the memory map is printed on import.
+                pygb.settings.DEBUG = False
+                audio_stream = sys.stdout.buffer
+                stack.enter_context(contextlib.redirect_stdout(sys.stderr))
+            run(audio_stream)
+
+
+def run(audio_stream):
+    """
+    :param audio_stream: Binary stream for the raw audio, None to open args.raw_audio
+    """
+    from pygb.utility import GBTypes
+    from pygb.gameboy import GameBoy
+    from pygb.sound.sink import WavSink, PipeSink
+    from pygb.serial.link import StreamLink
+    from pygb.statehash import StateHasher
+    from pygb.pacing import FramePacer
+    from pygb.profiler import Profiler, SymbolTable
+    from pygb.cache import ArtefactCache
+
+    gb = GameBoy(GBTypes.gameboy_classic, None if args.no_cache else ArtefactCache())
+    gb.load_rom(args.rom)
+
+    if len(args.movie) > 0:
+        gb.joypad.play(args.movie)
+
+    if len(args.link_listen) > 0:
+        gb.serial.connect(StreamLink.listen_unix(args.link_listen))
+    elif len(args.link_connect) > 0:
+        gb.serial.connect(StreamLink.connect_unix(args.link_connect))
+
+    raw_stream = None
+    if len(args.wav) > 0:
+        gb.sound.sinks.append(WavSink(args.wav, gb.sound.sample_rate, args.sample_rate).start())
+    if len(args.raw_audio) > 0:
+        if audio_stream is None:
+            raw_stream = audio_stream = open(args.raw_audio, 'wb')
+        gb.sound.sinks.append(PipeSink(gb.sound.sample_rate, args.sample_rate, audio_stream).start())
+
+    # Added after the other frame handlers, a frame is only waited on once its audio and input are handled
+    FramePacer(gb.video, args.speed).attach()
+
+    hash_stream = None
+    hasher = None
+    if len(args.state_hash) > 0:
+        hash_stream = open(args.state_hash, 'wb')
+        hasher = StateHasher(gb, hash_stream).attach()
+
+    profiler = None
+    if len(args.profile) > 0:
+        if len(args.sym) > 0:
+            symbols = SymbolTable.load(args.sym)
+        else:
+            # Without a .sym file the functions found by static analysis are named after their location
+            symbols = SymbolTable()
+            symbols.parse(gb.get_disassembly().get_symbols())
+        profiler = Profiler(gb, symbols=symbols).attach()
+
+    try:
         gb.run_cpu()
+    finally:
+        if profiler is not None:
+            profiler.detach()
+            print(profiler.format_flat())
+            profiler.write_collapsed(args.profile)
+        if hasher is not None:
+            hasher.detach()
+            hash_stream.close()
+        for sink in gb.sound.sinks:
+            sink.close()
+        if gb.serial.link is not None:
+            gb.serial.link.close()
+        if raw_stream is not None:
+            raw_stream.close()
 
 
 if __name__ == '__main__':
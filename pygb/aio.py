@@ -0,0 +1,209 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+
+from pygb.pacing import FramePacer
+
+
+class Subscription:
+    """
+    Async iterator over what a session produces. A bounded queue where the oldest item is dropped when a consumer
+    falls behind, so a slow consumer never holds up the emulation.
+    """
+    _END = object()
+
+    def __init__(self, owner, max_size):
+        self.owner = owner
+        self.queue = asyncio.Queue(max_size)
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        if self.closed:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+    def end(self):
+        """
+        Called by the session when it stops, iteration ends once the queued items are consumed
+        """
+        self.put(self._END)
+        self.closed = True
+
+    def close(self):
+        """
+        Stop receiving items
+        """
+        self.closed = True
+        self.owner.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self.queue.get()
+        if item is self._END:
+            raise StopAsyncIteration
+        return item
+
+
+class AsyncGameBoy:
+    """
+    Runs a GameBoy on an asyncio event loop, a slice at a time. Control goes back to the loop after every slice, so
+    any number of sessions share one thread and take turns in the order they became ready.
+    Real-time pacing awaits instead of sleeping, the other sessions run while this one waits for its next frame.
+    """
+    def __init__(self, gb, speed=1.0, frames_per_slice=1, cycles_per_slice=None, queue_size=4):
+        """
+        :param gb: The GameBoy, with a rom loaded
+        :param speed: Multiple of real time, FramePacer.UNCAPPED to only yield between slices
+        :param frames_per_slice: Frames to run between await points
+        :param cycles_per_slice: Run this many cycles per slice instead of whole frames
+        :param queue_size: Frames or audio chunks a subscriber can fall behind by before the oldest are dropped
+        """
+        self.gb = gb
+        self.frames_per_slice = frames_per_slice
+        self.cycles_per_slice = cycles_per_slice
+        self.queue_size = queue_size
+
+        # Buttons bitmasks, one is applied at every slice boundary so quick presses are not lost
+        self.input_queue = asyncio.Queue()
+
+        self.frame_subscribers = []
+        self.audio_subscribers = []
+
+        # The pacer reports how long it wants to sleep, and the wait is awaited after the slice
+        self.pending_sleep = 0.0
+        self.pacer = FramePacer(gb.video, speed, sleep=self.defer_sleep)
+
+        self.running = False
+        self.stop_requested = False
+
+    def defer_sleep(self, seconds):
+        # Within a slice the last frame's wait covers the ones before it
+        self.pending_sleep = seconds
+
+    def set_speed(self, speed):
+        self.pacer.set_speed(speed)
+
+    def send_input(self, buttons):
+        """
+        Queue a new set of held buttons
+        :param buttons: Buttons bitmask
+        """
+        self.input_queue.put_nowait(buttons)
+
+    def frames(self):
+        """
+        :return: Async iterator of the front buffer as bytes, one per completed frame
+        """
+        subscription = Subscription(self, self.queue_size)
+        self.frame_subscribers.append(subscription)
+        return subscription
+
+    def audio(self):
+        """
+        :return: Async iterator of each frame's interleaved stereo samples, as produced by Sound.end_frame
+        """
+        subscription = Subscription(self, self.queue_size)
+        self.audio_subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for subscribers in (self.frame_subscribers, self.audio_subscribers):
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+
+    def publish_frame(self):
+        if self.frame_subscribers:
+            frame = bytes(self.gb.video.front_buffer)
+            for subscription in self.frame_subscribers:
+                subscription.put(frame)
+
+    def write_frame(self, samples):
+        """
+        Audio sink interface, called by Sound.end_frame
+        """
+        for subscription in self.audio_subscribers:
+            subscription.put(samples)
+
+    def stop(self):
+        """
+        Stop the run loop at the next slice boundary
+        """
+        self.stop_requested = True
+
+    async def run(self, max_frames=None):
+        """
+        Run until stopped, or for max_frames frames
+        :return: Total frames run
+        """
+        if self.running:
+            raise RuntimeError('AsyncGameBoy is already running')
+        gb = self.gb
+        self.running = True
+        self.stop_requested = False
+        gb.video.frame_handlers.append(self.publish_frame)
+        gb.sound.sinks.append(self)
+        self.pacer.attach()
+        frames = 0
+        try:
+            while not self.stop_requested and (max_frames is None or frames < max_frames):
+                if not self.input_queue.empty():
+                    gb.joypad.set_buttons(self.input_queue.get_nowait())
+
+                if self.cycles_per_slice is not None:
+                    result = gb.run_cycles(self.cycles_per_slice)
+                else:
+                    count = self.frames_per_slice
+                    if max_frames is not None:
+                        count = min(count, max_frames - frames)
+                    result = gb.run_frames(count)
+                frames += result.frames
+
+                delay = self.pending_sleep
+                self.pending_sleep = 0.0
+                await asyncio.sleep(delay)
+        finally:
+            self.pacer.detach()
+            gb.sound.sinks.remove(self)
+            gb.video.frame_handlers.remove(self.publish_frame)
+            for subscription in self.frame_subscribers + self.audio_subscribers:
+                subscription.end()
+            self.frame_subscribers = []
+            self.audio_subscribers = []
+            self.running = False
+        return frames
+
+    def close(self):
+        """
+        Audio sink interface, the session does not own the GameBoy so there is nothing to release
+        """
+        pass
@@ -0,0 +1,357 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+import pygb.settings
+from pygb.utility import GBTypes
+from pygb.serial.link import CaptureLink
+from pygb.sound.sink import WavSink
+
+
+class BatchJob:
+    """
+    A rom to run and when to stop it. Only plain values are held so jobs pickle cheaply to the workers.
+    """
+    def __init__(self, rom, max_frames=None, max_cycles=None, max_seconds=None, movie=None, outputs=None,
+                 gb_type=GBTypes.gameboy_classic, job_id=None):
+        self.rom = rom
+        self.max_frames = max_frames
+        self.max_cycles = max_cycles
+        self.max_seconds = max_seconds
+        self.movie = movie
+
+        # Files to write when the job ends: 'state' (save state), 'screen' (raw front buffer), 'wav' (audio)
+        self.outputs = outputs or {}
+
+        self.gb_type = gb_type
+        self.job_id = job_id if job_id is not None else rom
+
+    @staticmethod
+    def from_dict(values):
+        return BatchJob(**values)
+
+
+class BatchResult:
+    """
+    The outcome and metrics of a job
+    """
+    STATUS_OK = 'ok'
+    STATUS_ERROR = 'error'
+    STATUS_CRASHED = 'crashed'
+
+    def __init__(self, job_id, rom):
+        self.job_id = job_id
+        self.rom = rom
+        self.status = self.STATUS_OK
+        self.stop_reason = None
+        self.error = None
+        self.frames = 0
+        self.cycles = 0
+        self.instructions = 0
+        self.seconds = 0.0
+        self.serial = ''
+        self.log = ''
+
+    def get_cycles_per_second(self):
+        return self.cycles / self.seconds if self.seconds else 0.0
+
+    def get_instructions_per_second(self):
+        return self.instructions / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        values = dict(self.__dict__)
+        values['cycles_per_second'] = self.get_cycles_per_second()
+        values['instructions_per_second'] = self.get_instructions_per_second()
+        return values
+
+    @classmethod
+    def crashed(cls, job):
+        """
+        :return: The result of a job whose worker process died
+        """
+        result = cls(job.job_id, job.rom)
+        result.status = cls.STATUS_CRASHED
+        result.stop_reason = 'crashed'
+        result.error = 'Worker process died'
+        return result
+
+
+class BatchException(Exception):
+    """
+    Batch runner exception
+    """
+    pass
+
+
+# Each worker process builds one GameBoy and resets it for every job it runs
+_worker_gb = None
+
+# Shared with run_batch, a job index is flagged here once a worker has picked the job up
+_worker_started = None
+
+
+def init_worker(started=None):
+    """
+    Pool initializer. Batch runs are long and headless, never trace instructions.
+    :param started: Shared byte array to flag the jobs this worker starts in
+    """
+    global _worker_started
+    pygb.settings.DEBUG = False
+    _worker_started = started
+
+
+def run_started(runner, index, job):
+    """
+    Flag the job as started before running it, so if the worker dies the jobs which were only queued are known
+    """
+    _worker_started[index] = 1
+    return runner(job)
+
+
+def get_worker_gameboy(gb_type):
+    global _worker_gb
+    if _worker_gb is None:
+        from pygb.gameboy import GameBoy
+        _worker_gb = GameBoy(gb_type)
+    _worker_gb.game_boy_type = gb_type
+    return _worker_gb
+
+
+def run_job(job):
+    """
+    Run a single job in this process. Exceptions raised by the emulator end the job, they are not propagated.
+    :param job: BatchJob
+    :return: BatchResult
+    """
+    result = BatchResult(job.job_id, job.rom)
+    log = io.StringIO()
+    start_time = time.perf_counter()
+    gb = None
+    try:
+        with contextlib.redirect_stdout(log):
+            gb = get_worker_gameboy(job.gb_type)
+            gb.load_rom(job.rom)
+
+            capture = gb.serial.connect(CaptureLink())
+            if job.movie:
+                gb.joypad.play(job.movie)
+            if 'wav' in job.outputs:
+                gb.sound.sinks.append(WavSink(job.outputs['wav'], gb.sound.sample_rate).start())
+
+            try:
+                run_limited(gb, job, result, start_time)
+            finally:
+                result.serial = capture.get_text()
+            write_outputs(gb, job)
+    except Exception as e:
+        result.status = BatchResult.STATUS_ERROR
+        result.stop_reason = 'error'
+        result.error = '{}: {}'.format(type(e).__name__, e)
+    finally:
+        if gb is not None:
+            detach(gb)
+    result.seconds = time.perf_counter() - start_time
+    result.log = log.getvalue()
+    return result
+
+
+def run_limited(gb, job, result, start_time):
+    """
+    Run until one of the job limits is hit. The wall clock is only looked at on frame boundaries.
+    """
+    timed_out = None
+    if job.max_seconds:
+        deadline = start_time + job.max_seconds
+
+        def timed_out(game_boy):
+            return time.perf_counter() >= deadline
+
+    instructions = gb.cpu.instructions
+    run = gb.run(max_cycles=job.max_cycles, max_frames=job.max_frames, predicate=timed_out)
+    result.instructions = gb.cpu.instructions - instructions
+    result.cycles = run.cycles
+    result.frames = run.frames
+    result.stop_reason = 'timeout' if run.stop_reason == run.STOP_PREDICATE else run.stop_reason
+
+
+def write_outputs(gb, job):
+    if 'state' in job.outputs:
+        with open(job.outputs['state'], 'wb') as f:
+            f.write(gb.save_state())
+    if 'screen' in job.outputs:
+        with open(job.outputs['screen'], 'wb') as f:
+            f.write(gb.video.front_buffer)
+
+
+def detach(gb):
+    """
+    Unplug everything a job attached, so the next job starts clean
+    """
+    for sink in gb.sound.sinks:
+        sink.close()
+    del gb.sound.sinks[:]
+    gb.serial.connect(None)
+    if gb.joypad.movie is not None:
+        gb.joypad.movie.close()
+        gb.joypad.movie = None
+
+
+def run_batch(jobs, workers=None, max_retries=1, runner=run_job, result_type=BatchResult):
+    """
+    Spread jobs across a pool of worker processes. When a worker dies the jobs lost with it go to a new pool of the
+    same size. Only a job which was running when two pools broke is run on its own, to find out if it is the crasher.
+    :param jobs: Iterable of BatchJob
+    :param workers: Number of processes, defaults to the CPU count
+    :param max_retries: How many times a job run on its own is re-run after its worker process died
+    :param runner: Module level callable(job) returning a result, run in the workers
+    :param result_type: BatchResult class whose crashed() makes the result of a job lost with its worker
+    :return: List of results, in job order
+    """
+    jobs = list(jobs)
+    results = [None] * len(jobs)
+
+    # Times each job was running in a pool when it broke
+    suspected = [0] * len(jobs)
+
+    pending = list(range(len(jobs)))
+    while pending:
+        broken, started = run_pool(jobs, pending, workers, runner, results)
+        pending = []
+        for index in broken:
+            if started[index]:
+                suspected[index] += 1
+                if suspected[index] > 1:
+                    # It broke a second pool, run it alone so a crash can only be its own
+                    results[index] = run_isolated(jobs[index], max_retries, runner, result_type)
+                    continue
+            # Queued jobs lost with the pool were never run, they go back in a full pool uncharged
+            pending.append(index)
+    return results
+
+
+def run_pool(jobs, indices, workers, runner, results):
+    """
+    Run jobs in a fresh pool, storing the results of the ones which complete
+    :return: (indices of the jobs lost when a worker died, per job flags of the jobs a worker had started)
+    """
+    started = multiprocessing.RawArray('B', len(jobs))
+    broken = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                                initargs=(started,)) as pool:
+        futures = {pool.submit(run_started, runner, index, jobs[index]): index for index in indices}
+        for future in concurrent.futures.as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except BrokenProcessPool:
+                broken.append(index)
+    return sorted(broken), started
+
+
+def run_isolated(job, max_retries, runner, result_type):
+    """
+    Run a job alone in its own worker process, so a crash can only be the fault of this job
+    :return: The job result, or result_type.crashed(job) once the job has crashed more than max_retries times
+    """
+    for _ in range(max_retries + 1):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, initializer=init_worker) as pool:
+            try:
+                return pool.submit(runner, job).result()
+            except BrokenProcessPool:
+                pass
+    return result_type.crashed(job)
+
+
+def find_roms(paths):
+    """
+    Expand directories into the rom files inside them
+    """
+    roms = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                roms.extend(os.path.join(root, name) for name in sorted(files)
+                            if name.lower().endswith(('.gb', '.gbc', '.sgb')))
+        else:
+            roms.append(path)
+    return roms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run many roms in parallel worker processes.')
+    parser.add_argument('roms', nargs='*', help='Rom files or directories of roms')
+    parser.add_argument('--jobs', dest='jobs', action='store', default='',
+                        help='JSON file with a list of job objects (rom, max_frames, max_cycles, movie, outputs, ...)')
+    parser.add_argument('--frames', dest='frames', action='store', type=int, default=None,
+                        help='Frame limit for roms given on the command line')
+    parser.add_argument('--cycles', dest='cycles', action='store', type=int, default=None,
+                        help='Cycle limit for roms given on the command line')
+    parser.add_argument('--seconds', dest='seconds', action='store', type=float, default=None,
+                        help='Wall clock limit per rom given on the command line')
+    parser.add_argument('--workers', dest='workers', action='store', type=int, default=None,
+                        help='Number of worker processes')
+    parser.add_argument('--output', dest='output', action='store', default='',
+                        help='Write the JSON results here instead of stdout')
+    args = parser.parse_args(argv)
+
+    pygb.settings.DEBUG = False
+
+    jobs = []
+    if len(args.jobs) > 0:
+        with open(args.jobs) as f:
+            jobs.extend(BatchJob.from_dict(values) for values in json.load(f))
+    for rom in find_roms(args.roms):
+        jobs.append(BatchJob(rom, args.frames, args.cycles, args.seconds))
+
+    if not jobs:
+        parser.error('No roms or jobs given')
+    for job in jobs:
+        if job.max_frames is None and job.max_cycles is None and job.max_seconds is None:
+            raise BatchException('Job {} has no frame, cycle or time limit'.format(job.job_id))
+
+    results = [result.to_dict() for result in run_batch(jobs, args.workers)]
+    if len(args.output) > 0:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    return 0 if all(result['status'] == BatchResult.STATUS_OK for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
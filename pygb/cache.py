@@ -0,0 +1,181 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import pickle
+import hashlib
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on Windows, concurrent evictions there may both delete the same old entries
+    fcntl = None
+
+
+def get_cache_dir():
+    """
+    :return: Directory for cached results, PYGB_CACHE_DIR or ~/.cache/pygb
+    """
+    return os.environ.get('PYGB_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'pygb')
+
+
+def get_rom_hash(rom):
+    """
+    :return: The hex sha1 of the rom bytes, which names its cache entries
+    """
+    return hashlib.sha1(rom).hexdigest()
+
+
+class ArtefactCache:
+    """
+    Per rom results which are slow to rebuild, a parsed header or a disassembly for instance, stored under
+    <root>/artefacts-v<VERSION>/<sha1 prefix>/<sha1>/<name>.pickle.
+    Files are written aside and renamed into place, so processes sharing the directory never read half an entry,
+    and a missing or damaged entry is only a miss. Reads bump the modification time, the oldest entries are
+    evicted once the total size passes max_bytes.
+    The total is counted once, then kept up to date as entries are stored, so the directory is only walked again
+    when it has to be trimmed. Stores by other processes are seen at the next walk.
+    """
+    VERSION = 1
+
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param root: Cache directory, get_cache_dir() if None
+        :param max_bytes: Size the cache is trimmed back to after a store
+        """
+        self.root = os.path.join(root or get_cache_dir(), 'artefacts-v{}'.format(self.VERSION))
+        self.max_bytes = max_bytes
+
+        # Size of every entry, None until the first store counts it
+        self.total_bytes = None
+
+    def get_path(self, rom_hash, name):
+        return os.path.join(self.root, rom_hash[:2], rom_hash, name + '.pickle')
+
+    def get(self, rom_hash, name):
+        """
+        :return: The stored object, None on a miss
+        """
+        path = self.get_path(rom_hash, name)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)
+            return value
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # Missing, evicted by another process, or written by an incompatible version
+            return None
+
+    def put(self, rom_hash, name, value):
+        path = self.get_path(rom_hash, name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            if self.total_bytes is None:
+                self.total_bytes = sum(entry[1] for entry in self.get_entries())
+            try:
+                # The entry being replaced no longer counts
+                self.total_bytes -= os.stat(path).st_size
+            except OSError:
+                pass
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.total_bytes += size
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def get_or_create(self, rom_hash, name, factory):
+        """
+        :param factory: Called with no arguments to build the value on a miss
+        :return: The cached or newly built value
+        """
+        value = self.get(rom_hash, name)
+        if value is None:
+            value = factory()
+            self.put(rom_hash, name, value)
+        return value
+
+    def get_entries(self):
+        """
+        :return: List of (modification time, size, path) of every entry
+        """
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith('.pickle'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in max_bytes.
+        Only one process evicts at a time, the others skip it.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, 'evict.lock'), 'wb') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+            entries = self.get_entries()
+            total = sum(entry[1] for entry in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+            self.total_bytes = total
+
+    def clear(self, rom_hash=None):
+        """
+        Remove the entries of one rom, or of every rom
+        """
+        for _, _, path in self.get_entries():
+            if rom_hash is None or os.path.basename(os.path.dirname(path)) == rom_hash:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        self.total_bytes = None
@@ -0,0 +1,476 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import re
+import functools
+from types import MappingProxyType
+
+from pygb.cpu.instructions.instructions import instructions
+from pygb.utility import RomInfo
+
+
+class AssemblerException(Exception):
+    """
+    Assembler exception, with the source line it happened on
+    """
+    def __init__(self, message, line_number=None, line=None):
+        if line_number is not None:
+            message = 'Line {}: {} ({})'.format(line_number, message, line.strip())
+        super().__init__(message)
+
+
+# Immediate placeholders, as written in Instruction.disassembly
+IMM8 = '0x%02X'
+IMM16 = '0x%04X'
+
+REGS8 = ('B', 'C', 'D', 'E', 'H', 'L', '(HL)', 'A')
+REGS16 = ('BC', 'DE', 'HL', 'SP')
+REGS16_STACK = ('BC', 'DE', 'HL', 'AF')
+CONDITIONS = ('NZ', 'Z', 'NC', 'C')
+ALU_OPS = ('ADD A, ', 'ADC A, ', 'SUB ', 'SBC A, ', 'AND ', 'XOR ', 'OR ', 'CP ')
+CB_OPS = ('RLC ', 'RRC ', 'RL ', 'RR ', 'SLA ', 'SRA ', 'SWAP ', 'SRL ')
+
+# Opcodes whose 8 bit operand is a signed offset from the next instruction
+RELATIVE_OPCODES = (0x18, 0x20, 0x28, 0x30, 0x38)
+
+CB_PREFIX = 0xCB
+
+
+def build_sm83_table():
+    """
+    The complete SM83 instruction set, written the way the disassembly strings are
+    :return: Dict of opcode to mnemonic template. CB prefixed opcodes are 0xCB00 + opcode.
+    """
+    table = {0x00: 'NOP', 0x10: 'STOP', 0x76: 'HALT', 0xF3: 'DI', 0xFB: 'EI',
+             0x07: 'RLCA', 0x0F: 'RRCA', 0x17: 'RLA', 0x1F: 'RRA',
+             0x27: 'DAA', 0x2F: 'CPL', 0x37: 'SCF', 0x3F: 'CCF',
+             0x02: 'LD (BC), A', 0x12: 'LD (DE), A', 0x22: 'LDI (HL), A', 0x32: 'LDD (HL), A',
+             0x0A: 'LD A, (BC)', 0x1A: 'LD A, (DE)', 0x2A: 'LDI A, (HL)', 0x3A: 'LDD A, (HL)',
+             0x08: 'LD (' + IMM16 + '), SP', 0x18: 'JR ' + IMM8,
+             0xC9: 'RET', 0xD9: 'RETI', 0xC3: 'JP ' + IMM16, 0xE9: 'JP (HL)', 0xCD: 'CALL ' + IMM16,
+             0xE0: 'LDH (0xFF00+' + IMM8 + '), A', 0xF0: 'LDH A, (0xFF00+' + IMM8 + ')',
+             0xE2: 'LD (0xFF00+C), A', 0xF2: 'LD A, (0xFF00+C)',
+             0xE8: 'ADD SP, ' + IMM8, 0xF8: 'LDHL SP, ' + IMM8, 0xF9: 'LD SP, HL',
+             0xEA: 'LD (' + IMM16 + '), A', 0xFA: 'LD A, (' + IMM16 + ')'}
+
+    for i, reg in enumerate(REGS8):
+        table[0x04 + i * 8] = 'INC ' + reg
+        table[0x05 + i * 8] = 'DEC ' + reg
+        table[0x06 + i * 8] = 'LD {}, {}'.format(reg, IMM8)
+        table[0xC6 + i * 8] = ALU_OPS[i] + IMM8
+        for j, source in enumerate(REGS8):
+            if i != 6 or j != 6:
+                table[0x40 + i * 8 + j] = 'LD {}, {}'.format(reg, source)
+            table[0x80 + i * 8 + j] = ALU_OPS[i] + source
+            table[0xCB00 + i * 8 + j] = CB_OPS[i] + source
+            table[0xCB40 + i * 8 + j] = 'BIT {}, {}'.format(i, source)
+            table[0xCB80 + i * 8 + j] = 'RES {}, {}'.format(i, source)
+            table[0xCBC0 + i * 8 + j] = 'SET {}, {}'.format(i, source)
+        table[0xC7 + i * 8] = 'RST 0x{:02X}'.format(i * 8)
+
+    for i, reg in enumerate(REGS16):
+        table[0x01 + i * 16] = 'LD {}, {}'.format(reg, IMM16)
+        table[0x03 + i * 16] = 'INC ' + reg
+        table[0x09 + i * 16] = 'ADD HL, ' + reg
+        table[0x0B + i * 16] = 'DEC ' + reg
+    for i, reg in enumerate(REGS16_STACK):
+        table[0xC1 + i * 16] = 'POP ' + reg
+        table[0xC5 + i * 16] = 'PUSH ' + reg
+    for i, condition in enumerate(CONDITIONS):
+        table[0x20 + i * 8] = 'JR {}, {}'.format(condition, IMM8)
+        table[0xC0 + i * 8] = 'RET ' + condition
+        table[0xC2 + i * 8] = 'JP {}, {}'.format(condition, IMM16)
+        table[0xC4 + i * 8] = 'CALL {}, {}'.format(condition, IMM16)
+    return table
+
+
+class Template:
+    """
+    One way of writing an instruction
+    """
+    def __init__(self, opcode, text):
+        self.opcode = opcode
+        self.text = text
+        if IMM16 in text:
+            self.operand_len = 2
+        elif IMM8 in text:
+            self.operand_len = 1
+        else:
+            self.operand_len = 0
+        self.opcode_bytes = opcode.to_bytes(2, 'big') if opcode > 0xFF else bytes((opcode,))
+        # STOP is followed by a padding byte
+        self.size = len(self.opcode_bytes) + self.operand_len + (1 if opcode == 0x10 else 0)
+
+        placeholder = IMM16 if self.operand_len == 2 else IMM8
+        pattern = r'\s*'.join(re.escape(part) for part in normalize(text).replace(placeholder, '\0').split(' '))
+        self.regex = re.compile('^' + pattern.replace('\0', '(.+?)') + '$', re.IGNORECASE)
+
+
+def normalize(text):
+    """
+    Collapse the spacing of a source line into the spacing of the templates
+    """
+    return re.sub(r'\s*,\s*', ', ', ' '.join(text.split()))
+
+
+def build_templates():
+    """
+    Every template, grouped by mnemonic. The instruction table's disassembly strings come first, so source which
+    was copied from a disassembly assembles back to the same opcodes.
+    """
+    table = build_sm83_table()
+    by_opcode = [(opcode, instruction.disassembly) for opcode, instruction in enumerate(instructions)
+                 if not instruction.disassembly.startswith('Unknown')]
+    by_opcode.extend(sorted(table.items()))
+
+    exact = {}
+    templates = {}
+    for opcode, text in by_opcode:
+        template = Template(opcode, text)
+        if template.operand_len == 0:
+            exact.setdefault(normalize(text).upper(), template)
+        else:
+            mnemonic = text.split()[0].upper()
+            templates.setdefault(mnemonic, []).append(template)
+    return exact, templates
+
+
+_EXACT, _TEMPLATES = build_templates()
+
+_TOKEN = re.compile(r"\s*(?:(0x[0-9A-Fa-f]+|\$[0-9A-Fa-f]+)|(%[01]+)|([0-9]+)|'(.)'|([A-Za-z_.][A-Za-z0-9_.]*)|([+-]))")
+_LABEL = re.compile(r'^\s*([A-Za-z_.][A-Za-z0-9_.]*):')
+_REGISTER_NAMES = set(REGS8 + REGS16 + REGS16_STACK + CONDITIONS)
+
+
+class Expression:
+    """
+    Sum of numbers and symbols, symbols are resolved once every label is known
+    """
+    def __init__(self, text):
+        self.text = text.strip()
+        self.terms = []
+        self.hex_digits = None
+        position = 0
+        sign = 1
+        expect_term = True
+        while position < len(self.text):
+            match = _TOKEN.match(self.text, position)
+            if match is None:
+                raise ValueError('Bad expression {}'.format(self.text))
+            position = match.end()
+            hex_number, binary, decimal, char, symbol, operator = match.groups()
+            if operator is not None:
+                if expect_term and operator == '-':
+                    sign = -sign
+                elif expect_term:
+                    raise ValueError('Bad expression {}'.format(self.text))
+                else:
+                    sign = 1 if operator == '+' else -1
+                    expect_term = True
+                continue
+            if not expect_term:
+                raise ValueError('Bad expression {}'.format(self.text))
+            if hex_number is not None:
+                digits = hex_number[2:] if hex_number.startswith('0') else hex_number[1:]
+                self.terms.append((sign, int(digits, 16)))
+                self.hex_digits = len(digits)
+            elif binary is not None:
+                self.terms.append((sign, int(binary[1:], 2)))
+            elif decimal is not None:
+                self.terms.append((sign, int(decimal)))
+            elif char is not None:
+                self.terms.append((sign, ord(char)))
+            elif symbol.upper() in _REGISTER_NAMES:
+                raise ValueError('{} is a register'.format(symbol))
+            else:
+                self.terms.append((sign, symbol))
+            sign = 1
+            expect_term = False
+        if expect_term:
+            raise ValueError('Bad expression {}'.format(self.text))
+
+    def is_literal(self):
+        return all(isinstance(value, int) for _, value in self.terms)
+
+    def evaluate(self, symbols):
+        total = 0
+        for sign, value in self.terms:
+            if not isinstance(value, int):
+                if value not in symbols:
+                    raise KeyError('Undefined symbol {}'.format(value))
+                value = symbols[value]
+            total += sign * value
+        return total
+
+
+class Program:
+    """
+    Assembled code: chunks of bytes at addresses, and the address of every label
+    """
+    def __init__(self, chunks, symbols):
+        self.chunks = tuple(chunks)
+        self.symbols = MappingProxyType(symbols)
+
+    def get_bytes(self):
+        """
+        :return: The chunks joined from the lowest address, gaps filled with zeros, and that address
+        """
+        if not self.chunks:
+            return b'', 0
+        start = min(address for address, _ in self.chunks)
+        end = max(address + len(data) for address, data in self.chunks)
+        image = bytearray(end - start)
+        for address, data in self.chunks:
+            image[address - start:address - start + len(data)] = data
+        return bytes(image), start
+
+
+def split_operands(text):
+    """
+    Split directive operands on commas outside of string literals
+    """
+    return [operand.strip() for operand in re.findall(r'(?:"[^"]*"|[^,])+', text)]
+
+
+def match_instruction(text):
+    """
+    Find the template a line of source uses
+    :return: (Template, Expression or None)
+    """
+    normal = normalize(text)
+    template = _EXACT.get(normal.upper())
+    if template is not None:
+        return template, None
+
+    mnemonic = normal.split(' ', 1)[0].upper()
+    candidates = []
+    for template in _TEMPLATES.get(mnemonic, ()):
+        match = template.regex.match(normal)
+        if match is None:
+            continue
+        try:
+            candidates.append((template, Expression(match.group(1))))
+        except ValueError:
+            continue
+    if not candidates:
+        raise ValueError('Unknown instruction')
+
+    # LD A, 0x%02X and LD A, 0x%04X read the same, the number of hex digits written picks one, as in the disassembly
+    for template, expression in candidates:
+        if expression.hex_digits == 4 and template.operand_len == 2:
+            return template, expression
+    return candidates[0]
+
+
+@functools.lru_cache(maxsize=512)
+def assemble(source, origin=0x0150):
+    """
+    Assemble mnemonic source, written like Instruction.disassembly. Lines hold an optional label ending in ':', an
+    instruction or directive, and an optional ';' comment. Directives: .org addr, .db bytes or "text", .dw words,
+    .ds count[, fill] and .equ name, value.
+    Relative jumps to a label are converted to offsets, a number is used as the raw offset byte, as disassembled.
+    Results are cached, the same source is only assembled once.
+    :param source: The source text
+    :param origin: Address of the first instruction, until an .org
+    :return: Program
+    """
+    symbols = {}
+    statements = []
+    address = origin
+
+    # First pass: sizes and label addresses
+    for line_number, line in enumerate(source.splitlines(), 1):
+        text = line.split(';', 1)[0]
+        label = _LABEL.match(text)
+        if label is not None:
+            if label.group(1) in symbols:
+                raise AssemblerException('Duplicate label {}'.format(label.group(1)), line_number, line)
+            symbols[label.group(1)] = address
+            text = text[label.end():]
+        text = text.strip()
+        if not text:
+            continue
+
+        try:
+            if text.startswith('.'):
+                directive, _, rest = text.partition(' ')
+                directive = directive.lower()
+                operands = split_operands(rest)
+                if directive == '.org':
+                    address = Expression(operands[0]).evaluate(symbols)
+                    statements.append((line_number, line, address, directive, None))
+                elif directive == '.equ':
+                    symbols[operands[0]] = Expression(operands[1]).evaluate(symbols)
+                elif directive in ('.db', '.dw'):
+                    values = []
+                    for operand in operands:
+                        if operand.startswith('"') and operand.endswith('"') and directive == '.db':
+                            values.extend(operand[1:-1].encode('ascii'))
+                        else:
+                            values.append(Expression(operand))
+                    statements.append((line_number, line, address, directive, values))
+                    address += len(values) * (1 if directive == '.db' else 2)
+                elif directive == '.ds':
+                    count = Expression(operands[0]).evaluate(symbols)
+                    fill = Expression(operands[1]).evaluate(symbols) if len(operands) > 1 else 0
+                    statements.append((line_number, line, address, '.db', [fill & 0xFF] * count))
+                    address += count
+                else:
+                    raise ValueError('Unknown directive {}'.format(directive))
+            else:
+                template, expression = match_instruction(text)
+                statements.append((line_number, line, address, template, expression))
+                address += template.size
+        except (ValueError, KeyError, IndexError) as e:
+            raise AssemblerException(str(e).strip("'"), line_number, line)
+
+    # Second pass: emit with every label known
+    chunks = []
+    chunk_start = origin
+    chunk = bytearray()
+    for line_number, line, address, kind, operand in statements:
+        if kind == '.org':
+            if chunk:
+                chunks.append((chunk_start, bytes(chunk)))
+            chunk_start = address
+            chunk = bytearray()
+            continue
+        try:
+            if kind == '.db':
+                for value in operand:
+                    value = value if isinstance(value, int) else value.evaluate(symbols)
+                    chunk.append(check_range(value, 1))
+            elif kind == '.dw':
+                for value in operand:
+                    chunk.extend(check_range(value.evaluate(symbols), 2).to_bytes(2, 'little'))
+            else:
+                chunk.extend(kind.opcode_bytes)
+                if kind.operand_len:
+                    value = operand.evaluate(symbols)
+                    if kind.opcode in RELATIVE_OPCODES and not operand.is_literal():
+                        value -= address + kind.size
+                        if not -128 <= value <= 127:
+                            raise ValueError('Relative jump out of range')
+                    chunk.extend(check_range(value, kind.operand_len).to_bytes(kind.operand_len, 'little'))
+                elif kind.opcode == 0x10:
+                    chunk.append(0x00)
+        except (ValueError, KeyError) as e:
+            raise AssemblerException(str(e).strip("'"), line_number, line)
+    if chunk:
+        chunks.append((chunk_start, bytes(chunk)))
+    return Program(chunks, symbols)
+
+
+def check_range(value, size):
+    """
+    :return: The value as an unsigned int of size bytes, negative values wrap around
+    """
+    limit = 1 << (size * 8)
+    if not -(limit >> 1) <= value < limit:
+        raise ValueError('Value {} does not fit in {} byte(s)'.format(value, size))
+    return value & (limit - 1)
+
+
+# Cartridge header layout
+HEADER_START = 0x0100
+ENTRY_ADDR = 0x0100
+TITLE_ADDR = 0x0134
+TITLE_SIZE = 15
+COLOR_ADDR = 0x0143
+SGB_ADDR = 0x0146
+CART_TYPE_ADDR = 0x0147
+ROM_SIZE_ADDR = 0x0148
+RAM_SIZE_ADDR = 0x0149
+DESTINATION_ADDR = 0x014A
+OLD_LICENSEE_ADDR = 0x014B
+HEADER_CHECKSUM_ADDR = 0x014D
+GLOBAL_CHECKSUM_ADDR = 0x014E
+HEADER_END = 0x0150
+
+BANK_SIZE = 0x4000
+
+
+def header_checksum(rom):
+    checksum = 0
+    for byte in rom[TITLE_ADDR:HEADER_CHECKSUM_ADDR]:
+        checksum = (checksum - byte - 1) & 0xFF
+    return checksum
+
+
+def global_checksum(rom):
+    return (sum(rom) - rom[GLOBAL_CHECKSUM_ADDR] - rom[GLOBAL_CHECKSUM_ADDR + 1]) & 0xFFFF
+
+
+@functools.lru_cache(maxsize=512)
+def build_rom(source, title='PYGB', cart_type=0x00, ram_size=0x00, is_color=False, super_gb=False, entry='start',
+              origin=HEADER_END):
+    """
+    Assemble source into a cartridge image with a complete header. The entry point jumps to the entry label, or to
+    the origin if there is no such label. Results are cached.
+    :param source: Assembler source, see assemble
+    :param title: Up to 15 characters
+    :param cart_type: Cartridge type, a key of rom_memory_bank_types
+    :param ram_size: Ram size code, a key of RomInfo.ram_sizes_bits_banks
+    :param is_color: Flag the rom as color GameBoy compatible (0x80), it still runs on the original GameBoy
+    :param super_gb: Flag Super GameBoy support
+    :param entry: Label to start at
+    :param origin: Address the code starts at, until an .org
+    :return: The rom bytes, a whole number of 16KB banks, at least 32KB
+    """
+    program = assemble(source, origin)
+    end = max([address + len(data) for address, data in program.chunks] + [2 * BANK_SIZE])
+
+    # The smallest rom size code which holds everything, 32KB << code
+    rom_size = 0
+    while (2 * BANK_SIZE) << rom_size < end:
+        rom_size += 1
+    if rom_size not in RomInfo.rom_sizes_bits_banks:
+        raise AssemblerException('Program is too large for a rom, {} bytes'.format(end))
+    rom = bytearray((2 * BANK_SIZE) << rom_size)
+
+    for address, data in program.chunks:
+        if address < HEADER_END and address + len(data) > HEADER_START:
+            raise AssemblerException('Code at {:04X} overlaps the cartridge header'.format(address))
+        rom[address:address + len(data)] = data
+
+    start = program.symbols.get(entry, origin)
+    # NOP, JP start
+    rom[ENTRY_ADDR:ENTRY_ADDR + 4] = bytes((0x00, 0xC3, start & 0xFF, start >> 8))
+
+    title = title.upper().encode('ascii')[:TITLE_SIZE]
+    rom[TITLE_ADDR:TITLE_ADDR + len(title)] = title
+    rom[COLOR_ADDR] = 0x80 if is_color else 0x00
+    rom[SGB_ADDR] = 0x03 if super_gb else 0x00
+    rom[CART_TYPE_ADDR] = cart_type
+    rom[ROM_SIZE_ADDR] = rom_size
+    rom[RAM_SIZE_ADDR] = ram_size
+    rom[DESTINATION_ADDR] = 0x01
+    # Super GameBoy functions need the old licensee code to be 0x33
+    rom[OLD_LICENSEE_ADDR] = 0x33 if super_gb else 0x00
+
+    rom[HEADER_CHECKSUM_ADDR] = header_checksum(rom)
+    rom[GLOBAL_CHECKSUM_ADDR:GLOBAL_CHECKSUM_ADDR + 2] = global_checksum(rom).to_bytes(2, 'big')
+    return bytes(rom)
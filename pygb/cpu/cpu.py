@@ -28,9 +28,9 @@ SOFTWARE.
 from pygb.cpu import registers, interrupt
 from pygb.memory.memory import MemoryPool
 from pygb.cpu.instructions.instructions import instructions
-from pygb.utility import gb_type_select_var
+from pygb.utility import gb_type_select_var, MethodHooks
 
-from pygb.settings import DEBUG
+import pygb.settings
 from pygb.cpu.instructions.misc import nop
 
 
@@ -39,16 +39,32 @@ class Capabilities:
     sgb_cpu_clock_mhz = 4.295454
 
 
-class CPU:
+class CPU(MethodHooks):
     """
     The GameBoy CPU
     """
     def __init__(self, memory_space):
+        # Wrappers of step, see MethodHooks
+        self.method_hooks = {}
+
         self.registers = registers.RegisterBank()
         self.memory = memory_space  # type: MemoryPool
         self.interrupts = interrupt.Interrupts()
         self.clock_mhz = Capabilities.cpu_clock_mhz
 
+        # Total clock cycles executed since reset
+        self.cycles = 0
+
+        # Total instructions executed since reset
+        self.instructions = 0
+
+        # 1 in Color GameBoy double speed mode. Cycles always count at the normal speed clock, so the video and sound
+        # timings hold, and sub systems clocked by the CPU (timer, serial) shorten their periods by this shift.
+        self.speed_shift = 0
+
+        # Cycles stalled during the double speed step being executed, None outside of one. See stall.
+        self.stalled = None
+
         # Setup the special instructions for enabling and disabling interrupt routines
         instructions[0xFB].execute = self.enable_interrupts
         instructions[0xF3].execute = self.disable_interrupts
@@ -68,6 +84,10 @@ class CPU:
         # On power up, the GameBoy Program Counter is initialized to 0x100
         self.registers.set_pc(0x0100)
 
+        self.cycles = 0
+        self.instructions = 0
+        self.set_double_speed(False)
+
         self.clock_mhz = gb_type_select_var(gb_type,
                                             Capabilities.cpu_clock_mhz,
                                             Capabilities.sgb_cpu_clock_mhz,
@@ -80,6 +100,39 @@ class CPU:
     def disable_interrupts(self, inst, reg, mem):
         self.interrupts.IME = 0x0
 
+    def set_double_speed(self, enable):
+        """
+        Switch the Color GameBoy double speed mode. step is wrapped on this instance while it is on, so the normal
+        speed loop is untouched.
+        """
+        if enable and not self.speed_shift:
+            self.add_hook('step', self.wrap_step_double_speed)
+        elif not enable and self.speed_shift:
+            self.remove_hook('step', self.wrap_step_double_speed)
+        self.speed_shift = 1 if enable else 0
+
+    def wrap_step_double_speed(self, step):
+        def step_double_speed():
+            # Instructions take half as long on the normal speed clock. A debugger stopping inside still sees the
+            # cycles counted at the right speed.
+            cycles = self.cycles
+            self.stalled = 0
+            try:
+                step()
+            finally:
+                self.cycles = cycles + ((self.cycles - cycles - self.stalled) >> 1) + self.stalled
+                self.stalled = None
+        return step_double_speed
+
+    def stall(self, cycles):
+        """
+        Halt the CPU for a number of normal speed cycles, for hardware which takes the same time in either speed
+        (VRAM DMA, the speed switch). Stalls during an instruction are left out of the double speed halving.
+        """
+        self.cycles += cycles
+        if self.stalled is not None:
+            self.stalled += cycles
+
     def step(self):
         cur_pc = self.registers.get_pc()
         self.registers.inc_pc()
@@ -91,7 +144,7 @@ class CPU:
         if op_code != 0x00 and instruction.execute is nop:
             raise(Exception('Unhandled op code 0x%02X!' % op_code))
 
-        if DEBUG:
+        if pygb.settings.DEBUG:
             operand = 0
             if instruction.operand_len == 1:
                 operand = self.memory.read_byte(self.registers.get_pc())
@@ -106,6 +159,8 @@ class CPU:
 
         # Execute the CPU instruction
         instruction.execute(instruction, self.registers, self.memory)
+        self.cycles += instruction.cycles
+        self.instructions += 1
 
         self.interrupts.step(self.memory)
 
@@ -116,6 +171,6 @@ class CPU:
         if not instruction.changes_pc:
             self.registers.inc_pc(instruction.operand_len)
 
-        if DEBUG:
+        if pygb.settings.DEBUG:
             self.registers.print_registers()
             self.interrupts.print_interrupts(self.memory)
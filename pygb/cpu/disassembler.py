@@ -0,0 +1,351 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import sys
+import argparse
+
+from pygb.cache import ArtefactCache, get_rom_hash
+from pygb.cpu.assembler import build_sm83_table, CB_PREFIX, RELATIVE_OPCODES
+from pygb.cpu.instructions.instructions import instructions
+from pygb.cpu.interrupt import Interrupts
+from pygb.memory.memory import MemoryLocations
+
+
+class DisassemblerException(Exception):
+    """
+    Disassembler exception
+    """
+    pass
+
+
+class Flow:
+    """
+    How an instruction passes control on
+    """
+    NEXT = 0          # falls through
+    JUMP = 1          # always jumps to its target
+    BRANCH = 2        # jumps to its target or falls through
+    CALL = 3          # calls its target, then falls through
+    RETURN = 4        # returns, the path ends
+    RETURN_IF = 5     # may return, or falls through
+    INDIRECT = 6      # jumps somewhere only known at run time, the path ends
+    INVALID = 7       # not an instruction, the path ends
+
+
+# Opcodes which do not exist on the SM83
+INVALID_OPCODES = (0xD3, 0xDB, 0xDD, 0xE3, 0xE4, 0xEB, 0xEC, 0xED, 0xF4, 0xFC, 0xFD)
+
+FLOWS = {0xC3: Flow.JUMP, 0x18: Flow.JUMP, 0xE9: Flow.INDIRECT, 0xC9: Flow.RETURN, 0xD9: Flow.RETURN,
+         0xC2: Flow.BRANCH, 0xCA: Flow.BRANCH, 0xD2: Flow.BRANCH, 0xDA: Flow.BRANCH,
+         0x20: Flow.BRANCH, 0x28: Flow.BRANCH, 0x30: Flow.BRANCH, 0x38: Flow.BRANCH,
+         0xCD: Flow.CALL, 0xC4: Flow.CALL, 0xCC: Flow.CALL, 0xD4: Flow.CALL, 0xDC: Flow.CALL,
+         0xC0: Flow.RETURN_IF, 0xC8: Flow.RETURN_IF, 0xD0: Flow.RETURN_IF, 0xD8: Flow.RETURN_IF}
+FLOWS.update((opcode, Flow.CALL) for opcode in range(0xC7, 0x100, 8))
+FLOWS.update((opcode, Flow.INVALID) for opcode in INVALID_OPCODES)
+
+
+def build_decode_table():
+    """
+    Per opcode: (mnemonic template, operand length, flow). The instruction table's disassembly strings are used
+    where the CPU implements the opcode, so listings read like the CPU's debug output.
+    """
+    sm83 = build_sm83_table()
+    table = []
+    for opcode in range(0x100):
+        text = instructions[opcode].disassembly
+        if text.startswith('Unknown'):
+            text = sm83.get(opcode, 'DB 0x{:02X}'.format(opcode))
+        operand_len = 2 if '%04X' in text else 1 if '%02X' in text else 0
+        table.append((text, operand_len, FLOWS.get(opcode, Flow.NEXT)))
+    return table
+
+
+DECODE = build_decode_table()
+DECODE_CB = build_sm83_table()
+
+# Roots of the walk: the cartridge entry point and the interrupt vectors
+ENTRY_POINTS = (0x0100, Interrupts.VBLANK_START_ADDR, Interrupts.LCDSTAT_START_ADDR, Interrupts.TIMER_START_ADDR,
+                Interrupts.SERIAL_START_ADDR, Interrupts.HIGH_LOW_START_ADDR)
+
+BANK_SIZE = MemoryLocations.switch_rom_bank_addr
+ROM_END = MemoryLocations.video_ram_addr
+
+# Writes to this range select the switchable rom bank on MBC1/3/5 cartridges
+BANK_SELECT_START = 0x2000
+BANK_SELECT_END = 0x4000
+
+
+class Disassembly:
+    """
+    The code of a whole rom. Locations are (bank, address) tuples, bank 0 for 0000-3FFF.
+    instructions: location -> (size, text, flow, target location or None)
+    blocks: start location -> (end address, successor locations)
+    functions: locations of entry points and call targets
+    """
+    VERSION = 2
+
+    # Artefact cache entry name
+    CACHE_NAME = 'disassembly-v{}'.format(VERSION)
+
+    def __init__(self, rom_hash):
+        self.rom_hash = rom_hash
+        self.instructions = {}
+        self.blocks = {}
+        self.functions = set()
+
+    def get_block_instructions(self, start):
+        """
+        :return: The locations of the instructions of a basic block, in order
+        """
+        bank, address = start
+        end = self.blocks[start][0]
+        locations = []
+        while address < end:
+            locations.append((bank, address))
+            address += self.instructions[(bank, address)][0]
+        return locations
+
+    def get_symbols(self):
+        """
+        :return: Lines of 'BB:AAAA func_BB_AAAA' for every function, in the .sym file format
+        """
+        return ['{0:02X}:{1:04X} func_{0:02X}_{1:04X}'.format(*location) for location in sorted(self.functions)]
+
+    def get_listing(self):
+        """
+        :return: Lines of 'BB:AAAA  text', blocks separated by a blank line and functions labelled
+        """
+        lines = []
+        for start in sorted(self.blocks):
+            if start in self.functions:
+                lines.append('')
+                lines.append('func_{:02X}_{:04X}:'.format(*start))
+            else:
+                lines.append('.block_{:02X}_{:04X}:'.format(*start))
+            for location in self.get_block_instructions(start):
+                size, text, flow, target = self.instructions[location]
+                line = '    {:02X}:{:04X}  {}'.format(location[0], location[1], text)
+                if target is not None:
+                    line += '  ; -> {:02X}:{:04X}'.format(*target)
+                lines.append(line)
+        return lines
+
+
+class Disassembler:
+    """
+    Recursive descent disassembler. Every path is followed from the entry point and the interrupt vectors. Calls and
+    jumps into 4000-7FFF go to bank 1 as emulated, or to the bank the path last selected with LD A, n and
+    LD (2000-3FFF), A.
+    Banks 2 and up are only walked when such a pair selects them. Banks selected any other way (a register other
+    than A, a computed bank number, a table of banks) are left out, they have no fixed entry points to start from.
+    """
+    def __init__(self, rom):
+        self.rom = rom
+        self.num_banks = max(1, len(rom) // BANK_SIZE)
+
+    def get_offset(self, location):
+        bank, address = location
+        if address < BANK_SIZE:
+            return address
+        return bank * BANK_SIZE + address - BANK_SIZE
+
+    def resolve(self, address, bank):
+        """
+        :return: The location an address refers to with the given bank selected, None outside the rom
+        """
+        if address < BANK_SIZE:
+            return 0, address
+        if address < ROM_END and bank < self.num_banks:
+            return bank, address
+        return None
+
+    def decode(self, location):
+        """
+        :return: (size, text, flow, target address or None, operand) of the instruction at location, None past
+                 the end of the rom
+        """
+        rom = self.rom
+        offset = self.get_offset(location)
+        if offset >= len(rom):
+            return None
+        opcode = rom[offset]
+        if opcode == CB_PREFIX:
+            if offset + 1 >= len(rom):
+                return None
+            return 2, DECODE_CB[0xCB00 | rom[offset + 1]], Flow.NEXT, None, None
+
+        text, operand_len, flow = DECODE[opcode]
+        # STOP is followed by a padding byte
+        size = 1 + operand_len + (1 if opcode == 0x10 else 0)
+        if offset + size > len(rom) or location[1] + size > (BANK_SIZE if location[1] < BANK_SIZE else ROM_END):
+            return None
+        operand = None
+        if operand_len == 1:
+            operand = rom[offset + 1]
+            text = text % operand
+        elif operand_len == 2:
+            operand = rom[offset + 1] | (rom[offset + 2] << 8)
+            text = text % operand
+
+        target = None
+        if opcode in RELATIVE_OPCODES:
+            target = (location[1] + size + (operand - 0x100 if operand & 0x80 else operand)) & 0xFFFF
+        elif flow in (Flow.JUMP, Flow.BRANCH, Flow.CALL):
+            target = operand if operand_len == 2 else opcode & 0x38
+        return size, text, flow, target, operand
+
+    def run(self, rom_hash=''):
+        disassembly = Disassembly(rom_hash)
+        found = disassembly.instructions
+        leaders = set()
+        edges = {}
+
+        # Work list of (location, selected bank)
+        pending = []
+        for address in ENTRY_POINTS:
+            location = self.resolve(address, 1)
+            if self.decode(location) is not None:
+                pending.append((location, 1))
+                leaders.add(location)
+                disassembly.functions.add(location)
+
+        while pending:
+            location, bank = pending.pop()
+            last_immediate = None
+            while location not in found:
+                decoded = self.decode(location)
+                if decoded is None:
+                    break
+                size, text, flow, target_address, operand = decoded
+                opcode = self.rom[self.get_offset(location)]
+
+                # Track the selected bank: LD A, n then LD (2000-3FFF), A
+                if opcode == 0x3E:
+                    last_immediate = operand
+                elif opcode == 0xEA and BANK_SELECT_START <= operand < BANK_SELECT_END and last_immediate is not None:
+                    bank = last_immediate or 1
+
+                # Bank 0 code sees the selected bank above it, switchable bank code its own bank
+                mapped_bank = bank if location[0] == 0 else location[0]
+                target = self.resolve(target_address, mapped_bank) if target_address is not None else None
+                found[location] = (size, text, flow, target)
+
+                # Falling off the end of bank 0 runs on in the mapped bank, off the end of the rom area stops
+                next_location = self.resolve(location[1] + size, mapped_bank)
+                if next_location is not None and next_location[0] != location[0]:
+                    leaders.add(next_location)
+                    edges[location] = [next_location]
+                if flow == Flow.NEXT:
+                    if next_location is None:
+                        edges[location] = []
+                        break
+                    location = next_location
+                    continue
+
+                # Control flow ends the block, its successors are recorded on the instruction
+                successors = []
+                if flow in (Flow.JUMP, Flow.BRANCH, Flow.CALL) and target is not None:
+                    leaders.add(target)
+                    pending.append((target, bank))
+                    if flow == Flow.CALL:
+                        disassembly.functions.add(target)
+                    else:
+                        successors.append(target)
+                if flow in (Flow.BRANCH, Flow.CALL, Flow.RETURN_IF) and next_location is not None:
+                    leaders.add(next_location)
+                    successors.append(next_location)
+                    edges[location] = successors
+                    location = next_location
+                else:
+                    edges[location] = successors
+                    break
+
+        self.build_blocks(disassembly, leaders, edges)
+        return disassembly
+
+    def build_blocks(self, disassembly, leaders, edges):
+        """
+        Split the decoded instructions into basic blocks, starting at every leader and ending after a control flow
+        instruction or before the next leader. Instructions with edges also end a block, like the last one before
+        the end of bank 0 or the rom area.
+        """
+        found = disassembly.instructions
+        for start in sorted(leaders):
+            if start not in found:
+                continue
+            location = start
+            while True:
+                size, text, flow, target = found[location]
+                next_location = (location[0], location[1] + size)
+                if flow != Flow.NEXT or location in edges:
+                    successors = edges.get(location, [])
+                    break
+                if next_location in leaders or next_location not in found:
+                    successors = [next_location] if next_location in found else []
+                    break
+                location = next_location
+            disassembly.blocks[start] = (next_location[1], tuple(successors))
+
+
+def disassemble(rom, cache=None, rom_hash=None):
+    """
+    Disassemble the reachable code of a rom, or load the result from the artefact cache, keyed by the rom hash
+    :param rom: The rom bytes
+    :param cache: ArtefactCache, None to always disassemble and not store the result
+    :param rom_hash: The hash of the rom if it is already known
+    :return: Disassembly
+    """
+    rom_hash = rom_hash or get_rom_hash(rom)
+    if cache is None:
+        return Disassembler(rom).run(rom_hash)
+    return cache.get_or_create(rom_hash, Disassembly.CACHE_NAME, lambda: Disassembler(rom).run(rom_hash))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Disassemble all the code of a rom.')
+    parser.add_argument('rom', help='The rom to disassemble')
+    parser.add_argument('--listing', dest='listing', action='store', default='',
+                        help='Write the listing here, - for stdout')
+    parser.add_argument('--cache-dir', dest='cache_dir', action='store', default=None, help='Cache directory')
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true', help='Do not read or write the cache')
+    args = parser.parse_args(argv)
+
+    with open(args.rom, 'rb') as f:
+        rom = f.read()
+    disassembly = disassemble(rom, None if args.no_cache else ArtefactCache(args.cache_dir))
+    print('{} instructions, {} blocks, {} functions'.format(
+        len(disassembly.instructions), len(disassembly.blocks), len(disassembly.functions)), file=sys.stderr)
+
+    if args.listing == '-':
+        print('\n'.join(disassembly.get_listing()))
+    elif len(args.listing) > 0:
+        with open(args.listing, 'w') as f:
+            f.write('\n'.join(disassembly.get_listing()) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -83,7 +83,7 @@ instructions = [
     Instruction("DEC C",         4,  pygb.cpu.instructions.alu.dec_r1, (IReg.REGISTER_C, False)),   # 0x0D
     Instruction("LD C, 0x%02X",  8,  pygb.cpu.instructions.load.ld_r1_r2, (IReg.REGISTER_C, False), (IReg.REGISTER_PC, True), 1),   # 0x0E
     Instruction("Unknown : 0F",  0,  pygb.cpu.instructions.misc.nop),   # 0x0F
-    Instruction("Unknown : 10",  0,  pygb.cpu.instructions.misc.nop),   # 0x10
+    Instruction("STOP",          4,  pygb.cpu.instructions.misc.stop),   # 0x10
     Instruction("LD DE, 0x%04X", 12, pygb.cpu.instructions.load.ld_r1_r2, (IReg.REGISTER_DE, False), (IReg.REGISTER_PC, True), 2),   # 0x11
     Instruction("Unknown : 12",  0,  pygb.cpu.instructions.misc.nop),   # 0x12
     Instruction("Unknown : 13",  0,  pygb.cpu.instructions.misc.nop),   # 0x13
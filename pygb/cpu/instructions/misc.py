@@ -28,3 +28,11 @@ SOFTWARE.
 def nop(inst, reg, mem):
     """ NO OPERATION """
     pass
+
+
+def stop(inst, reg, mem):
+    """ STOP, the Color GameBoy switches speed here. Low power mode is not emulated. """
+    # STOP is followed by a padding byte
+    reg.inc_pc()
+    for handler in mem.stop_handlers:
+        handler()
@@ -86,6 +86,14 @@ class Interrupts(object):
             memory.write_byte(self.INTERRUPT_FLAG_ADDR, interrupt_flag & ~self.INTERRUPT_JOYPAD)
             self.joypad()
 
+    def request(self, memory, interrupt):
+        """
+        Flag an interrupt as requested, it runs on the next step if enabled
+        :param memory: The memory Pool for the system
+        :param interrupt: One of the INTERRUPT_ bits
+        """
+        memory.write_byte(self.INTERRUPT_FLAG_ADDR, memory.read_byte(self.INTERRUPT_FLAG_ADDR) | interrupt)
+
     def print_interrupts(self, memory):
         interrupt_enabled = memory.read_byte(self.INTERRUPT_ENABLE_ADDR)
         interrupt_flag = memory.read_byte(self.INTERRUPT_FLAG_ADDR)
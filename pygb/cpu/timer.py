@@ -0,0 +1,183 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+class Timer:
+    """
+    The divider (DIV) and timer (TIMA) registers.
+    Neither register is ticked. DIV and TIMA are computed from the CPU cycle count when read, and the only thing ever
+    scheduled is the cycle of the next TIMA overflow, which is recomputed when DIV, TIMA, TMA or TAC are written.
+    """
+    # Incremented at 16384Hz, writing any value resets it to 0.
+    DIV_ADDR = 0xFF04  # Divider Register (R/W)
+
+    # Incremented at the rate selected by TAC. When it overflows it is reloaded with TMA and a timer interrupt is
+    # requested.
+    TIMA_ADDR = 0xFF05  # Timer counter (R/W)
+    TMA_ADDR = 0xFF06  # Timer Modulo (R/W)
+
+    # Bit 2 starts the timer, bits 0-1 select the input clock
+    TAC_ADDR = 0xFF07  # Timer Control (R/W)
+    TAC_ENABLE = 0x04
+
+    # Cycles per TIMA increment for each TAC clock select (4096Hz, 262144Hz, 65536Hz, 16384Hz)
+    TAC_PERIODS = (1024, 16, 64, 256)
+
+    # DIV is the upper byte of a 16 bit counter incremented every cycle
+    DIV_SHIFT = 8
+
+    def __init__(self, memory_space, cpu, scheduler):
+        self.memory = memory_space
+        self.cpu = cpu
+        self.scheduler = scheduler
+
+        # Cycle at which the internal divider counter was last zero
+        self.div_base = 0
+
+        # TIMA value at the anchor cycle
+        self.tima = 0
+        self.tima_anchor = 0
+
+        self.tma = 0
+        self.tac = 0
+
+        # Cycle of the next TIMA overflow, and its scheduler event
+        self.next_overflow = scheduler.NEVER
+        self.overflow_event = None
+
+        memory_space.io_read_handlers[self.DIV_ADDR] = self.read_div
+        memory_space.io_read_handlers[self.TIMA_ADDR] = self.read_tima
+        memory_space.io_write_handlers[self.DIV_ADDR] = self.write_div
+        memory_space.io_write_handlers[self.TIMA_ADDR] = self.write_tima
+        memory_space.io_write_handlers[self.TMA_ADDR] = self.write_tma
+        memory_space.io_write_handlers[self.TAC_ADDR] = self.write_tac
+        scheduler.rebase_handlers.append(self.rebase)
+
+    def reset(self, gb_type):
+        now = self.cpu.cycles
+        self.div_base = now
+        self.tima = self.memory.mem[self.TIMA_ADDR]
+        self.tima_anchor = now
+        self.tma = self.memory.mem[self.TMA_ADDR]
+        self.tac = self.memory.mem[self.TAC_ADDR]
+        self.schedule()
+
+    def get_period(self):
+        # The timer is clocked by the CPU, twice as fast in double speed mode
+        return self.TAC_PERIODS[self.tac & 0x03] >> self.cpu.speed_shift
+
+    def get_tima(self, now):
+        """
+        :param now: The current cycle
+        :return: The value TIMA holds at this cycle
+        """
+        if not self.tac & self.TAC_ENABLE:
+            return self.tima
+
+        period = self.get_period()
+        ticks = (now - self.div_base) // period - (self.tima_anchor - self.div_base) // period
+        to_overflow = 0x100 - self.tima
+        if ticks < to_overflow:
+            return self.tima + ticks
+
+        # The overflow has not been handled yet, count on from TMA
+        return self.tma + (ticks - to_overflow) % (0x100 - self.tma)
+
+    def sync(self):
+        """
+        Pin TIMA at its current value before the timer configuration changes
+        """
+        now = self.cpu.cycles
+        while now >= self.next_overflow:
+            self.overflow()
+        self.tima = self.get_tima(now)
+        self.tima_anchor = now
+
+    def schedule(self):
+        """
+        Predict the cycle TIMA overflows at, from the last anchored value
+        """
+        self.scheduler.cancel(self.overflow_event)
+        if not self.tac & self.TAC_ENABLE:
+            self.next_overflow = self.scheduler.NEVER
+            self.overflow_event = None
+            return
+
+        period = self.get_period()
+        ticks = (self.tima_anchor - self.div_base) // period + 0x100 - self.tima
+        self.next_overflow = self.div_base + ticks * period
+        self.overflow_event = self.scheduler.schedule(self.next_overflow, self.overflow)
+
+    def overflow(self, cycle=None):
+        """
+        Run at the predicted overflow cycle: reload TIMA from TMA and request the timer interrupt
+        """
+        self.tima = self.tma
+        self.tima_anchor = self.next_overflow
+        self.cpu.interrupts.request(self.memory, self.cpu.interrupts.INTERRUPT_TIMER)
+        self.schedule()
+
+    def rebase(self, delta):
+        self.div_base -= delta
+        self.tima_anchor -= delta
+        self.next_overflow -= delta
+
+    def read_div(self, address):
+        return ((self.cpu.cycles - self.div_base) >> (self.DIV_SHIFT - self.cpu.speed_shift)) & 0xFF
+
+    def read_tima(self, address):
+        return self.get_tima(self.cpu.cycles)
+
+    def write_div(self, address, byte):
+        self.sync()
+        now = self.cpu.cycles
+
+        # Resetting the divider causes a falling edge on the TIMA input if the selected bit was set
+        period = self.get_period()
+        if self.tac & self.TAC_ENABLE and (now - self.div_base) & (period >> 1):
+            self.tima = (self.tima + 1) & 0xFF
+            if not self.tima:
+                self.tima = self.tma
+                self.cpu.interrupts.request(self.memory, self.cpu.interrupts.INTERRUPT_TIMER)
+
+        self.div_base = now
+        self.memory.mem[self.DIV_ADDR] = 0
+        self.schedule()
+
+    def write_tima(self, address, byte):
+        self.sync()
+        self.tima = byte
+        self.schedule()
+
+    def write_tma(self, address, byte):
+        self.sync()
+        self.tma = byte
+        self.schedule()
+
+    def write_tac(self, address, byte):
+        self.sync()
+        self.tac = byte
+        self.schedule()
@@ -0,0 +1,602 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import sys
+import cmd
+import shlex
+import argparse
+import contextlib
+
+# The emulator modules are imported where they are used. Importing them prints the memory map and runs the self
+# tests unless DEBUG is turned off first, which main does.
+
+REGISTER_NAMES = ('a', 'f', 'b', 'c', 'd', 'e', 'h', 'l', 'af', 'bc', 'de', 'hl', 'sp', 'pc')
+
+
+class DebuggerException(Exception):
+    """
+    Debugger exception
+    """
+    pass
+
+
+class DebuggerBreak(Exception):
+    """
+    Raised out of the running CPU loop when a breakpoint or watchpoint is hit
+    """
+    def __init__(self, hit):
+        super().__init__(hit.describe())
+        self.hit = hit
+
+
+class Breakpoint:
+    """
+    Stops before the instruction at address executes, in every bank
+    """
+    def __init__(self, point_id, address, condition=None, text=''):
+        """
+        :param address: Program counter to stop at
+        :param condition: Callable taking the GameBoy, only stop when it returns True
+        :param text: The condition as written, for listings
+        """
+        self.point_id = point_id
+        self.address = address
+        self.condition = condition
+        self.text = text
+        self.hits = 0
+
+    def describe(self):
+        return '#{} break {:04X}{} ({} hits)'.format(
+            self.point_id, self.address, ' if ' + self.text if self.text else '', self.hits)
+
+
+class Watchpoint:
+    """
+    Stops after an instruction which reads or writes a range of memory
+    """
+    def __init__(self, point_id, start, end, read, write, condition=None, text=''):
+        """
+        :param start: First address watched
+        :param end: One past the last address watched
+        :param read: Stop on reads, instruction fetches included
+        :param write: Stop on writes
+        :param condition: Callable taking the GameBoy, address and value, only stop when it returns True
+        :param text: The condition as written, for listings
+        """
+        self.point_id = point_id
+        self.start = start
+        self.end = end
+        self.read = read
+        self.write = write
+        self.condition = condition
+        self.text = text
+        self.hits = 0
+
+    def get_pages(self):
+        return range(self.start >> 8, ((self.end - 1) >> 8) + 1)
+
+    def describe(self):
+        return '#{} watch {:04X}-{:04X} {}{}{} ({} hits)'.format(
+            self.point_id, self.start, self.end - 1, 'r' if self.read else '', 'w' if self.write else '',
+            ' if ' + self.text if self.text else '', self.hits)
+
+
+class Hit:
+    """
+    Why the debugger stopped
+    """
+    BREAKPOINT = 'break'
+    READ = 'read'
+    WRITE = 'write'
+
+    def __init__(self, reason, point, pc, address, value=None):
+        self.reason = reason
+        self.point = point
+        self.pc = pc
+        self.address = address
+        self.value = value
+
+    def describe(self):
+        if self.reason == Hit.BREAKPOINT:
+            return 'Breakpoint #{} at {:04X}'.format(self.point.point_id, self.pc)
+        return 'Watchpoint #{}: {} {:04X} = {:02X} by the instruction at {:04X}'.format(
+            self.point.point_id, self.reason, self.address, self.value, self.pc)
+
+
+def get_namespace(gb):
+    """
+    :return: Names condition expressions can use, the registers, mem, cycles and frame
+    """
+    registers = gb.cpu.registers
+    namespace = {name: getattr(registers, 'get_' + name)() for name in REGISTER_NAMES}
+    namespace['mem'] = gb.memory.mem
+    namespace['cycles'] = gb.cpu.cycles
+    namespace['frame'] = gb.video.frame_count
+    return namespace
+
+
+def compile_condition(text):
+    """
+    Compile a condition expression, like 'a == 0x10 and mem[0xC000] > 3'.
+    Watchpoint conditions can also use address and value.
+    :return: Callable taking the GameBoy and, for watchpoints, the address and value
+    """
+    try:
+        code = compile(text, '<condition>', 'eval')
+    except SyntaxError as e:
+        raise DebuggerException('Invalid condition {!r}: {}'.format(text, e.msg))
+
+    def condition(gb, address=None, value=None):
+        namespace = get_namespace(gb)
+        namespace['address'] = address
+        namespace['value'] = value
+        return eval(code, {'__builtins__': {}}, namespace)
+    return condition
+
+
+def disassemble_at(memory, address):
+    """
+    Decode the instruction at address without going through the (possibly watched) memory accessors
+    :return: (size, text)
+    """
+    from pygb.cpu.disassembler import DECODE, DECODE_CB
+    from pygb.cpu.assembler import CB_PREFIX
+
+    mem = memory.mem
+    opcode = mem[address]
+    if opcode == CB_PREFIX:
+        return 2, DECODE_CB[0xCB00 | mem[(address + 1) & 0xFFFF]]
+    text, operand_len, flow = DECODE[opcode]
+    if operand_len == 1:
+        text = text % mem[(address + 1) & 0xFFFF]
+    elif operand_len == 2:
+        text = text % (mem[(address + 1) & 0xFFFF] | (mem[(address + 2) & 0xFFFF] << 8))
+    return 1 + operand_len, text
+
+
+class Debugger:
+    """
+    PC breakpoints and memory watchpoints. The CPU step and memory accessors are wrapped through their MethodHooks,
+    the same way as dirty page tracking and double speed, only while there is something to check, so a debugger
+    without breakpoints or watchpoints costs nothing.
+    Watchpoints are indexed by 256 byte page, accesses to other pages only pay a dictionary lookup. Sub systems
+    which store straight into mem (I/O registers, OAM DMA) are not seen by watchpoints.
+    """
+    def __init__(self, gb):
+        self.gb = gb
+
+        # Address: Breakpoint
+        self.breakpoints = {}
+
+        # Id: Breakpoint or Watchpoint
+        self.points = {}
+        self.next_id = 1
+
+        # Page: [Watchpoint]
+        self.read_pages = {}
+        self.write_pages = {}
+
+        # (target, name): the wrapper added to the MethodHooks of the target
+        self.hooks = {}
+
+        # The first hit of the instruction being executed
+        self.hit = None
+
+        # Let the instruction at PC run once when resuming from a breakpoint on it
+        self.resuming = False
+
+        # Program counter of the instruction being executed
+        self.pc = 0
+
+    def add_breakpoint(self, address, condition=None, text=''):
+        """
+        :param address: Program counter to stop at
+        :param condition: Callable taking the GameBoy, or an expression string
+        :return: Breakpoint
+        """
+        if isinstance(condition, str):
+            text, condition = condition, compile_condition(condition)
+        point = Breakpoint(self.next_id, address & 0xFFFF, condition, text)
+        if point.address in self.breakpoints:
+            self.remove(self.breakpoints[point.address].point_id)
+        self.next_id += 1
+        self.points[point.point_id] = point
+        self.breakpoints[point.address] = point
+        self.update_hooks()
+        return point
+
+    def add_watchpoint(self, address, length=1, read=False, write=True, condition=None, text=''):
+        """
+        :param address: First address to watch
+        :param length: Number of bytes to watch
+        :param read: Stop on reads
+        :param write: Stop on writes
+        :param condition: Callable taking the GameBoy, address and value, or an expression string
+        :return: Watchpoint
+        """
+        from pygb.memory.memory import MemoryPool
+
+        if not read and not write:
+            raise DebuggerException('A watchpoint needs to watch reads, writes or both!')
+        if length < 1 or address < 0 or address + length > MemoryPool.MAX_POOL_SIZE:
+            raise DebuggerException('Invalid watch range {:04X} + {}!'.format(address, length))
+        if isinstance(condition, str):
+            text, condition = condition, compile_condition(condition)
+        point = Watchpoint(self.next_id, address, address + length, read, write, condition, text)
+        self.next_id += 1
+        self.points[point.point_id] = point
+        for page in point.get_pages():
+            if read:
+                self.read_pages.setdefault(page, []).append(point)
+            if write:
+                self.write_pages.setdefault(page, []).append(point)
+        self.update_hooks()
+        return point
+
+    def remove(self, point_id):
+        point = self.points.pop(point_id, None)
+        if point is None:
+            raise DebuggerException('No breakpoint or watchpoint #{}!'.format(point_id))
+        if isinstance(point, Breakpoint):
+            del self.breakpoints[point.address]
+        else:
+            for pages in (self.read_pages, self.write_pages):
+                for page in point.get_pages():
+                    watches = pages.get(page)
+                    if watches is not None and point in watches:
+                        watches.remove(point)
+                        if not watches:
+                            del pages[page]
+        self.update_hooks()
+
+    def clear(self):
+        """
+        Remove every breakpoint and watchpoint, the emulator runs at full speed again
+        """
+        self.breakpoints = {}
+        self.points = {}
+        self.read_pages = {}
+        self.write_pages = {}
+        self.update_hooks()
+
+    def is_active(self):
+        return len(self.hooks) > 0
+
+    def update_hooks(self):
+        cpu = self.gb.cpu
+        memory = self.gb.memory
+        self.hook(cpu, 'step', self.step_checked, len(self.points) > 0)
+        self.hook(memory, 'read_byte', self.read_byte_watched, len(self.read_pages) > 0)
+        self.hook(memory, 'read_short', self.read_short_watched, len(self.read_pages) > 0)
+        self.hook(memory, 'write_byte', self.write_byte_watched, len(self.write_pages) > 0)
+        self.hook(memory, 'write_short', self.write_short_watched, len(self.write_pages) > 0)
+
+    def hook(self, target, name, replacement, enable):
+        """
+        Wrap or unwrap a method of the CPU or memory through its MethodHooks, so other wrappers such as dirty page
+        tracking or double speed stay in place whatever order they come and go in
+        """
+        key = (target, name)
+        if enable and key not in self.hooks:
+            def wrapper(method):
+                # Whatever else is in place, a tracked write for instance, still runs underneath
+                setattr(self, 'next_' + name, method)
+                return replacement
+            self.hooks[key] = wrapper
+            target.add_hook(name, wrapper)
+        elif not enable and key in self.hooks:
+            target.remove_hook(name, self.hooks.pop(key))
+
+    def step_checked(self):
+        self.pc = pc = self.gb.cpu.registers.get_pc()
+        if self.resuming:
+            self.resuming = False
+        else:
+            point = self.breakpoints.get(pc)
+            if point is not None and (point.condition is None or point.condition(self.gb)):
+                point.hits += 1
+                raise DebuggerBreak(Hit(Hit.BREAKPOINT, point, pc, pc))
+
+        self.next_step()
+
+        # Watchpoints stop once the instruction is complete, so the machine is never left half way through one
+        if self.hit is not None:
+            hit = self.hit
+            self.hit = None
+            raise DebuggerBreak(hit)
+
+    def check_watches(self, watches, reason, address, value):
+        for point in watches:
+            if point.start <= address < point.end and (point.read if reason == Hit.READ else point.write):
+                if point.condition is None or point.condition(self.gb, address, value):
+                    point.hits += 1
+                    if self.hit is None:
+                        self.hit = Hit(reason, point, self.pc, address, value)
+
+    def read_byte_watched(self, address):
+        value = self.next_read_byte(address)
+        watches = self.read_pages.get(address >> 8)
+        if watches is not None:
+            self.check_watches(watches, Hit.READ, address, value)
+        return value
+
+    def read_short_watched(self, address, order='little'):
+        value = self.next_read_short(address, order)
+        mem = self.gb.memory.mem
+        for byte_address in (address, address + 1):
+            watches = self.read_pages.get(byte_address >> 8)
+            if watches is not None:
+                self.check_watches(watches, Hit.READ, byte_address, mem[byte_address])
+        return value
+
+    def write_byte_watched(self, address, byte):
+        self.next_write_byte(address, byte)
+        watches = self.write_pages.get(address >> 8)
+        if watches is not None:
+            self.check_watches(watches, Hit.WRITE, address, self.gb.memory.mem[address])
+
+    def write_short_watched(self, address, short):
+        self.next_write_short(address, short)
+        mem = self.gb.memory.mem
+        for byte_address in (address, address + 1):
+            watches = self.write_pages.get(byte_address >> 8)
+            if watches is not None:
+                self.check_watches(watches, Hit.WRITE, byte_address, mem[byte_address])
+
+    def step(self, count=1):
+        """
+        Execute count instructions, hardware events run as they fall due
+        :return: Hit if a breakpoint or watchpoint stopped it early, None otherwise
+        """
+        gb = self.gb
+        cpu = gb.cpu
+        scheduler = gb.scheduler
+        self.resuming = True
+        try:
+            for i in range(count):
+                if cpu.cycles >= scheduler.deadline:
+                    scheduler.run_due(cpu.cycles)
+                    if scheduler.needs_rebase(cpu.cycles):
+                        gb.rebase()
+                cpu.step()
+        except DebuggerBreak as e:
+            return e.hit
+        finally:
+            self.resuming = False
+        return None
+
+    def cont(self, max_frames=None, max_cycles=None):
+        """
+        Continue until a breakpoint or watchpoint is hit, or a limit is reached
+        :return: Hit, None if a limit stopped it
+        """
+        self.resuming = True
+        try:
+            self.gb.run(max_cycles=max_cycles, max_frames=max_frames)
+        except DebuggerBreak as e:
+            return e.hit
+        finally:
+            self.resuming = False
+        return None
+
+    def detach(self):
+        self.clear()
+
+
+def parse_address(text):
+    """
+    Addresses are hexadecimal, with or without a 0x or $ prefix
+    """
+    try:
+        return int(text[1:] if text.startswith('$') else text, 16)
+    except ValueError:
+        raise DebuggerException('Invalid address {!r}!'.format(text))
+
+
+def split_condition(arg):
+    """
+    :return: (the arguments before 'if', the condition text after it)
+    """
+    parts = arg.split(' if ', 1)
+    return shlex.split(parts[0]), parts[1].strip() if len(parts) > 1 else ''
+
+
+class DebuggerShell(cmd.Cmd):
+    """
+    Command line front end of the Debugger. Addresses are hexadecimal, counts decimal.
+    An empty line repeats the last command.
+    """
+    intro = 'pygb debugger, type help or ? to list commands.'
+    prompt = '(pygb) '
+
+    def __init__(self, debugger, stdin=None, stdout=None, rewind=None):
+        super().__init__(stdin=stdin, stdout=stdout)
+        if stdin is not None:
+            self.use_rawinput = False
+        self.debugger = debugger
+        self.gb = debugger.gb
+
+        # RewindBuffer capturing every frame, None when rewinding is off
+        self.rewind = rewind
+
+    def write(self, text):
+        self.stdout.write(text + '\n')
+
+    def onecmd(self, line):
+        try:
+            return super().onecmd(line)
+        except DebuggerException as e:
+            self.write(str(e))
+        except KeyboardInterrupt:
+            self.write('Interrupted')
+        return False
+
+    def show_stop(self, hit):
+        if hit is not None:
+            self.write(hit.describe())
+        self.do_list('')
+
+    def do_break(self, arg):
+        """break ADDR [if EXPR]: stop before the instruction at ADDR"""
+        args, condition = split_condition(arg)
+        if len(args) != 1:
+            raise DebuggerException('Usage: break ADDR [if EXPR]')
+        self.write(self.debugger.add_breakpoint(parse_address(args[0]), condition or None).describe())
+
+    def do_watch(self, arg):
+        """watch ADDR[:LEN] [r|w|rw] [if EXPR]: stop after an access, EXPR can use address and value"""
+        args, condition = split_condition(arg)
+        if len(args) not in (1, 2):
+            raise DebuggerException('Usage: watch ADDR[:LEN] [r|w|rw] [if EXPR]')
+        address, _, length = args[0].partition(':')
+        mode = args[1] if len(args) > 1 else 'w'
+        point = self.debugger.add_watchpoint(parse_address(address), int(length) if length else 1,
+                                             'r' in mode, 'w' in mode, condition or None)
+        self.write(point.describe())
+
+    def do_delete(self, arg):
+        """delete [ID]: remove one breakpoint or watchpoint, or all of them"""
+        if len(arg.strip()) == 0:
+            self.debugger.clear()
+        else:
+            self.debugger.remove(int(arg))
+
+    def do_info(self, arg):
+        """info: list breakpoints and watchpoints"""
+        for point_id in sorted(self.debugger.points):
+            self.write(self.debugger.points[point_id].describe())
+
+    def do_step(self, arg):
+        """step [N]: execute N instructions"""
+        self.show_stop(self.debugger.step(int(arg) if arg.strip() else 1))
+
+    def do_continue(self, arg):
+        """continue [FRAMES]: run until something is hit, or for FRAMES frames"""
+        hit = self.debugger.cont(max_frames=int(arg) if arg.strip() else None)
+        if hit is None:
+            self.write('Stopped at frame {}'.format(self.gb.video.frame_count))
+        self.show_stop(hit)
+
+    def do_regs(self, arg):
+        """regs: show the registers"""
+        with contextlib.redirect_stdout(self.stdout):
+            self.gb.cpu.registers.print_registers()
+        self.write('\tcycles= {}, frame= {}'.format(self.gb.cpu.cycles, self.gb.video.frame_count))
+
+    def do_x(self, arg):
+        """x ADDR [LEN]: dump memory"""
+        args = arg.split()
+        if len(args) not in (1, 2):
+            raise DebuggerException('Usage: x ADDR [LEN]')
+        from pygb.memory.memory import MemoryPool
+
+        address = parse_address(args[0])
+        length = int(args[1]) if len(args) > 1 else 16
+        mem = self.gb.memory.mem
+        for row in range(address, min(address + length, MemoryPool.MAX_POOL_SIZE), 16):
+            end = min(row + 16, address + length, MemoryPool.MAX_POOL_SIZE)
+            self.write('{:04X}: {}'.format(row, ' '.join('{:02X}'.format(mem[i]) for i in range(row, end))))
+
+    def do_list(self, arg):
+        """list [ADDR] [N]: disassemble N instructions from ADDR, the program counter by default"""
+        args = arg.split()
+        address = parse_address(args[0]) if args else self.gb.cpu.registers.get_pc()
+        count = int(args[1]) if len(args) > 1 else 5
+        for i in range(count):
+            size, text = disassemble_at(self.gb.memory, address)
+            self.write('{} {:04X}  {}'.format('>' if i == 0 and not args else ' ', address, text))
+            address = (address + size) & 0xFFFF
+
+    def do_rewind(self, arg):
+        """rewind [N]: go back to the Nth most recent frame, 1 is the last one, needs --rewind"""
+        if self.rewind is None:
+            raise DebuggerException('Rewind is off, start the debugger with --rewind SECONDS')
+        frames = int(arg) if arg.strip() else 1
+        if not self.rewind.rewind(frames):
+            raise DebuggerException('Only {} frames to rewind'.format(self.rewind.get_stats()['frames']))
+        self.write('Rewound to frame {}'.format(self.gb.video.frame_count))
+        self.do_list('')
+
+    def do_eval(self, arg):
+        """eval EXPR: print an expression, with the same names as conditions"""
+        self.write(repr(compile_condition(arg)(self.gb)))
+
+    def do_quit(self, arg):
+        """quit: leave the debugger"""
+        return True
+
+    do_b = do_break
+    do_w = do_watch
+    do_s = do_step
+    do_c = do_continue
+    do_r = do_regs
+    do_l = do_list
+    do_q = do_quit
+    do_EOF = do_quit
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Debug a rom with breakpoints and watchpoints.')
+    parser.add_argument('--rom', dest='rom', action='store', required=True, help='The rom to load')
+    parser.add_argument('--break', dest='breaks', action='append', default=[], help='Breakpoint address, in hex')
+    parser.add_argument('--script', dest='script', action='store', default='',
+                        help='Run the debugger commands in this file instead of reading the terminal')
+    parser.add_argument('--rewind', dest='rewind', action='store', type=float, default=0.0,
+                        help='Keep this many seconds of frames for the rewind command')
+    args = parser.parse_args(argv)
+
+    import pygb.settings
+    pygb.settings.DEBUG = False
+    from pygb.gameboy import GameBoy
+    from pygb.utility import GBTypes
+    from pygb.rewind import RewindBuffer
+
+    gb = GameBoy(GBTypes.gameboy_classic)
+    with contextlib.redirect_stdout(io.StringIO()):
+        gb.load_rom(args.rom)
+
+    debugger = Debugger(gb)
+    for address in args.breaks:
+        debugger.add_breakpoint(parse_address(address))
+    rewind = RewindBuffer(gb, args.rewind).start() if args.rewind > 0 else None
+    try:
+        if len(args.script) > 0:
+            with open(args.script, 'r') as f:
+                shell = DebuggerShell(debugger, stdin=f, rewind=rewind)
+                shell.prompt = ''
+                shell.cmdloop(intro='')
+        else:
+            DebuggerShell(debugger, rewind=rewind).cmdloop()
+    finally:
+        if rewind is not None:
+            rewind.close()
+        debugger.detach()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
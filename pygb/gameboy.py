@@ -24,48 +24,247 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from pygb.scheduler import Scheduler
 from pygb.cpu.cpu import CPU
+from pygb.cpu.timer import Timer
 from pygb.video.video import Video
+from pygb.sound.sound import Sound
+from pygb.joypad.joypad import Joypad
+from pygb.serial.serial import Serial
 from pygb.memory.memory import MemoryPool
+from pygb.memory.color import ColorHardware
+from pygb.state import SaveState
+from pygb.cpu.disassembler import Disassembly, disassemble
+from pygb.cache import get_rom_hash
 from pygb.utility import RomInfo
 from pygb.utility import GBTypes
 
+class RunResult:
+    """
+    What a bounded run did and why it stopped
+    """
+    STOP_FRAMES = 'frames'
+    STOP_CYCLES = 'cycles'
+    STOP_PREDICATE = 'predicate'
+
+    __slots__ = ('cycles', 'frames', 'stop_reason')
+
+    def __init__(self):
+        self.cycles = 0
+        self.frames = 0
+        self.stop_reason = None
+
+    def __repr__(self):
+        return 'RunResult(cycles={}, frames={}, stop_reason={!r})'.format(self.cycles, self.frames, self.stop_reason)
+
+
 class GameBoy:
     """
     The GameBoy Unit itself
     """
-    def __init__(self, gb_type):
+    # How often run_until checks its predicate when no frame completes, the LCD may be off. One frame of cycles.
+    CHECK_CYCLES = 70224
+
+    def __init__(self, gb_type, cache=None):
+        """
+        :param gb_type: GBTypes value
+        :param cache: ArtefactCache to reuse rom analysis from between runs, None to always redo it
+        """
         self.game_boy_type = gb_type
+        self.cache = cache
+        self.rom_bytes = None
+        self.rom_hash = None
+        self.rom_info = None
+        self.disassembly = None
+        self.scheduler = Scheduler()
         self.memory = MemoryPool()
         self.cpu = CPU(self.memory)
-        self.video = Video(self.memory)
-        self.sound = None
+        self.timer = Timer(self.memory, self.cpu, self.scheduler)
+        self.video = Video(self.memory, self.cpu.interrupts, self.scheduler)
+        self.sound = Sound(self.memory, self.cpu, self.scheduler)
+        self.joypad = Joypad(self.memory, self.cpu.interrupts)
+        self.serial = Serial(self.memory, self.cpu.interrupts, self.scheduler, self.cpu)
+        self.color = ColorHardware(self.memory, self.cpu, self.timer, self.video)
+
+        # Audio is synthesized, input applied and link cables serviced a frame at a time
+        self.video.frame_handlers.append(self.sound.end_frame)
+        self.video.frame_handlers.append(self.joypad.frame)
+        self.video.frame_handlers.append(self.serial.poll)
 
     def reset(self):
         # Always reset memory first.
         self.memory.reset(self.game_boy_type)
 
+        # Sub systems schedule their first events as they reset
+        self.scheduler.reset()
+
         self.cpu.reset(self.game_boy_type)
+        self.timer.reset(self.game_boy_type)
         self.video.reset(self.game_boy_type)
+        self.sound.reset(self.game_boy_type)
+        self.joypad.reset(self.game_boy_type)
+        self.serial.reset(self.game_boy_type)
+        self.color.reset(self.game_boy_type)
 
     def load_rom(self, rom_path):
         f = open(rom_path, 'rb')
         rom_bytes = f.read()
         f.close()
 
-        # Parse the rom header and get all necessary information so we can setup our environment
-        rom_info = RomInfo()
-        rom_info.get_rom_info(rom_bytes)
+        # Parse the rom header and get all necessary information so we can setup our environment. With a cache the
+        # rom is hashed, and the header and a disassembly stored by an earlier run are reused, without one nothing
+        # is hashed at all.
+        if self.cache is not None:
+            self.rom_hash = get_rom_hash(rom_bytes)
+            rom_info = self.cache.get_or_create(self.rom_hash, RomInfo.CACHE_NAME, lambda: RomInfo.parse(rom_bytes))
+            self.disassembly = self.cache.get(self.rom_hash, Disassembly.CACHE_NAME)
+        else:
+            self.rom_hash = None
+            rom_info = RomInfo.parse(rom_bytes)
+            self.disassembly = None
         rom_info.print()
+        self.rom_bytes = rom_bytes
+        self.rom_info = rom_info
 
-        if rom_info.super_gb and self.game_boy_type != GBTypes.gameboy_super:
+        if rom_info.is_color and self.game_boy_type != GBTypes.gameboy_color:
+            self.game_boy_type = GBTypes.gameboy_color
+            print('Switching to Color GameBoy Mode!')
+        elif rom_info.super_gb and self.game_boy_type != GBTypes.gameboy_super:
             self.game_boy_type = GBTypes.gameboy_super
             print('Switching to Super GameBoy Mode!')
 
         self.reset()
         self.memory.load_rom(rom_bytes, rom_info.cart_type)
 
+    def get_disassembly(self):
+        """
+        Static disassembly of the loaded rom, from the artefact cache when there is one. It is only built the first
+        time it is asked for.
+        :return: Disassembly
+        """
+        if self.disassembly is None:
+            self.disassembly = disassemble(self.rom_bytes, self.cache, self.rom_hash)
+        return self.disassembly
+
+    def save_state(self, buffer=None):
+        """
+        Snapshot the whole machine
+        :param buffer: A buffer from SaveState.allocate to reuse, a new one is allocated if None
+        :return: The buffer holding the state
+        """
+        return SaveState.save(self, buffer)
+
+    def load_state(self, data):
+        """
+        Restore the machine from a snapshot taken with save_state, the same rom must be loaded
+        """
+        SaveState.load(self, data)
+
     def run_cpu(self):
+        cpu = self.cpu
+        scheduler = self.scheduler
         while True:
-            self.cpu.step()
-            self.video.step()
+            # Run straight through to the next hardware event. Events scheduled while the CPU runs lower the deadline.
+            while cpu.cycles < scheduler.deadline:
+                cpu.step()
+            scheduler.run_due(cpu.cycles)
+
+            if scheduler.needs_rebase(cpu.cycles):
+                self.rebase()
+
+    def run_frames(self, frames):
+        """
+        Run until the given number of frames have completed
+        :return: RunResult
+        """
+        return self.run(max_frames=frames)
+
+    def run_cycles(self, cycles):
+        """
+        Run for the given number of cycles. The last instruction may overshoot by a few cycles.
+        :return: RunResult
+        """
+        return self.run(max_cycles=cycles)
+
+    def run_until(self, predicate, max_cycles=None, check_cycles=CHECK_CYCLES):
+        """
+        Run until predicate(game_boy) returns True. It is only checked when a frame completes, or every check_cycles
+        when no frame completes, so the CPU loop is not slowed down.
+        :param predicate: Callable taking this GameBoy
+        :param max_cycles: Give up after this many cycles, None to run for as long as it takes
+        :param check_cycles: Cycles between checks while no frame completes
+        :return: RunResult
+        """
+        return self.run(max_cycles=max_cycles, predicate=predicate, check_cycles=check_cycles)
+
+    def run(self, max_cycles=None, max_frames=None, predicate=None, check_cycles=CHECK_CYCLES):
+        """
+        Run until a frame count, a cycle count or a predicate stops it, whichever comes first.
+        The cycle limit and periodic predicate checks are scheduler events, so the CPU loop itself is unchanged.
+        :return: RunResult
+        """
+        cpu = self.cpu
+        scheduler = self.scheduler
+        video = self.video
+
+        result = RunResult()
+        stop = []
+        events = [None, None]
+
+        def cycles_elapsed(cycle):
+            stop.append(RunResult.STOP_CYCLES)
+
+        def check_predicate(cycle):
+            if predicate(self):
+                stop.append(RunResult.STOP_PREDICATE)
+            else:
+                events[1] = scheduler.schedule(cycle + check_cycles, check_predicate)
+
+        if max_cycles is not None:
+            events[0] = scheduler.schedule(cpu.cycles + max_cycles, cycles_elapsed)
+        if predicate is not None:
+            events[1] = scheduler.schedule(cpu.cycles + check_cycles, check_predicate)
+
+        # Frames are counted as they end and cycles on the scheduler timeline, so a state load while running does not
+        # throw the limits or the result off
+        frames = [0]
+
+        def count_frame():
+            frames[0] += 1
+
+        video.frame_handlers.append(count_frame)
+        frame = 0
+        start_cycle = cpu.cycles + scheduler.offset
+        try:
+            while not stop:
+                while cpu.cycles < scheduler.deadline:
+                    cpu.step()
+                scheduler.run_due(cpu.cycles)
+
+                if scheduler.needs_rebase(cpu.cycles):
+                    self.rebase()
+
+                if frames[0] != frame:
+                    frame = frames[0]
+                    if max_frames is not None and frame >= max_frames:
+                        stop.append(RunResult.STOP_FRAMES)
+                    elif predicate is not None and predicate(self):
+                        stop.append(RunResult.STOP_PREDICATE)
+        finally:
+            video.frame_handlers.remove(count_frame)
+            for event in events:
+                scheduler.cancel(event)
+            scheduler.update_deadline()
+            result.cycles = cpu.cycles + scheduler.offset - start_cycle
+            result.frames = frames[0]
+
+        result.stop_reason = stop[0]
+        return result
+
+    def rebase(self):
+        """
+        Shift the cycle counter and every timestamp down, keeping the counters small
+        """
+        delta = self.scheduler.get_rebase_delta(self.cpu.cycles)
+        self.cpu.cycles -= delta
+        self.scheduler.rebase(delta)
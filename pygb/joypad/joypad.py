@@ -0,0 +1,122 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from pygb.joypad.movie import MovieReader
+
+
+class Buttons:
+    """
+    Button bits, as used by movie files. The low nibble is the direction keys and the high nibble the buttons, the same
+    order they appear in P1.
+    """
+    RIGHT = 0x01
+    LEFT = 0x02
+    UP = 0x04
+    DOWN = 0x08
+    A = 0x10
+    B = 0x20
+    SELECT = 0x40
+    START = 0x80
+
+
+class Joypad:
+    """
+    The joypad, read through P1 (FF00).
+    The pressed buttons change only at frame boundaries, either set directly or played back from a movie file.
+    """
+    # Bits 4 and 5 select the direction keys and buttons respectively when 0. The low nibble reads 0 for pressed.
+    P1_ADDR = 0xFF00  # Joypad (R/W)
+    P1_SELECT_DIRECTIONS = 0x10
+    P1_SELECT_BUTTONS = 0x20
+    P1_SELECT_MASK = 0x30
+
+    def __init__(self, memory_space, interrupts):
+        self.memory = memory_space
+        self.interrupts = interrupts
+
+        # Buttons bitmask of what is held down
+        self.pressed = 0
+        self.select = self.P1_SELECT_MASK
+
+        # Movie being played back, if any
+        self.movie = None
+
+        memory_space.io_read_handlers[self.P1_ADDR] = self.read_p1
+        memory_space.io_write_handlers[self.P1_ADDR] = self.write_p1
+
+    def reset(self, gb_type):
+        self.pressed = 0
+        self.select = self.P1_SELECT_MASK
+
+    def get_selected_lines(self, buttons):
+        """
+        :return: The P10-P13 lines pulled low by the buttons, for the groups currently selected
+        """
+        lines = 0
+        if not self.select & self.P1_SELECT_DIRECTIONS:
+            lines |= buttons & 0x0F
+        if not self.select & self.P1_SELECT_BUTTONS:
+            lines |= buttons >> 4
+        return lines
+
+    def read_p1(self, address):
+        return 0xC0 | self.select | (~self.get_selected_lines(self.pressed) & 0x0F)
+
+    def write_p1(self, address, byte):
+        self.select = byte & self.P1_SELECT_MASK
+
+    def set_buttons(self, buttons):
+        """
+        Change the held buttons. A joypad interrupt is requested if a selected line goes from high to low.
+        :param buttons: Buttons bitmask
+        """
+        newly_pressed = buttons & ~self.pressed
+        self.pressed = buttons
+        if self.get_selected_lines(newly_pressed):
+            self.interrupts.request(self.memory, self.interrupts.INTERRUPT_JOYPAD)
+
+    def play(self, movie):
+        """
+        Play back a movie file from the next frame on
+        :param movie: A path or a MovieReader
+        """
+        if self.movie is not None:
+            self.movie.close()
+        self.movie = movie if isinstance(movie, MovieReader) else MovieReader(movie)
+
+    def frame(self):
+        """
+        Frame boundary, apply the next frame of the movie
+        """
+        if self.movie is None:
+            return
+        buttons = self.movie.next_frame()
+        if buttons is None:
+            # The movie ended, let go of everything
+            self.movie.close()
+            self.movie = None
+            buttons = 0
+        self.set_buttons(buttons)
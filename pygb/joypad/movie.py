@@ -0,0 +1,173 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import struct
+
+
+class Capabilities:
+    """
+    The input movie file format.
+    A header, then run length encoded records of a Buttons bitmask byte followed by the number of frames it is held
+    for as an unsigned LEB128 varint.
+    """
+    magic = b'PGBM'
+    version = 1
+
+    # magic, version, flags, reserved
+    header = struct.Struct('<4sBBH')
+
+    # Bytes read from disk at a time
+    read_size = 0x1000
+
+
+class MovieException(Exception):
+    """
+    Input movie exception
+    """
+    pass
+
+
+class MovieReader:
+    """
+    Streams an input movie from disk, a frame at a time
+    """
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        try:
+            self.flags = self.read_header(path)
+        except Exception:
+            self.close()
+            raise
+
+        self.buffer = b''
+        self.offset = 0
+
+        # The current record
+        self.buttons = 0
+        self.remaining = 0
+
+        self.frame = 0
+
+    def read_header(self, path):
+        """
+        Check the movie header
+        :param path: The movie path, for error messages
+        :return: The header flags
+        """
+        header = self.file.read(Capabilities.header.size)
+        if len(header) != Capabilities.header.size:
+            raise MovieException('Movie file {} is too short'.format(path))
+        magic, version, flags, _ = Capabilities.header.unpack(header)
+        if magic != Capabilities.magic:
+            raise MovieException('{} is not a movie file'.format(path))
+        if version != Capabilities.version:
+            raise MovieException('Unsupported movie version {}'.format(version))
+        return flags
+
+    def read_byte(self):
+        if self.offset >= len(self.buffer):
+            self.buffer = self.file.read(Capabilities.read_size)
+            self.offset = 0
+            if not self.buffer:
+                return None
+        byte = self.buffer[self.offset]
+        self.offset += 1
+        return byte
+
+    def read_record(self):
+        buttons = self.read_byte()
+        if buttons is None:
+            return False
+        count = 0
+        shift = 0
+        while True:
+            byte = self.read_byte()
+            if byte is None:
+                raise MovieException('Movie record truncated at frame {}'.format(self.frame))
+            count |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+            shift += 7
+        self.buttons = buttons
+        self.remaining = count
+        return True
+
+    def next_frame(self):
+        """
+        :return: The buttons held for the next frame, or None once the movie has ended
+        """
+        while not self.remaining:
+            if self.file is None or not self.read_record():
+                return None
+        self.remaining -= 1
+        self.frame += 1
+        return self.buttons
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class MovieWriter:
+    """
+    Records an input movie, a frame at a time
+    """
+    def __init__(self, path, flags=0):
+        self.file = open(path, 'wb')
+        self.file.write(Capabilities.header.pack(Capabilities.magic, Capabilities.version, flags, 0))
+        self.buttons = None
+        self.count = 0
+
+    def write_record(self):
+        record = bytearray((self.buttons,))
+        count = self.count
+        while True:
+            if count > 0x7F:
+                record.append((count & 0x7F) | 0x80)
+                count >>= 7
+            else:
+                record.append(count)
+                break
+        self.file.write(record)
+
+    def add_frame(self, buttons, count=1):
+        """
+        Hold buttons for count frames
+        """
+        if buttons != self.buttons:
+            if self.count:
+                self.write_record()
+            self.buttons = buttons
+            self.count = 0
+        self.count += count
+
+    def close(self):
+        if self.file is not None:
+            if self.count:
+                self.write_record()
+            self.file.close()
+            self.file = None
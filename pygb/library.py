@@ -0,0 +1,361 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import sys
+import mmap
+import time
+import sqlite3
+import hashlib
+import argparse
+import concurrent.futures
+
+import pygb.settings
+from pygb.utility import RomInfo
+from pygb.cache import get_cache_dir
+from pygb.cpu.assembler import TITLE_ADDR, COLOR_ADDR, SGB_ADDR, CART_TYPE_ADDR, ROM_SIZE_ADDR, \
+    RAM_SIZE_ADDR, DESTINATION_ADDR, OLD_LICENSEE_ADDR, HEADER_CHECKSUM_ADDR, GLOBAL_CHECKSUM_ADDR, HEADER_END, \
+    header_checksum, global_checksum
+
+ROM_EXTENSIONS = ('.gb', '.gbc', '.sgb')
+
+# Old licensee code meaning the new two character code at 0x0144 is used
+NEW_LICENSEE = 0x33
+NEW_LICENSEE_ADDR = 0x0144
+MASK_ROM_VERSION_ADDR = 0x014C
+
+# Color flag values at COLOR_ADDR
+COLOR_SUPPORTED = 0x80
+COLOR_ONLY = 0xC0
+
+# Rescans hand work to worker processes only when there is this much of it
+MIN_PARALLEL = 64
+
+COLUMNS = ('path', 'size', 'mtime_ns', 'sha1', 'title', 'cart_type', 'cart_name', 'rom_size', 'ram_size',
+           'rom_banks', 'ram_banks', 'is_color', 'color_only', 'super_gb', 'destination', 'licensee', 'version',
+           'header_ok', 'global_ok', 'error')
+
+SCHEMA_VERSION = 1
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS roms (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha1 TEXT,
+    title TEXT,
+    cart_type INTEGER,
+    cart_name TEXT,
+    rom_size INTEGER,
+    ram_size INTEGER,
+    rom_banks INTEGER,
+    ram_banks INTEGER,
+    is_color INTEGER,
+    color_only INTEGER,
+    super_gb INTEGER,
+    destination INTEGER,
+    licensee TEXT,
+    version INTEGER,
+    header_ok INTEGER,
+    global_ok INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS roms_sha1 ON roms (sha1);
+CREATE INDEX IF NOT EXISTS roms_title ON roms (title);
+'''
+
+
+class LibraryException(Exception):
+    """
+    Rom library exception
+    """
+    pass
+
+
+class ScanStats:
+    """
+    What a scan changed
+    """
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.removed = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return '{} added, {} updated, {} removed, {} unchanged, {} errors in {:.2f}s'.format(
+            self.added, self.updated, self.removed, self.unchanged, self.errors, self.seconds)
+
+
+def get_default_path():
+    return os.path.join(get_cache_dir(), 'library.sqlite3')
+
+
+def walk_roms(root):
+    """
+    Find the roms under root
+    :return: Generator of (path, size, mtime_ns), the stat comes along with the directory listing
+    """
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(entry.path)
+            elif entry.name.lower().endswith(ROM_EXTENSIONS):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime_ns
+
+
+def init_worker():
+    """
+    Pool initializer. Indexing is headless, the memory map must not be printed as the tables are imported.
+    """
+    pygb.settings.DEBUG = False
+
+
+def parse_header(rom):
+    """
+    Read the cartridge header fields, the same ones RomInfo.get_rom_info reads
+    :param rom: Buffer holding at least the header, an mmap of the rom file for instance
+    :return: Dictionary of COLUMNS values
+    """
+    from pygb.memory.memory import rom_memory_bank_types
+
+    rom_size = rom[ROM_SIZE_ADDR]
+    ram_size = rom[RAM_SIZE_ADDR]
+    licensee = rom[OLD_LICENSEE_ADDR]
+    color = rom[COLOR_ADDR]
+    # Color roms use the last title byte for the color flag
+    title_end = COLOR_ADDR if color in (COLOR_SUPPORTED, COLOR_ONLY) else COLOR_ADDR + 1
+    title = bytes(rom[TITLE_ADDR:title_end]).split(b'\x00', 1)[0].decode('ascii', errors='replace').rstrip()
+    return {
+        'title': title,
+        'cart_type': rom[CART_TYPE_ADDR],
+        'cart_name': rom_memory_bank_types.get(rom[CART_TYPE_ADDR], 'Unknown'),
+        'rom_size': rom_size,
+        'ram_size': ram_size,
+        'rom_banks': RomInfo.rom_sizes_bits_banks.get(rom_size, (0, None))[1],
+        'ram_banks': RomInfo.ram_sizes_bits_banks.get(ram_size, (0, None))[1],
+        'is_color': int(color in (COLOR_SUPPORTED, COLOR_ONLY)),
+        'color_only': int(color == COLOR_ONLY),
+        'super_gb': int(rom[SGB_ADDR] == 0x03),
+        'destination': rom[DESTINATION_ADDR],
+        'licensee': bytes(rom[NEW_LICENSEE_ADDR:NEW_LICENSEE_ADDR + 2]).decode('ascii', errors='replace')
+        if licensee == NEW_LICENSEE else '{:02X}'.format(licensee),
+        'version': rom[MASK_ROM_VERSION_ADDR],
+        'header_ok': int(header_checksum(rom) == rom[HEADER_CHECKSUM_ADDR]),
+        'global_ok': None,
+    }
+
+
+def scan_rom(path, size, mtime_ns):
+    """
+    Index one rom. The file is mapped rather than read, the header is parsed straight out of the mapping and the
+    hash and global checksum run over it without copying.
+    :return: Tuple of COLUMNS values
+    """
+    row = dict.fromkeys(COLUMNS)
+    row.update(path=path, size=size, mtime_ns=mtime_ns)
+    try:
+        if size < HEADER_END:
+            raise LibraryException('Too small to hold a header')
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as rom:
+            row.update(parse_header(rom[:HEADER_END]))
+            view = memoryview(rom)
+            try:
+                row['sha1'] = hashlib.sha1(view).hexdigest()
+                expected = (view[GLOBAL_CHECKSUM_ADDR] << 8) | view[GLOBAL_CHECKSUM_ADDR + 1]
+                row['global_ok'] = int(global_checksum(view) == expected)
+            finally:
+                # The mapping can't close while a view of it is alive
+                view.release()
+    except (OSError, ValueError, LibraryException) as e:
+        row['error'] = str(e)
+    return tuple(row[column] for column in COLUMNS)
+
+
+def scan_chunk(chunk):
+    return [scan_rom(*item) for item in chunk]
+
+
+class RomLibrary:
+    """
+    Persistent SQLite index of rom headers. Rescans only open files whose size or modification time changed.
+    """
+    def __init__(self, path=None):
+        self.path = path or get_default_path()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # The index can always be rebuilt from the roms
+            self.connection.execute('DROP TABLE IF EXISTS roms')
+            self.connection.execute('PRAGMA user_version={}'.format(SCHEMA_VERSION))
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def scan(self, roots, workers=None):
+        """
+        Bring the index up to date with the roms under roots. Roms which are gone from a root are removed.
+        :param roots: Directories to scan
+        :param workers: Worker processes for changed roms, one per CPU if None
+        :return: ScanStats
+        """
+        stats = ScanStats()
+        start_time = time.perf_counter()
+        roots = [os.path.abspath(root) for root in roots]
+        known = {row[0]: (row[1], row[2]) for row in self.connection.execute('SELECT path, size, mtime_ns FROM roms')}
+
+        found = set()
+        changed = []
+        for root in roots:
+            for path, size, mtime_ns in walk_roms(root):
+                found.add(path)
+                previous = known.get(path)
+                if previous == (size, mtime_ns):
+                    stats.unchanged += 1
+                    continue
+                if previous is None:
+                    stats.added += 1
+                else:
+                    stats.updated += 1
+                changed.append((path, size, mtime_ns))
+
+        prefixes = tuple(os.path.join(root, '') for root in roots)
+        removed = [(path,) for path in known if path not in found and path.startswith(prefixes)]
+        stats.removed = len(removed)
+
+        rows = []
+        if len(changed) < MIN_PARALLEL or workers == 1:
+            rows = scan_chunk(changed)
+        else:
+            workers = workers or os.cpu_count() or 1
+            # Several roms per task, so tiny roms don't drown in inter process overhead
+            chunk_size = max(1, min(256, len(changed) // (workers * 4)))
+            chunks = [changed[i:i + chunk_size] for i in range(0, len(changed), chunk_size)]
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                for chunk_rows in pool.map(scan_chunk, chunks):
+                    rows.extend(chunk_rows)
+        stats.errors = sum(1 for row in rows if row[-1] is not None)
+
+        with self.connection:
+            self.connection.executemany('DELETE FROM roms WHERE path = ?', removed)
+            self.connection.executemany('INSERT OR REPLACE INTO roms ({}) VALUES ({})'.format(
+                ', '.join(COLUMNS), ', '.join('?' * len(COLUMNS))), rows)
+        stats.seconds = time.perf_counter() - start_time
+        return stats
+
+    def find(self, title=None, sha1=None, cart_type=None, is_color=None, super_gb=None, bad=False):
+        """
+        Query the index, every given filter must match
+        :param title: Substring of the title, any case
+        :param bad: Only roms which failed to scan or have a wrong checksum
+        :return: List of sqlite3.Row
+        """
+        clauses = []
+        params = []
+        if title is not None:
+            clauses.append('title LIKE ?')
+            params.append('%{}%'.format(title))
+        for column, value in (('sha1', sha1), ('cart_type', cart_type), ('is_color', is_color),
+                              ('super_gb', super_gb)):
+            if value is not None:
+                clauses.append('{} = ?'.format(column))
+                params.append(int(value) if isinstance(value, bool) else value)
+        if bad:
+            clauses.append('(error IS NOT NULL OR header_ok = 0 OR global_ok = 0)')
+        query = 'SELECT * FROM roms'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        return self.connection.execute(query + ' ORDER BY title, path', params).fetchall()
+
+    def count(self):
+        return self.connection.execute('SELECT COUNT(*) FROM roms').fetchone()[0]
+
+
+def format_row(row):
+    if row['error'] is not None:
+        return '{:<16} {}  error: {}'.format('', row['path'], row['error'])
+    flags = ('C' if row['color_only'] else 'c' if row['is_color'] else '-') + ('S' if row['super_gb'] else '-') + \
+            ('-' if row['header_ok'] else 'H') + ('-' if row['global_ok'] else 'G')
+    return '{:<16} {} {:<22} {:<3} {}  {}'.format(row['title'], flags, row['cart_name'],
+                                                  row['rom_banks'] if row['rom_banks'] is not None else '?',
+                                                  row['sha1'][:12], row['path'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Index a collection of roms.')
+    parser.add_argument('--db', dest='db', action='store', default=None, help='Index file')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    scan_parser = subparsers.add_parser('scan', help='Add the roms in directories to the index')
+    scan_parser.add_argument('roots', nargs='+', help='Directories of roms')
+    scan_parser.add_argument('--workers', dest='workers', action='store', type=int, default=None,
+                             help='Worker processes, one per CPU by default')
+
+    list_parser = subparsers.add_parser('list', help='List indexed roms, flags are color, SGB and bad checksums')
+    list_parser.add_argument('--title', dest='title', action='store', default=None, help='Title contains this')
+    list_parser.add_argument('--sha1', dest='sha1', action='store', default=None, help='Rom hash')
+    list_parser.add_argument('--color', dest='color', action='store_true', help='Color roms only')
+    list_parser.add_argument('--sgb', dest='sgb', action='store_true', help='Super GameBoy roms only')
+    list_parser.add_argument('--bad', dest='bad', action='store_true', help='Unreadable or bad checksum roms only')
+    args = parser.parse_args(argv)
+
+    pygb.settings.DEBUG = False
+
+    with RomLibrary(args.db) as library:
+        if args.command == 'scan':
+            print(library.scan(args.roots, args.workers))
+        else:
+            for row in library.find(args.title, args.sha1, is_color=True if args.color else None,
+                                    super_gb=True if args.sgb else None, bad=args.bad):
+                print(format_row(row))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
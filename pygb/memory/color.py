@@ -0,0 +1,241 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from pygb.memory.memory import MemoryPool, MemoryLocations, MemorySizes
+from pygb.utility import GBTypes
+
+
+class ColorHardware:
+    """
+    The Color GameBoy additions: double speed mode (KEY1), VRAM banks (VBK), internal RAM banks (SVBK) and the VRAM
+    DMA (HDMA1-5). Its registers are only handled on the Color GameBoy, the other models pay nothing for it.
+    Every register is kept readable in memory as it changes, so there are no read handlers.
+    """
+    # Bit 0 arms a speed switch for the next STOP, bit 7 is the current speed
+    KEY1_ADDR = 0xFF4D
+    KEY1_ARMED = 0x01
+    KEY1_DOUBLE_SPEED = 0x80
+    KEY1_UNUSED = 0x7E
+
+    # Bit 0 selects the VRAM bank
+    VBK_ADDR = 0xFF4F
+    VBK_UNUSED = 0xFE
+
+    # Source high/low, destination high/low, then length/mode/start
+    HDMA1_ADDR = 0xFF51
+    HDMA2_ADDR = 0xFF52
+    HDMA3_ADDR = 0xFF53
+    HDMA4_ADDR = 0xFF54
+    HDMA5_ADDR = 0xFF55
+    HDMA_HBLANK = 0x80
+    HDMA_IDLE = 0xFF
+
+    # Bits 0-2 select the internal RAM bank at D000-DFFF
+    SVBK_ADDR = 0xFF70
+    SVBK_UNUSED = 0xF8
+
+    # HDMA moves 16 bytes per block, and the CPU is halted for 32 normal speed cycles per block in either speed
+    HDMA_BLOCK_SIZE = 0x10
+    HDMA_BLOCK_CYCLES = 32
+
+    # The CPU is halted for a while as the clock switches, in normal speed cycles
+    SPEED_SWITCH_CYCLES = 8200
+
+    def __init__(self, memory_space, cpu, timer, video):
+        self.memory = memory_space
+        self.cpu = cpu
+        self.timer = timer
+        self.video = video
+
+        self.enabled = False
+        self.speed_armed = 0
+
+        self.hdma_source = 0
+        self.hdma_dest = 0
+
+        # Blocks left of an H-Blank transfer, 0 when none is running
+        self.hdma_blocks = 0
+
+        self.write_handlers = {
+            self.KEY1_ADDR: self.write_key1,
+            self.VBK_ADDR: self.write_vbk,
+            self.HDMA1_ADDR: self.write_hdma_source,
+            self.HDMA2_ADDR: self.write_hdma_source,
+            self.HDMA3_ADDR: self.write_hdma_dest,
+            self.HDMA4_ADDR: self.write_hdma_dest,
+            self.HDMA5_ADDR: self.write_hdma5,
+            self.SVBK_ADDR: self.write_svbk,
+        }
+
+    def reset(self, gb_type):
+        self.enable(gb_type == GBTypes.gameboy_color)
+        self.speed_armed = 0
+        self.hdma_source = 0
+        self.hdma_dest = 0
+        self.stop_hdma()
+        if self.enabled:
+            mem = self.memory.mem
+            mem[self.KEY1_ADDR] = self.KEY1_UNUSED
+            mem[self.VBK_ADDR] = self.VBK_UNUSED
+            mem[self.SVBK_ADDR] = self.SVBK_UNUSED | 1
+            for address in range(self.HDMA1_ADDR, self.HDMA5_ADDR + 1):
+                mem[address] = self.HDMA_IDLE
+
+    def enable(self, enable):
+        if enable == self.enabled:
+            return
+        self.enabled = enable
+        if enable:
+            self.memory.io_write_handlers.update(self.write_handlers)
+            self.memory.stop_handlers.append(self.stop)
+        else:
+            for address in self.write_handlers:
+                self.memory.io_write_handlers.pop(address, None)
+            self.memory.stop_handlers.remove(self.stop)
+
+    def write_key1(self, address, byte):
+        self.speed_armed = byte & self.KEY1_ARMED
+        self.update_key1()
+
+    def update_key1(self):
+        self.memory.mem[self.KEY1_ADDR] = self.KEY1_UNUSED | self.speed_armed | \
+            (self.KEY1_DOUBLE_SPEED if self.cpu.speed_shift else 0)
+
+    def stop(self):
+        """
+        STOP with a speed switch armed toggles double speed. The timer is pinned first, its periods change with the
+        speed, and the divider is reset as on hardware.
+        """
+        if not self.speed_armed:
+            return
+        self.timer.sync()
+        self.cpu.set_double_speed(not self.cpu.speed_shift)
+        self.speed_armed = 0
+        self.update_key1()
+        self.timer.write_div(self.timer.DIV_ADDR, 0)
+        self.cpu.stall(self.SPEED_SWITCH_CYCLES)
+
+    def set_speed(self, double_speed, armed):
+        """
+        Restore the speed from a save state
+        """
+        self.cpu.set_double_speed(double_speed)
+        self.speed_armed = armed
+        if self.enabled:
+            self.update_key1()
+
+    def write_vbk(self, address, byte):
+        self.memory.select_vram_bank(byte & 0x01)
+        self.memory.mem[self.VBK_ADDR] = self.VBK_UNUSED | self.memory.vram_bank
+
+    def write_svbk(self, address, byte):
+        self.memory.select_wram_bank(byte & 0x07)
+        self.memory.mem[self.SVBK_ADDR] = self.SVBK_UNUSED | (byte & 0x07)
+
+    def write_hdma_source(self, address, byte):
+        if address == self.HDMA1_ADDR:
+            self.hdma_source = (byte << 8) | (self.hdma_source & 0xFF)
+        else:
+            self.hdma_source = (self.hdma_source & 0xFF00) | (byte & 0xF0)
+        # Write only
+        self.memory.mem[address] = self.HDMA_IDLE
+
+    def write_hdma_dest(self, address, byte):
+        if address == self.HDMA3_ADDR:
+            self.hdma_dest = ((byte & 0x1F) << 8) | (self.hdma_dest & 0xFF)
+        else:
+            self.hdma_dest = (self.hdma_dest & 0x1F00) | (byte & 0xF0)
+        self.memory.mem[address] = self.HDMA_IDLE
+
+    def write_hdma5(self, address, byte):
+        """
+        Start a transfer of (byte & 0x7F) + 1 blocks. Bit 7 clear copies everything at once, set copies a block at
+        the start of every H-Blank. Writing bit 7 clear during an H-Blank transfer stops it.
+        """
+        blocks = (byte & 0x7F) + 1
+        if self.hdma_blocks:
+            if not byte & self.HDMA_HBLANK:
+                remaining = self.hdma_blocks
+                self.stop_hdma()
+                self.memory.mem[self.HDMA5_ADDR] = self.HDMA_HBLANK | (remaining - 1)
+                return
+        if byte & self.HDMA_HBLANK:
+            self.hdma_blocks = blocks
+            self.update_hdma5()
+            if self.hdma_hblank not in self.video.hblank_handlers:
+                self.video.hblank_handlers.append(self.hdma_hblank)
+            if self.video.mode_flag == self.video.VIDEO_MODE_HBLANK:
+                # Started during an H-Blank, the first block goes straight away
+                self.hdma_hblank(self.cpu.cycles)
+        else:
+            self.copy_blocks(blocks)
+            self.memory.mem[self.HDMA5_ADDR] = self.HDMA_IDLE
+
+    def update_hdma5(self):
+        # While an H-Blank transfer runs bit 7 reads 0 and the low bits count the blocks left, minus one
+        self.memory.mem[self.HDMA5_ADDR] = (self.hdma_blocks - 1) & 0x7F if self.hdma_blocks else self.HDMA_IDLE
+
+    def copy_blocks(self, blocks):
+        """
+        Copy blocks of 16 bytes into the selected VRAM bank as one slice, halting the CPU for as long as it takes
+        """
+        memory = self.memory
+        size = blocks * self.HDMA_BLOCK_SIZE
+        # The transfer stops at the end of VRAM
+        source = self.hdma_source
+        size = min(size, MemorySizes.video_ram_size - self.hdma_dest, MemoryPool.MAX_POOL_SIZE - source)
+        dest = MemoryLocations.video_ram_addr + self.hdma_dest
+        memory.mv[dest:dest + size] = memory.mv[source:source + size]
+        memory.mark_range_dirty(dest, dest + size)
+        self.hdma_source = (source + size) & 0xFFFF
+        self.hdma_dest = (self.hdma_dest + size) & 0x1FFF
+        self.cpu.stall((size // self.HDMA_BLOCK_SIZE) * self.HDMA_BLOCK_CYCLES)
+        return size
+
+    def hdma_hblank(self, cycle):
+        if not self.hdma_blocks:
+            return
+        copied = self.copy_blocks(1)
+        self.hdma_blocks = self.hdma_blocks - 1 if copied == self.HDMA_BLOCK_SIZE else 0
+        self.update_hdma5()
+        if not self.hdma_blocks:
+            self.stop_hdma()
+
+    def stop_hdma(self):
+        self.hdma_blocks = 0
+        if self.hdma_hblank in self.video.hblank_handlers:
+            self.video.hblank_handlers.remove(self.hdma_hblank)
+
+    def restore_hdma(self, source, dest, blocks):
+        """
+        Restore the HDMA state from a save state
+        """
+        self.stop_hdma()
+        self.hdma_source = source
+        self.hdma_dest = dest
+        self.hdma_blocks = blocks
+        if blocks:
+            self.video.hblank_handlers.append(self.hdma_hblank)
@@ -26,7 +26,7 @@ SOFTWARE.
 
 from copy import deepcopy
 import pygb.settings
-from pygb.utility import get_size_to_pretty, gb_type_select_var
+from pygb.utility import get_size_to_pretty, gb_type_select_var, GBTypes, MethodHooks
 
 
 class Capabilities:
@@ -99,6 +99,11 @@ class MemorySizes:
 
     internal_ram_size2 = 0x7F
 
+    # Color GameBoy banks, VRAM 8000-9FFF is switched whole and internal RAM D000-DFFF is the switched half
+    vram_bank_count = 2
+    wram_bank_size = 0x1000
+    wram_bank_count = 8
+
 io_reset = [
     0x0F, 0x00, 0x7C, 0xFF, 0x00, 0x00, 0x00, 0xF8, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0x01,
     0x80, 0xBF, 0xF3, 0xFF, 0xBF, 0xFF, 0x3F, 0x00, 0xFF, 0xBF, 0x7F, 0xFF, 0x9F, 0xFF, 0xBF, 0xFF,
@@ -163,7 +168,7 @@ class MemoryException(Exception):
     pass
 
 
-class MemoryPool:
+class MemoryPool(MethodHooks):
     """
     Memory Pool Object for accessing the GameBoy memory space
     """
@@ -171,7 +176,17 @@ class MemoryPool:
     # Max memory address space for the GameBoy
     MAX_POOL_SIZE = 0x10000
 
+    # Dirty page tracking granularity
+    PAGE_SIZE = 0x100
+    PAGE_COUNT = MAX_POOL_SIZE // PAGE_SIZE
+
+    # Writing XX to this register copies 0xA0 bytes from XX00-XX9F into OAM (FE00-FE9F)
+    DMA_ADDR = 0xFF46
+
     def __init__(self):
+        # Wrappers of the accessors, see MethodHooks
+        self.method_hooks = {}
+
         # Rom Bytes
         self.rom = None
 
@@ -187,6 +202,32 @@ class MemoryPool:
         # This will be changed if the rom is using extra, bankable memory
         self.memory_mode = 0x00  # Rom Only by default
 
+        # Hardware registers which need to react to a write. Maps an I/O address to a callable(address, byte)
+        # which is invoked after the byte has been stored. Sub systems register themselves here.
+        self.io_write_handlers = {self.DMA_ADDR: self.handle_dma}
+
+        # Hardware registers whose value is computed when read. Maps an I/O address to a callable(address) returning
+        # the byte, for sub systems which do not keep memory up to date as they run (timers, joypad).
+        self.io_read_handlers = {}
+
+        # Callables run when the CPU executes STOP. Instructions only see the registers and memory, so machine wide
+        # hooks for them are kept here.
+        self.stop_handlers = []
+
+        # Set whenever the sprite attribute memory (OAM) changes, so the video can rebuild its sprite tables.
+        self.oam_dirty = True
+
+        # One flag per 256 byte page written since the flags were last cleared, None while tracking is off.
+        # See track_dirty_pages.
+        self.dirty_pages = None
+
+        # Color GameBoy VRAM and internal RAM banks, None on the other models. The selected bank lives in mem like
+        # on every other model, so nothing which reads mem has to know about banks, and the others are kept here.
+        self.vram_banks = None
+        self.wram_banks = None
+        self.vram_bank = 0
+        self.wram_bank = 1
+
     def load_rom(self, rom_bytes, mode_index):
         """
         Load a rom into memory. This much happen before the CPU can step.
@@ -256,6 +297,18 @@ class MemoryPool:
         self.mem[0xFF4B] = 0x00  # WX
         self.mem[0xFFFF] = 0x00  # IE
 
+        if gb_type == GBTypes.gameboy_color:
+            self.vram_banks = [bytearray(MemorySizes.video_ram_size) for _ in range(MemorySizes.vram_bank_count)]
+            self.wram_banks = [bytearray(MemorySizes.wram_bank_size) for _ in range(MemorySizes.wram_bank_count)]
+        else:
+            self.vram_banks = None
+            self.wram_banks = None
+        self.vram_bank = 0
+        self.wram_bank = 1
+
+        self.oam_dirty = True
+        self.mark_all_dirty()
+
     @staticmethod
     def check_address(address):
         """
@@ -273,6 +326,8 @@ class MemoryPool:
         """
         if pygb.settings.DEBUG:
             self.check_address(address)
+        if address >= MemoryLocations.io_ports_addr and address in self.io_read_handlers:
+            return self.io_read_handlers[address](address)
         return self.mem[address]
 
     def read_short(self, address, order='little'):
@@ -285,7 +340,10 @@ class MemoryPool:
         if pygb.settings.DEBUG:
             self.check_address(address)
         self.mem[address] = byte
-        self.handle_echo_space(address, byte.to_bytes(1, byteorder='big'))
+        if address >= MemoryLocations.sprite_attrib_mem_addr:
+            self.handle_high_write(address, byte)
+        else:
+            self.handle_echo_space(address, byte.to_bytes(1, byteorder='big'))
 
     def write_short(self, address, short):
         if pygb.settings.DEBUG:
@@ -293,7 +351,142 @@ class MemoryPool:
             self.check_address(address + 1)
         bytes_in = short.to_bytes(2, byteorder='big')
         self.mv[address:address + 2] = bytes_in
-        self.handle_echo_space(address, bytes_in)
+        if address + 1 >= MemoryLocations.sprite_attrib_mem_addr:
+            self.handle_high_write(address, bytes_in[0])
+            self.handle_high_write(address + 1, bytes_in[1])
+        else:
+            self.handle_echo_space(address, bytes_in)
+
+    def track_dirty_pages(self, enable):
+        """
+        Turn dirty page tracking on or off. While on, write_byte and write_short are wrapped on this instance by
+        versions which flag the pages they touch, so there is no cost at all while tracking is off.
+        Sub systems which store straight into mem (I/O registers, OAM DMA) do not flag pages, treat FE00-FFFF as
+        always dirty.
+        :param enable: True to start tracking with every page dirty, False to stop
+        """
+        if enable:
+            if self.dirty_pages is None:
+                self.add_hook('write_byte', self.wrap_write_byte_tracked)
+                self.add_hook('write_short', self.wrap_write_short_tracked)
+            self.dirty_pages = bytearray(b'\x01' * self.PAGE_COUNT)
+        elif self.dirty_pages is not None:
+            self.dirty_pages = None
+            self.remove_hook('write_byte', self.wrap_write_byte_tracked)
+            self.remove_hook('write_short', self.wrap_write_short_tracked)
+
+    def mark_all_dirty(self):
+        if self.dirty_pages is not None:
+            self.dirty_pages[:] = b'\x01' * self.PAGE_COUNT
+
+    def mark_page_dirty(self, address):
+        self.dirty_pages[address >> 8] = 1
+        if MemoryLocations.echo_internal_addr <= address < MemoryLocations.sprite_attrib_mem_addr:
+            # The echo write is mirrored into internal ram
+            self.dirty_pages[(address - MemoryLocations.echo_internal_addr + MemoryLocations.internal_ram_addr) >> 8] = 1
+
+    def wrap_write_byte_tracked(self, write_byte):
+        mark_page_dirty = self.mark_page_dirty
+
+        def write_byte_tracked(address, byte):
+            mark_page_dirty(address)
+            write_byte(address, byte)
+        return write_byte_tracked
+
+    def wrap_write_short_tracked(self, write_short):
+        mark_page_dirty = self.mark_page_dirty
+
+        def write_short_tracked(address, short):
+            mark_page_dirty(address)
+            mark_page_dirty(address + 1)
+            write_short(address, short)
+        return write_short_tracked
+
+    def mark_range_dirty(self, start, end):
+        if self.dirty_pages is not None:
+            first = start >> 8
+            last = (end + self.PAGE_SIZE - 1) >> 8
+            self.dirty_pages[first:last] = b'\x01' * (last - first)
+
+    def select_vram_bank(self, bank):
+        """
+        Switch the Color GameBoy VRAM bank at 8000-9FFF. The outgoing bank is put aside and the incoming one moved
+        in, so every switch costs two 8KB slice copies, in exchange everything reading mem sees the selected bank
+        without a bank lookup on each access.
+        :param bank: 0 or 1
+        """
+        if bank == self.vram_bank:
+            return
+        start = MemoryLocations.video_ram_addr
+        end = MemoryLocations.switch_ram_bank_addr
+        self.vram_banks[self.vram_bank][:] = self.mv[start:end]
+        self.mv[start:end] = self.vram_banks[bank]
+        self.vram_bank = bank
+        self.mark_range_dirty(start, end)
+
+    def select_wram_bank(self, bank):
+        """
+        Switch the Color GameBoy internal RAM bank at D000-DFFF, and its echo at F000-FDFF. Like select_vram_bank
+        every switch costs slice copies, 4KB out, 4KB in and the 3.5KB echo.
+        :param bank: 1 to 7, 0 selects 1
+        """
+        bank = bank or 1
+        if bank == self.wram_bank:
+            return
+        start = MemoryLocations.internal_ram_addr + MemorySizes.wram_bank_size
+        end = start + MemorySizes.wram_bank_size
+        self.wram_banks[self.wram_bank][:] = self.mv[start:end]
+        self.mv[start:end] = self.wram_banks[bank]
+        self.wram_bank = bank
+
+        echo_start = MemoryLocations.echo_internal_addr + MemorySizes.wram_bank_size
+        self.mv[echo_start:MemoryLocations.sprite_attrib_mem_addr] = \
+            self.mv[start:start + MemoryLocations.sprite_attrib_mem_addr - echo_start]
+        self.mark_range_dirty(start, end)
+        self.mark_range_dirty(echo_start, MemoryLocations.sprite_attrib_mem_addr)
+
+    def sync_banks(self):
+        """
+        Copy the selected banks out of mem, so vram_banks and wram_banks hold every bank up to date
+        """
+        if self.vram_banks is None:
+            return
+        self.vram_banks[self.vram_bank][:] = \
+            self.mv[MemoryLocations.video_ram_addr:MemoryLocations.switch_ram_bank_addr]
+        start = MemoryLocations.internal_ram_addr + MemorySizes.wram_bank_size
+        self.wram_banks[self.wram_bank][:] = self.mv[start:start + MemorySizes.wram_bank_size]
+
+    def get_vram_bank(self, bank):
+        """
+        :return: A view of a VRAM bank, whether it is selected or not
+        """
+        if bank == self.vram_bank:
+            return self.mv[MemoryLocations.video_ram_addr:MemoryLocations.switch_ram_bank_addr]
+        return memoryview(self.vram_banks[bank])
+
+    def handle_high_write(self, address, byte):
+        """
+        Writes at or above OAM may have side effects. OAM writes flag the sprite tables as dirty, and I/O
+        writes are forwarded to whichever sub system registered for the address.
+        :param address: The address written to
+        :param byte: The byte which was written
+        """
+        if address < MemoryLocations.unused_io_addr:
+            if address >= MemoryLocations.sprite_attrib_mem_addr:
+                self.oam_dirty = True
+        elif address in self.io_write_handlers:
+            self.io_write_handlers[address](address, byte)
+
+    def handle_dma(self, address, byte):
+        """
+        OAM DMA transfer. The source is byte * 0x100, and the whole sprite table is copied in one slice.
+        :param address: The DMA register address
+        :param byte: The high byte of the source address
+        """
+        source = byte << 8
+        self.mv[MemoryLocations.sprite_attrib_mem_addr:MemoryLocations.unused_io_addr] = \
+            self.mv[source:source + MemorySizes.sprite_attrib_mem_size]
+        self.oam_dirty = True
 
     def handle_echo_space(self, address, bytes_in):
         """
@@ -0,0 +1,131 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import time
+
+
+class FramePacer:
+    """
+    Keeps emulated frames in step with the wall clock, at the video's vertical sync rate times a speed multiplier.
+    Each frame has an absolute due time counted from an anchor, so sleeping too long on one frame is made up on the
+    next ones instead of adding up. The thread sleeps while ahead, it never spins.
+    """
+    # Speed which runs as fast as the host allows
+    UNCAPPED = 0
+
+    # Further behind than this and the schedule starts over from now, rather than running flat out to catch up
+    MAX_LAG = 0.25
+
+    def __init__(self, video, speed=1.0, clock=time.perf_counter, sleep=time.sleep):
+        """
+        :param video: The Video, its vert_sync_hz sets the frame rate
+        :param speed: Multiple of real time, UNCAPPED for no pacing
+        :param clock: Monotonic clock in seconds
+        :param sleep: Sleep function in seconds
+        """
+        self.video = video
+        self.clock = clock
+        self.sleep = sleep
+        self.speed = speed
+
+        # Due time of frame 0 of the current schedule, and frames paced since
+        self.anchor = None
+        self.frames = 0
+
+        # Statistics
+        self.frames_total = 0
+        self.late_frames = 0
+        self.resyncs = 0
+        self.slept = 0.0
+        self.started = None
+
+        self.attached = False
+
+    def attach(self):
+        """
+        Pace at every frame boundary. Add it after the other frame handlers, so audio and input are handled first.
+        """
+        if not self.attached:
+            self.video.frame_handlers.append(self.frame)
+            self.attached = True
+        return self
+
+    def detach(self):
+        if self.attached:
+            self.video.frame_handlers.remove(self.frame)
+            self.attached = False
+
+    def set_speed(self, speed):
+        """
+        Change the speed, starting a new schedule from the next frame
+        :param speed: Multiple of real time, UNCAPPED for no pacing
+        """
+        if speed < 0:
+            raise ValueError('Speed must not be negative')
+        self.speed = speed
+        self.anchor = None
+
+    def get_frame_period(self):
+        return 1.0 / (self.video.vert_sync_hz * self.speed)
+
+    def frame(self):
+        now = self.clock()
+        if self.started is None:
+            self.started = now
+        self.frames_total += 1
+        if self.speed == self.UNCAPPED:
+            return
+
+        if self.anchor is None:
+            self.anchor = now
+            self.frames = 0
+            return
+
+        self.frames += 1
+        due = self.anchor + self.frames * self.get_frame_period()
+        ahead = due - now
+        if ahead > 0:
+            self.sleep(ahead)
+            self.slept += ahead
+        elif -ahead > self.MAX_LAG:
+            # The host can not keep up, or the process was suspended. Start over instead of bursting.
+            self.resyncs += 1
+            self.anchor = now
+            self.frames = 0
+        else:
+            self.late_frames += 1
+
+    def get_stats(self):
+        elapsed = self.clock() - self.started if self.started is not None else 0.0
+        return {
+            'speed': self.speed,
+            'frames': self.frames_total,
+            'fps': self.frames_total / elapsed if elapsed > 0 else 0.0,
+            'late_frames': self.late_frames,
+            'resyncs': self.resyncs,
+            'slept': self.slept,
+            'idle': self.slept / elapsed if elapsed > 0 else 0.0,
+        }
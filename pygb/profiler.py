@@ -0,0 +1,347 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import sys
+import bisect
+import argparse
+import contextlib
+import collections
+
+# Emulator modules are imported where they are needed, so main can turn DEBUG off before the memory map is printed
+
+
+class ProfilerException(Exception):
+    """
+    Profiler exception
+    """
+    pass
+
+
+class SymbolTable:
+    """
+    Function names from an RGBDS or no$gmb .sym file, lines of 'BB:AAAA Name'.
+    Local labels (Name.local) are left out, so their samples count towards the function they are in.
+    """
+    def __init__(self):
+        # Bank: (sorted addresses, names)
+        self.banks = {}
+
+    @staticmethod
+    def load(path):
+        table = SymbolTable()
+        with open(path, 'r', errors='replace') as f:
+            table.parse(f)
+        return table
+
+    def parse(self, lines):
+        entries = collections.defaultdict(list)
+        for line in lines:
+            line = line.split(';', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            if len(parts) < 2 or ':' not in parts[0]:
+                continue
+            bank, _, address = parts[0].partition(':')
+            name = parts[1]
+            if '.' in name:
+                continue
+            try:
+                entries[int(bank, 16)].append((int(address, 16), name))
+            except ValueError:
+                raise ProfilerException('Bad symbol line: {}'.format(line))
+        for bank, symbols in entries.items():
+            symbols.sort()
+            self.banks[bank] = ([address for address, _ in symbols], [name for _, name in symbols])
+
+    def lookup(self, bank, address):
+        """
+        :return: The name of the closest symbol at or before the address in the bank, or None
+        """
+        symbols = self.banks.get(bank)
+        if symbols is None:
+            return None
+        index = bisect.bisect_right(symbols[0], address) - 1
+        return symbols[1][index] if index >= 0 else None
+
+
+# Opcodes which push a return address and jump: CALL, CALL cc and RST
+CALL_OPCODES = (0xCD, 0xC4, 0xCC, 0xD4, 0xDC) + tuple(range(0xC7, 0x100, 8))
+
+# Opcodes which may pop a return address: RET, RET cc and RETI
+RET_OPCODES = (0xC9, 0xD9, 0xC0, 0xC8, 0xD0, 0xD8)
+
+# Interrupt routine name, dispatch method of Interrupts and vector
+INTERRUPT_VECTORS = (('vblank', 0x0040), ('lcd_stat', 0x0048), ('timer', 0x0050), ('serial', 0x0058),
+                     ('joypad', 0x0060))
+
+
+def get_bank(address):
+    """
+    The rom bank an address is in. Banking controllers are not emulated, the switchable area always holds bank 1.
+    """
+    from pygb.memory.memory import MemoryLocations
+
+    if address < MemoryLocations.switch_rom_bank_addr:
+        return 0
+    if address < MemoryLocations.video_ram_addr:
+        return 1
+    return 0
+
+
+class Profiler:
+    """
+    Sampling profiler of the guest program. A scheduler event records the program counter every interval cycles,
+    so the cost does not depend on how many instructions run. A shadow call stack is kept by wrapping the call and
+    return instructions, and the interrupt dispatch, which only run a small fraction of the time.
+    """
+    DEFAULT_INTERVAL = 4096
+
+    # Shadow stacks deeper than this are a sign the program is not returning the normal way
+    MAX_DEPTH = 64
+
+    # The profiler whose call stack wrappers are in the shared instruction table. Only one at a time, wrappers
+    # unwound out of order would leave a stale one behind.
+    wrapping = None
+
+    def __init__(self, gb, interval=DEFAULT_INTERVAL, symbols=None, call_stacks=True):
+        """
+        :param gb: The GameBoy to profile
+        :param interval: Cycles between samples
+        :param symbols: SymbolTable to name functions with, addresses are shown as BB:AAAA otherwise
+        :param call_stacks: Keep a shadow call stack for the collapsed stack output
+        """
+        self.gb = gb
+        self.interval = interval
+        self.symbols = symbols
+        self.call_stacks = call_stacks
+
+        # (bank, pc) samples
+        self.samples = collections.Counter()
+
+        # (stack of (bank, call target), bank, pc) samples
+        self.stack_samples = collections.Counter()
+
+        # Shadow stack of (bank, call target, stack pointer after the call)
+        self.stack = []
+
+        self.event = None
+        self.armed_heap = None
+        self.wrapped = {}
+        self.wrapped_interrupts = []
+        self.attached = False
+
+    def attach(self):
+        if self.attached:
+            return self
+        if self.call_stacks and Profiler.wrapping is not None:
+            raise ProfilerException('Another profiler is already keeping call stacks in this process')
+        self.attached = True
+        self.arm(self.gb.cpu.cycles)
+        self.gb.video.frame_handlers.append(self.rearm)
+        if self.call_stacks:
+            self.wrap_instructions()
+        return self
+
+    def detach(self):
+        if not self.attached:
+            return
+        self.attached = False
+        self.gb.scheduler.cancel(self.event)
+        self.gb.video.frame_handlers.remove(self.rearm)
+        from pygb.cpu.instructions.instructions import instructions
+        for opcode, execute in self.wrapped.items():
+            instructions[opcode].execute = execute
+        self.wrapped = {}
+        if Profiler.wrapping is self:
+            Profiler.wrapping = None
+        for name in self.wrapped_interrupts:
+            del self.gb.cpu.interrupts.__dict__[name]
+        self.wrapped_interrupts = []
+
+    def arm(self, cycle):
+        self.event = self.gb.scheduler.schedule(cycle + self.interval, self.sample)
+        self.armed_heap = self.gb.scheduler.events
+
+    def rearm(self):
+        # Resets empty the scheduler, and the sampling event with it
+        if self.gb.scheduler.events is not self.armed_heap:
+            self.arm(self.gb.cpu.cycles)
+
+    def sample(self, cycle):
+        pc = self.gb.cpu.registers.get_pc()
+        location = (get_bank(pc), pc)
+        self.samples[location] += 1
+        if self.call_stacks:
+            stack = self.stack
+            if stack:
+                # Return addresses the program dropped without returning, by moving SP itself
+                sp = self.gb.cpu.registers.get_sp()
+                while stack and stack[-1][2] < sp:
+                    stack.pop()
+            self.stack_samples[(tuple(frame[:2] for frame in stack),) + location] += 1
+        self.arm(cycle)
+
+    def wrap_instructions(self):
+        """
+        Wrap the implemented call and return instructions. The instruction table is shared, so the wrappers
+        check they are running on the profiled CPU.
+        """
+        from pygb.cpu.instructions.instructions import instructions
+        from pygb.cpu.instructions.misc import nop
+
+        Profiler.wrapping = self
+        registers = self.gb.cpu.registers
+        stack = self.stack
+
+        def wrap_call(execute):
+            def call(inst, reg, mem):
+                sp = reg.get_sp()
+                execute(inst, reg, mem)
+                if reg is registers and reg.get_sp() == (sp - 2) & 0xFFFF and len(stack) < self.MAX_DEPTH:
+                    target = reg.get_pc()
+                    stack.append((get_bank(target), target, reg.get_sp()))
+            return call
+
+        def wrap_ret(execute):
+            def ret(inst, reg, mem):
+                sp = reg.get_sp()
+                execute(inst, reg, mem)
+                if reg is registers and reg.get_sp() == (sp + 2) & 0xFFFF:
+                    new_sp = reg.get_sp()
+                    while stack and stack[-1][2] < new_sp:
+                        stack.pop()
+            return ret
+
+        for opcodes, wrap in ((CALL_OPCODES, wrap_call), (RET_OPCODES, wrap_ret)):
+            for opcode in opcodes:
+                execute = instructions[opcode].execute
+                # Unimplemented instructions must still be reported as such by the CPU
+                if execute is not nop:
+                    self.wrapped[opcode] = execute
+                    instructions[opcode].execute = wrap(execute)
+
+        interrupts = self.gb.cpu.interrupts
+        for name, vector in INTERRUPT_VECTORS:
+            def dispatch(handler=getattr(interrupts, name), vector=vector):
+                handler()
+                # Only a dispatch which actually jumped to the vector enters the routine
+                if registers.get_pc() == vector and len(stack) < self.MAX_DEPTH:
+                    stack.append((0, vector, registers.get_sp()))
+            setattr(interrupts, name, dispatch)
+            self.wrapped_interrupts.append(name)
+
+    def get_name(self, bank, address):
+        name = self.symbols.lookup(bank, address) if self.symbols is not None else None
+        return name if name is not None else '{:02X}:{:04X}'.format(bank, address)
+
+    def get_flat(self):
+        """
+        :return: List of (name, self samples, total samples) by self samples, total counts every sample with the
+                 function anywhere on the stack
+        """
+        self_counts = collections.Counter()
+        for (bank, pc), count in self.samples.items():
+            self_counts[self.get_name(bank, pc)] += count
+
+        total_counts = collections.Counter()
+        for key, count in self.stack_samples.items():
+            names = {self.get_name(bank, address) for bank, address in key[0]}
+            names.add(self.get_name(key[1], key[2]))
+            for name in names:
+                total_counts[name] += count
+        if not self.stack_samples:
+            total_counts = self_counts
+
+        names = set(self_counts) | set(total_counts)
+        return sorted(((name, self_counts[name], total_counts[name]) for name in names),
+                      key=lambda entry: (-entry[1], -entry[2], entry[0]))
+
+    def format_flat(self, limit=30):
+        total = sum(self.samples.values())
+        lines = ['{:>8} {:>7} {:>8} {:>7}  {}'.format('self', 'self%', 'total', 'total%', 'function')]
+        for name, count, inclusive in self.get_flat()[:limit]:
+            lines.append('{:>8} {:>6.1%} {:>8} {:>6.1%}  {}'.format(
+                count, count / total if total else 0, inclusive, inclusive / total if total else 0, name))
+        lines.append('{} samples, every {} cycles'.format(total, self.interval))
+        return '\n'.join(lines)
+
+    def get_collapsed(self):
+        """
+        :return: Collapsed stack lines, 'outer;inner;leaf count', for flamegraph tools
+        """
+        counts = collections.Counter()
+        for (frames, bank, pc), count in self.stack_samples.items():
+            names = [self.get_name(frame_bank, address) for frame_bank, address in frames]
+            leaf = self.get_name(bank, pc)
+            # Samples inside a function the stack already names are not a deeper frame
+            if not names or names[-1] != leaf:
+                names.append(leaf)
+            counts[';'.join(names)] += count
+        return ['{} {}'.format(stack, count) for stack, count in sorted(counts.items())]
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as f:
+            for line in self.get_collapsed():
+                f.write(line + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile where a rom spends its time.')
+    parser.add_argument('--rom', dest='rom', action='store', required=True, help='The rom to load')
+    parser.add_argument('--sym', dest='sym', action='store', default='', help='RGBDS or no$gmb .sym file')
+    parser.add_argument('--frames', dest='frames', action='store', type=int, default=600, help='Frames to run')
+    parser.add_argument('--interval', dest='interval', action='store', type=int, default=Profiler.DEFAULT_INTERVAL,
+                        help='Cycles between samples')
+    parser.add_argument('--collapsed', dest='collapsed', action='store', default='',
+                        help='Write collapsed stacks for flamegraph tools here')
+    parser.add_argument('--limit', dest='limit', action='store', type=int, default=30,
+                        help='Functions in the flat report')
+    args = parser.parse_args(argv)
+
+    import pygb.settings
+    pygb.settings.DEBUG = False
+    from pygb.gameboy import GameBoy
+    from pygb.utility import GBTypes
+
+    gb = GameBoy(GBTypes.gameboy_classic)
+    with contextlib.redirect_stdout(io.StringIO()):
+        gb.load_rom(args.rom)
+    symbols = SymbolTable.load(args.sym) if len(args.sym) > 0 else None
+    profiler = Profiler(gb, args.interval, symbols).attach()
+    try:
+        gb.run_frames(args.frames)
+    finally:
+        profiler.detach()
+        print(profiler.format_flat(args.limit))
+        if len(args.collapsed) > 0:
+            profiler.write_collapsed(args.collapsed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import queue
+import threading
+import zlib
+from collections import deque
+
+from pygb.state import SaveState
+
+
+class RewindGroup:
+    """
+    A keyframe and the frames after it, each stored as a compressed XOR against the keyframe
+    """
+    def __init__(self, keyframe):
+        self.keyframe = keyframe
+        self.deltas = []
+        self.size = len(keyframe)
+
+
+class RewindBuffer:
+    """
+    Keeps the last few seconds of per frame snapshots so play can be rewound.
+    At each frame the emulation thread only takes a save state into a preallocated buffer and queues it. A background
+    thread XORs it against the last keyframe, compresses it and stores it, dropping the oldest groups once over the
+    frame count or memory budget.
+    """
+    # zlib level, the deltas are mostly zeros so the fastest level does well
+    COMPRESSION_LEVEL = 1
+
+    def __init__(self, gb, seconds=10.0, keyframe_interval=60, max_bytes=32 << 20, queue_size=8):
+        self.gb = gb
+        self.max_frames = int(seconds * gb.video.vert_sync_hz)
+        self.keyframe_interval = keyframe_interval
+        self.max_bytes = max_bytes
+
+        # Snapshot buffers cycle between the free pool and the work queue, nothing is allocated per frame
+        self.free = queue.Queue()
+        for _ in range(queue_size):
+            self.free.put(SaveState.allocate())
+        self.work = queue.Queue()
+
+        self.lock = threading.Lock()
+        self.groups = deque()
+        self.num_frames = 0
+        self.num_bytes = 0
+
+        # Raw state of the newest keyframe, the base for new deltas
+        self.keyframe_raw = None
+
+        self.dropped = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.process, name='RewindBuffer', daemon=True)
+        self.thread.start()
+        self.gb.video.frame_handlers.append(self.capture)
+        return self
+
+    def close(self):
+        if self.thread is not None:
+            self.gb.video.frame_handlers.remove(self.capture)
+            self.work.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def capture(self):
+        """
+        Frame handler, snapshot the machine and hand it to the background thread
+        """
+        try:
+            buffer = self.free.get_nowait()
+        except queue.Empty:
+            # The background thread is behind, skip this frame rather than wait
+            self.dropped += 1
+            return
+        self.work.put(self.gb.save_state(buffer))
+
+    def process(self):
+        while True:
+            buffer = self.work.get()
+            if buffer is None:
+                self.work.task_done()
+                return
+            with self.lock:
+                self.store(buffer)
+            self.free.put(buffer)
+            self.work.task_done()
+
+    def store(self, buffer):
+        if self.keyframe_raw is None or not self.groups or \
+                len(self.groups[-1].deltas) + 1 >= self.keyframe_interval:
+            self.keyframe_raw = bytes(buffer)
+            self.groups.append(RewindGroup(zlib.compress(self.keyframe_raw, self.COMPRESSION_LEVEL)))
+            self.num_bytes += self.groups[-1].size
+        else:
+            delta = int.from_bytes(buffer, 'little') ^ int.from_bytes(self.keyframe_raw, 'little')
+            compressed = zlib.compress(delta.to_bytes(SaveState.SIZE, 'little'), self.COMPRESSION_LEVEL)
+            group = self.groups[-1]
+            group.deltas.append(compressed)
+            group.size += len(compressed)
+            self.num_bytes += len(compressed)
+        self.num_frames += 1
+
+        # Evict whole groups, deltas are useless without their keyframe
+        while len(self.groups) > 1 and (self.num_frames > self.max_frames or self.num_bytes > self.max_bytes):
+            group = self.groups.popleft()
+            self.num_frames -= 1 + len(group.deltas)
+            self.num_bytes -= group.size
+
+    def rewind(self, frames=1):
+        """
+        Restore the machine to an earlier frame, discarding everything after it
+        :param frames: How many captured frames to go back, 1 is the most recent
+        :return: True if the state was restored, False if there is not that much history
+        """
+        # Make sure every frame captured so far is stored
+        self.work.join()
+        with self.lock:
+            if frames < 1 or frames > self.num_frames:
+                return False
+
+            for _ in range(frames - 1):
+                self.pop()
+            state = self.pop()
+            # The restored frame is kept, so it can be returned to again
+            self.store(state)
+        self.gb.load_state(state)
+        return True
+
+    def pop(self):
+        """
+        Remove and decode the newest snapshot
+        """
+        group = self.groups[-1]
+        keyframe = zlib.decompress(group.keyframe)
+        if group.deltas:
+            compressed = group.deltas.pop()
+            group.size -= len(compressed)
+            self.num_bytes -= len(compressed)
+            delta = int.from_bytes(zlib.decompress(compressed), 'little')
+            state = (delta ^ int.from_bytes(keyframe, 'little')).to_bytes(SaveState.SIZE, 'little')
+        else:
+            self.groups.pop()
+            self.num_bytes -= group.size
+            state = keyframe
+        self.num_frames -= 1
+        self.keyframe_raw = zlib.decompress(self.groups[-1].keyframe) if self.groups else None
+        return state
+
+    def get_stats(self):
+        with self.lock:
+            return {'frames': self.num_frames,
+                    'bytes': self.num_bytes,
+                    'groups': len(self.groups),
+                    'dropped': self.dropped}
@@ -0,0 +1,143 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import heapq
+
+
+class Scheduler:
+    """
+    Cycle timestamp event scheduler for the hardware sub systems.
+    Events are kept in a min heap ordered by the cycle they are due on. The CPU runs straight through until the
+    earliest deadline, then every due event is run. Cancelled events are left in the heap and skipped when they surface.
+    """
+    # Returned as the deadline when nothing is scheduled
+    NEVER = float('inf')
+
+    # Once the cycle counter passes the threshold, every timestamp is shifted down so the counters stay small ints.
+    # Shifts are a multiple of the alignment so divider and sample boundaries do not move.
+    REBASE_THRESHOLD = 1 << 30
+    REBASE_ALIGN = 0x10000
+
+    # Event list indices
+    EVENT_CYCLE = 0
+    EVENT_CALLBACK = 2
+    EVENT_ACTIVE = 3
+
+    def __init__(self):
+        # Heap of [cycle, sequence, callback, active]. The sequence keeps events due on the same cycle in the order
+        # they were scheduled.
+        self.events = []
+        self.sequence = 0
+
+        # The cycle of the earliest event, the CPU loop compares against this
+        self.deadline = self.NEVER
+
+        # Callables taking the cycle delta, for sub systems which hold their own timestamps
+        self.rebase_handlers = []
+
+        # Cycles taken off the counter by rebases and moves, so cycle counter + offset only ever counts up
+        self.offset = 0
+
+    def reset(self):
+        self.events = []
+        self.sequence = 0
+        self.deadline = self.NEVER
+
+    def schedule(self, cycle, callback):
+        """
+        Run callback(cycle) once the cycle counter reaches cycle
+        :return: The event, which can be passed to cancel
+        """
+        event = [cycle, self.sequence, callback, True]
+        self.sequence += 1
+        heapq.heappush(self.events, event)
+        if cycle < self.deadline:
+            self.deadline = cycle
+        return event
+
+    @staticmethod
+    def cancel(event):
+        """
+        Cancel a scheduled event. Cancelling an event which already ran or was cancelled does nothing.
+        """
+        if event is not None:
+            event[Scheduler.EVENT_ACTIVE] = False
+
+    def update_deadline(self):
+        events = self.events
+        while events and not events[0][self.EVENT_ACTIVE]:
+            heapq.heappop(events)
+        self.deadline = events[0][self.EVENT_CYCLE] if events else self.NEVER
+        return self.deadline
+
+    def run_due(self, now):
+        """
+        Run every event due at or before now, including ones scheduled by the events themselves
+        :param now: The current cycle
+        """
+        events = self.events
+        offset = self.offset
+        while events and events[0][self.EVENT_CYCLE] <= now:
+            event = heapq.heappop(events)
+            if event[self.EVENT_ACTIVE]:
+                event[self.EVENT_ACTIVE] = False
+                event[self.EVENT_CALLBACK](event[self.EVENT_CYCLE])
+                if self.offset != offset:
+                    # The event loaded a state, which moved the cycle counter and the events with it
+                    now += offset - self.offset
+                    offset = self.offset
+                if self.events is not events:
+                    # The event reset the scheduler, what is left belongs to the new timeline
+                    break
+        self.update_deadline()
+
+    def needs_rebase(self, now):
+        return now >= self.REBASE_THRESHOLD
+
+    def get_rebase_delta(self, now):
+        return now - now % self.REBASE_ALIGN
+
+    def rebase(self, delta):
+        """
+        Shift every timestamp down by delta cycles. The caller shifts the cycle counter itself.
+        """
+        # Shifting every entry by the same amount keeps the heap ordered
+        for event in self.events:
+            event[self.EVENT_CYCLE] -= delta
+        for handler in self.rebase_handlers:
+            handler(delta)
+        self.offset += delta
+        self.update_deadline()
+
+    def move(self, delta):
+        """
+        Shift every event by delta cycles, because the cycle counter is being set to a new value, like on a state
+        load. Events keep their distance from the counter. Sub systems holding timestamps set them themselves.
+        """
+        for event in self.events:
+            event[self.EVENT_CYCLE] += delta
+        self.offset -= delta
+        self.update_deadline()
@@ -0,0 +1,206 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import select
+import socket
+import time
+
+
+class SerialLink:
+    """
+    Something plugged into the serial port
+    """
+    # Links to other processes must be polled to answer transfers clocked by the other side
+    needs_polling = False
+
+    def exchange(self, byte):
+        """
+        We clocked a transfer. The base link behaves like an unplugged cable.
+        :param byte: The byte sent
+        :return: The byte received
+        """
+        return 0xFF
+
+    def poll(self, serial):
+        pass
+
+    def close(self):
+        pass
+
+
+class CaptureLink(SerialLink):
+    """
+    Records every byte sent, for test ROMs which print their results over serial. Bytes are passed on to another link
+    if one is given, otherwise nothing is connected at the other end.
+    """
+    def __init__(self, link=None):
+        self.link = link
+        self.needs_polling = link is not None and link.needs_polling
+        self.buffer = bytearray()
+
+    def exchange(self, byte):
+        self.buffer.append(byte)
+        if self.link is not None:
+            return self.link.exchange(byte)
+        return 0xFF
+
+    def poll(self, serial):
+        if self.link is not None:
+            self.link.poll(serial)
+
+    def get_text(self):
+        return self.buffer.decode('latin-1')
+
+    def clear(self):
+        del self.buffer[:]
+
+
+class LocalLink(SerialLink):
+    """
+    A cable to another GameBoy in the same process. The other side answers immediately with whatever is in its SB.
+    """
+    def __init__(self, peer):
+        self.peer = peer
+
+    def exchange(self, byte):
+        return self.peer.receive(byte)
+
+    @staticmethod
+    def connect(serial_a, serial_b):
+        """
+        Link two serial ports together
+        """
+        serial_a.connect(LocalLink(serial_b))
+        serial_b.connect(LocalLink(serial_a))
+
+
+class StreamLink(SerialLink):
+    """
+    A cable to a GameBoy in another process, over a Unix socket or a pair of pipes.
+    Each transfer is one 2 byte message, answered by a 2 byte reply. The clocking side waits for the reply. The
+    other side answers when it polls, which it does while waiting on the external clock and at every frame.
+    """
+    needs_polling = True
+
+    MSG_TRANSFER = 0x54
+    MSG_REPLY = 0x52
+
+    # Seconds to wait for the other side to reply before treating the cable as unplugged
+    TIMEOUT = 1.0
+
+    def __init__(self, read_fd, write_fd, owner=None):
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+
+        # Keeps a socket alive for as long as the link
+        self.owner = owner
+
+        self.inbox = bytearray()
+
+        # Replies still to arrive for transfers which crossed with one from the other side
+        self.stale_replies = 0
+
+    @staticmethod
+    def listen_unix(path):
+        """
+        Wait for the other process to connect over a Unix socket
+        """
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+        connection, _ = server.accept()
+        server.close()
+        return StreamLink(connection.fileno(), connection.fileno(), connection)
+
+    @staticmethod
+    def connect_unix(path):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(path)
+        return StreamLink(connection.fileno(), connection.fileno(), connection)
+
+    def send(self, kind, byte):
+        os.write(self.write_fd, bytes((kind, byte)))
+
+    def read_message(self, timeout):
+        """
+        :param timeout: Seconds to wait, 0 to only check
+        :return: A (kind, byte) message, or None if none arrived in time
+        """
+        while len(self.inbox) < 2:
+            ready, _, _ = select.select([self.read_fd], [], [], timeout)
+            if not ready:
+                return None
+            data = os.read(self.read_fd, 0x100)
+            if not data:
+                return None
+            self.inbox += data
+        message = (self.inbox[0], self.inbox[1])
+        del self.inbox[:2]
+        return message
+
+    def exchange(self, byte):
+        self.send(self.MSG_TRANSFER, byte)
+        deadline = time.monotonic() + self.TIMEOUT
+        while True:
+            message = self.read_message(max(0.0, deadline - time.monotonic()))
+            if message is None:
+                return 0xFF
+            kind, data = message
+            if kind == self.MSG_REPLY:
+                if self.stale_replies:
+                    self.stale_replies -= 1
+                    continue
+                return data
+            if kind == self.MSG_TRANSFER:
+                # Both sides clocked at once, swap bytes and drop the reply to our own transfer when it comes
+                self.send(self.MSG_REPLY, byte)
+                self.stale_replies += 1
+                return data
+
+    def poll(self, serial):
+        while True:
+            message = self.read_message(0)
+            if message is None:
+                return
+            kind, data = message
+            if kind == self.MSG_TRANSFER:
+                self.send(self.MSG_REPLY, serial.receive(data))
+            elif self.stale_replies:
+                self.stale_replies -= 1
+
+    def close(self):
+        if self.owner is not None:
+            self.owner.close()
+            self.owner = None
+        elif self.read_fd is not None:
+            os.close(self.read_fd)
+            if self.write_fd != self.read_fd:
+                os.close(self.write_fd)
+        self.read_fd = None
+        self.write_fd = None
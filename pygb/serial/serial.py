@@ -0,0 +1,159 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+class Serial:
+    """
+    The serial link port.
+    A transfer is a single scheduled event, 8 bit clocks after it is started. The byte is exchanged with whatever is
+    plugged into the port (see pygb.serial.link) only when the transfer completes, so linked instances synchronize once
+    per byte rather than per cycle.
+    """
+    SB_ADDR = 0xFF01  # Serial transfer data (R/W)
+
+    # Bit 7 starts a transfer and reads 1 until it completes. Bit 0 selects the internal clock (this GameBoy is the
+    # master) or the external clock from the other GameBoy.
+    SC_ADDR = 0xFF02  # Serial Transfer Control (R/W)
+    SC_TRANSFER_START = 0x80
+    SC_INTERNAL_CLOCK = 0x01
+
+    # The internal clock runs at 8192Hz
+    CYCLES_PER_BIT = 512
+    TRANSFER_CYCLES = CYCLES_PER_BIT * 8
+
+    # What is read when nothing is connected
+    DISCONNECTED_BYTE = 0xFF
+
+    def __init__(self, memory_space, interrupts, scheduler, cpu):
+        self.memory = memory_space
+        self.interrupts = interrupts
+        self.scheduler = scheduler
+        self.cpu = cpu
+
+        # The device plugged into the port, None if disconnected
+        self.link = None
+
+        # The cycle the transfer we clocked completes on, None if there is none
+        self.transfer_end = None
+        self.transfer_event = None
+        self.poll_event = None
+
+        memory_space.io_write_handlers[self.SC_ADDR] = self.write_sc
+        scheduler.rebase_handlers.append(self.rebase)
+
+    def reset(self, gb_type):
+        self.transfer_end = None
+        self.transfer_event = None
+        self.poll_event = None
+
+    def rebase(self, delta):
+        if self.transfer_end is not None:
+            self.transfer_end -= delta
+
+    def restore_transfer(self, transfer_end):
+        """
+        Re-schedule a transfer in flight, after a state load. Whatever was scheduled before the load is dropped.
+        """
+        self.scheduler.cancel(self.transfer_event)
+        self.scheduler.cancel(self.poll_event)
+        self.transfer_end = transfer_end
+        self.transfer_event = None
+        self.poll_event = None
+        if transfer_end is not None:
+            self.transfer_event = self.scheduler.schedule(transfer_end, self.complete_transfer)
+
+    def connect(self, link):
+        """
+        Plug a link into the port
+        :param link: A SerialLink, or None to disconnect
+        :return: The link
+        """
+        self.link = link
+        return link
+
+    def is_waiting(self):
+        """
+        :return: True if a transfer was started on the external clock and the other side has not clocked it yet
+        """
+        sc = self.memory.mem[self.SC_ADDR]
+        return bool(sc & self.SC_TRANSFER_START) and not sc & self.SC_INTERNAL_CLOCK
+
+    def write_sc(self, address, byte):
+        self.scheduler.cancel(self.transfer_event)
+        self.scheduler.cancel(self.poll_event)
+        self.transfer_end = None
+        self.transfer_event = None
+        self.poll_event = None
+
+        if byte & self.SC_TRANSFER_START:
+            if byte & self.SC_INTERNAL_CLOCK:
+                # Our clock is the CPU clock, twice as fast in double speed mode
+                self.transfer_end = self.cpu.cycles + (self.TRANSFER_CYCLES >> self.cpu.speed_shift)
+                self.transfer_event = self.scheduler.schedule(self.transfer_end, self.complete_transfer)
+            elif self.link is not None and self.link.needs_polling:
+                self.poll_event = self.scheduler.schedule(self.cpu.cycles + self.TRANSFER_CYCLES, self.poll)
+
+    def complete_transfer(self, cycle):
+        """
+        The 8 bits of a transfer we clocked have been shifted, swap bytes with the other side
+        """
+        self.transfer_end = None
+        self.transfer_event = None
+        sent = self.memory.mem[self.SB_ADDR]
+        received = self.link.exchange(sent) if self.link is not None else self.DISCONNECTED_BYTE
+        self.finish_transfer(received)
+
+    def finish_transfer(self, received):
+        self.memory.mem[self.SB_ADDR] = received
+        self.memory.mem[self.SC_ADDR] &= ~self.SC_TRANSFER_START
+        self.interrupts.request(self.memory, self.interrupts.INTERRUPT_SERIAL)
+
+    def receive(self, byte):
+        """
+        The other side clocked a transfer
+        :param byte: The byte it sent
+        :return: The byte we send back
+        """
+        if not self.is_waiting():
+            return self.DISCONNECTED_BYTE
+        sent = self.memory.mem[self.SB_ADDR]
+        self.finish_transfer(byte)
+        return sent
+
+    def poll(self, cycle=None):
+        """
+        Service transfers from a link in another process. Runs every transfer period while we wait on the external
+        clock, and at every frame boundary.
+        """
+        if self.link is None or not self.link.needs_polling:
+            return
+        self.link.poll(self)
+
+        # Called as our own event rather than from the frame boundary, keep polling while we wait
+        if cycle is not None:
+            self.poll_event = None
+            if self.is_waiting():
+                self.poll_event = self.scheduler.schedule(cycle + self.TRANSFER_CYCLES, self.poll)
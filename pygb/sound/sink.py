@@ -0,0 +1,288 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import sys
+import time
+import wave
+import operator
+import threading
+from array import array
+from itertools import repeat
+
+
+class Capabilities:
+    """
+    Output formats supported by the audio sinks
+    """
+    sample_rates = (44100, 48000)
+    num_channels = 2
+    sample_width = 2  # Signed 16 bit
+
+
+class AudioRingBuffer:
+    """
+    Preallocated single producer, single consumer ring of interleaved signed 16 bit samples.
+    The producer only ever moves the write count and the consumer only the read count, so neither side takes a lock.
+    A block which does not fit is dropped and counted as an overrun, the producer never waits.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = array('h', bytes(capacity * 2))
+
+        # Total samples ever written and read, the difference is the fill level
+        self.write_count = 0
+        self.read_count = 0
+
+        self.overruns = 0
+        self.dropped_samples = 0
+
+    def get_fill(self):
+        return self.write_count - self.read_count
+
+    def push(self, samples):
+        """
+        Called from the emulation thread
+        :param samples: array('h') of interleaved samples
+        :return: True if the block was queued, False if it was dropped
+        """
+        count = len(samples)
+        if count > self.capacity - (self.write_count - self.read_count):
+            self.overruns += 1
+            self.dropped_samples += count
+            return False
+
+        start = self.write_count % self.capacity
+        first = min(count, self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        if first < count:
+            self.buffer[0:count - first] = samples[first:]
+
+        # Publish only once the samples are in place
+        self.write_count += count
+        return True
+
+    def pop(self):
+        """
+        Called from the drain thread
+        :return: array('h') of every sample queued so far
+        """
+        count = self.write_count - self.read_count
+        if not count:
+            return array('h')
+
+        start = self.read_count % self.capacity
+        first = min(count, self.capacity - start)
+        out = self.buffer[start:start + first]
+        if first < count:
+            out += self.buffer[0:count - first]
+
+        self.read_count += count
+        return out
+
+
+class Resampler:
+    """
+    Linear interpolating resampler for interleaved stereo, keeping its position across blocks.
+    Positions are fixed point, so a whole block is interpolated by map over ranges with no Python level loop.
+    """
+    # Fractional bits of the fixed point positions, enough that the rate does not drift over hours
+    FRACTION_BITS = 32
+
+    def __init__(self, source_rate, target_rate, num_channels=Capabilities.num_channels):
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.num_channels = num_channels
+
+        # Source frames consumed per output frame
+        self.step = (source_rate << self.FRACTION_BITS) // target_rate
+
+        # Position of the next output frame, in source frames from the start of the held back samples
+        self.position = 0
+        self.held = array('h')
+
+    def process(self, samples):
+        if self.source_rate == self.target_rate:
+            return samples
+
+        num_channels = self.num_channels
+        bits = self.FRACTION_BITS
+        data = self.held + samples
+        num_frames = len(data) // num_channels
+
+        # Interpolation needs the frame after the one a sample lands on
+        step = self.step
+        limit = (num_frames - 1) << bits
+        count = max(0, -((self.position - limit) // step))
+        positions = range(self.position, self.position + count * step, step)
+        indices = list(map(operator.rshift, positions, repeat(bits, count)))
+        weights = list(map(operator.and_, positions, repeat((1 << bits) - 1, count)))
+
+        out = array('h', bytes(count * num_channels * 2))
+        for channel in range(num_channels):
+            source = data[channel::num_channels]
+            first = list(map(source.__getitem__, indices))
+            second = map(source[1:].__getitem__, indices)
+            # first + (second - first) * weight, rounded down
+            out[channel::num_channels] = array('h', map(
+                operator.add, first,
+                map(operator.rshift, map(operator.mul, map(operator.sub, second, first), weights), repeat(bits))))
+
+        end = self.position + count * step
+        consumed = min(end >> bits, num_frames - 1) if num_frames else 0
+        self.position = end - (consumed << bits)
+        self.held = data[consumed * num_channels:]
+        return out
+
+
+class AudioSink:
+    """
+    Base for audio outputs. Frames from the sound sub system are queued into a ring buffer and written out by a
+    background thread, so the emulation thread only pays for one slice copy per frame.
+    """
+    # How long the drain thread sleeps when the ring is empty
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, source_rate, target_rate=44100, buffer_seconds=2.0):
+        if target_rate not in Capabilities.sample_rates:
+            raise AudioSinkException('Unsupported sample rate {}, expected one of {}'.format(
+                target_rate, Capabilities.sample_rates))
+
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.ring = AudioRingBuffer(int(source_rate * buffer_seconds) * Capabilities.num_channels)
+        self.resampler = Resampler(source_rate, target_rate)
+
+        self.running = False
+        self.thread = None
+        self.samples_written = 0
+
+    def start(self):
+        self.open()
+        self.running = True
+        self.thread = threading.Thread(target=self.drain, name=type(self).__name__, daemon=True)
+        self.thread.start()
+        return self
+
+    def write_frame(self, samples):
+        """
+        Queue a frame of interleaved stereo samples. Never blocks.
+        """
+        self.ring.push(samples)
+
+    def drain(self):
+        while True:
+            running = self.running
+            samples = self.ring.pop()
+            if samples:
+                out = self.resampler.process(samples)
+                self.write_samples(out)
+                self.samples_written += len(out)
+            elif not running:
+                break
+            else:
+                time.sleep(self.POLL_INTERVAL)
+
+    def close(self):
+        """
+        Flush everything queued, stop the drain thread and close the output
+        """
+        if self.thread is not None:
+            self.running = False
+            self.thread.join()
+            self.thread = None
+            self.finish()
+            self.print_stats()
+
+    def get_stats(self):
+        return {'overruns': self.ring.overruns,
+                'dropped_samples': self.ring.dropped_samples,
+                'samples_written': self.samples_written}
+
+    def print_stats(self):
+        if self.ring.overruns:
+            print('Audio sink overruns: {}, dropped {} samples'.format(self.ring.overruns, self.ring.dropped_samples),
+                  file=sys.stderr)
+
+    def open(self):
+        pass
+
+    def write_samples(self, samples):
+        """
+        Write out a block of resampled samples, from the drain thread. The base sink has no output and drops them.
+        """
+        pass
+
+    def finish(self):
+        pass
+
+
+class WavSink(AudioSink):
+    """
+    Writes 16 bit stereo PCM to a WAV file
+    """
+    def __init__(self, path, source_rate, target_rate=44100, buffer_seconds=2.0):
+        super().__init__(source_rate, target_rate, buffer_seconds)
+        self.path = path
+        self.wav = None
+
+    def open(self):
+        self.wav = wave.open(self.path, 'wb')
+        self.wav.setnchannels(Capabilities.num_channels)
+        self.wav.setsampwidth(Capabilities.sample_width)
+        self.wav.setframerate(self.target_rate)
+
+    def write_samples(self, samples):
+        if sys.byteorder != 'little':
+            samples.byteswap()
+        self.wav.writeframesraw(samples.tobytes())
+
+    def finish(self):
+        self.wav.close()
+        self.wav = None
+
+
+class PipeSink(AudioSink):
+    """
+    Writes raw signed 16 bit little endian stereo PCM to a binary stream, stdout by default
+    """
+    def __init__(self, source_rate, target_rate=44100, stream=None, buffer_seconds=2.0):
+        super().__init__(source_rate, target_rate, buffer_seconds)
+        self.stream = stream if stream is not None else sys.stdout.buffer
+
+    def write_samples(self, samples):
+        if sys.byteorder != 'little':
+            samples.byteswap()
+        self.stream.write(samples.tobytes())
+
+    def finish(self):
+        self.stream.flush()
+
+
+class AudioSinkException(Exception):
+    """
+    Audio sink exception
+    """
+    pass
@@ -24,9 +24,494 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import math
+import operator
+from array import array
+from functools import lru_cache
+
 
 class Capabilities:
     """
     The capabilities of the GameBoy sound hardware
     """
     num_channels = 4
+
+    # Samples are synthesized at the CPU clock / 128, which is 32768Hz on a DMG
+    cycles_per_sample = 128
+
+    # Frame sequencer rates, in Hz
+    length_hz = 256
+    sweep_hz = 128
+    envelope_hz = 64
+
+# Channels render unsigned 8 bit samples centered on this value
+_SILENCE = 128
+
+# Per volume (0-15), maps a 4 bit DAC level to an unsigned channel sample
+_VOLUME_TABLES = [bytes(_SILENCE + ((2 * (level & 0x0F) - 15) * volume) // 2 for level in range(256))
+                  for volume in range(16)]
+
+# Per master volume (0-7), maps the sum of the 4 channel samples to a signed 16 bit output sample
+_MIX_TABLES = [[(total - Capabilities.num_channels * _SILENCE) * (volume + 1) * 9
+                for total in range(Capabilities.num_channels * 256)]
+               for volume in range(8)]
+
+# Square wave duty cycles, as 8 step sequences of DAC levels
+_DUTY_SEQUENCES = [bytes(15 * int(bit) for bit in duty) for duty in ('00000001', '10000001', '10000111', '01111110')]
+
+# Patterns are resampled across enough sequence periods to loop with under 0.05% pitch error
+_MIN_PATTERN = 1024
+_MAX_PATTERN = 0x10000
+
+
+@lru_cache(maxsize=8)
+def _noise_sequence(short_mode):
+    """
+    The full output sequence of the noise LFSR, 32767 steps in 15 bit mode or 127 steps in 7 bit mode
+    """
+    lfsr = 0x7FFF
+    out = bytearray()
+    for _ in range(127 if short_mode else 32767):
+        out.append(0 if lfsr & 0x01 else 15)
+        bit = (lfsr ^ (lfsr >> 1)) & 0x01
+        lfsr = (lfsr >> 1) | (bit << 14)
+        if short_mode:
+            lfsr = (lfsr & ~0x40) | (bit << 6)
+    return bytes(out)
+
+
+@lru_cache(maxsize=512)
+def _build_pattern(sequence, step_hz, sample_rate):
+    """
+    Resample a repeating step sequence (duty cycle, wave RAM, noise LFSR) to the output rate. The result spans whole
+    periods of the sequence so it loops seamlessly, making a run of samples a slice of the pattern.
+    :param sequence: bytes of DAC levels, one per step
+    :param step_hz: The rate the sequence is stepped at
+    :param sample_rate: The output sample rate
+    :return: bytes of DAC levels at the output rate
+    """
+    num_steps = len(sequence)
+    period = num_steps * sample_rate / step_hz
+    periods = max(1, int(math.ceil(_MIN_PATTERN / period)))
+    size = max(1, int(round(periods * period)))
+    if size > _MAX_PATTERN:
+        # Only the 15 bit LFSR at low rates gets here, looping it early is not audible
+        size = _MAX_PATTERN
+        steps_per_sample = step_hz / sample_rate
+    else:
+        steps_per_sample = periods * num_steps / size
+    return bytes(sequence[int(i * steps_per_sample) % num_steps] for i in range(size))
+
+
+def _take(pattern, start, count):
+    """
+    Slice count samples out of a looping pattern
+    """
+    size = len(pattern)
+    start %= size
+    end = start + count
+    if end <= size:
+        return pattern[start:end]
+    return (pattern * (end // size + 1))[start:end]
+
+
+class Channel:
+    """
+    A sound channel. Channels are only advanced when a frame is synthesized, and then a whole run of samples at a
+    time, between register writes and frame sequencer events (length, envelope and sweep).
+    """
+    # Register index used to forward NR52 writes
+    POWER = 7
+
+    # Length counter load is max_length - NRx1
+    max_length = 64
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.registers = bytearray(5)
+        self.enabled = False
+        self.phase = 0
+
+        # In samples
+        self.length_enabled = False
+        self.length_timer = 0
+
+        self.volume = 0
+        self.envelope_timer = 0
+
+    def reset(self, sample_rate):
+        self.__init__(sample_rate)
+
+    def get_frequency(self):
+        return self.registers[3] | ((self.registers[4] & 0x07) << 8)
+
+    def dac_enabled(self):
+        return bool(self.registers[2] & 0xF8)
+
+    def get_envelope_period(self):
+        return (self.registers[2] & 0x07) * (self.sample_rate // Capabilities.envelope_hz)
+
+    def write(self, index, value):
+        if index == self.POWER:
+            if not value & 0x80:
+                self.enabled = False
+            return
+
+        self.registers[index] = value
+        if index == 1:
+            self.length_timer = (self.max_length - (value & (self.max_length - 1))) * \
+                                (self.sample_rate // Capabilities.length_hz)
+        elif index == 2:
+            if not self.dac_enabled():
+                self.enabled = False
+        elif index == 4:
+            self.length_enabled = bool(value & 0x40)
+            if value & 0x80:
+                self.trigger()
+
+    def trigger(self):
+        self.enabled = self.dac_enabled()
+        if not self.length_timer:
+            self.length_timer = self.max_length * (self.sample_rate // Capabilities.length_hz)
+        self.volume = self.registers[2] >> 4
+        self.envelope_timer = self.get_envelope_period()
+        self.phase = 0
+
+    def next_event(self, count):
+        """
+        :return: The number of samples (at most count) which can be rendered before the channel state changes
+        """
+        if self.length_enabled and self.length_timer < count:
+            count = self.length_timer
+        if self.envelope_timer and self.envelope_timer < count:
+            count = self.envelope_timer
+        return count
+
+    def advance(self, count):
+        """
+        Run the frame sequencer units forward by count samples, ticking them if they expire
+        """
+        if self.length_enabled:
+            self.length_timer -= count
+            if self.length_timer <= 0:
+                self.length_timer = 0
+                self.enabled = False
+
+        if self.envelope_timer:
+            self.envelope_timer -= count
+            if not self.envelope_timer:
+                volume = self.volume + (1 if self.registers[2] & 0x08 else -1)
+                if 0 <= volume <= 15:
+                    self.volume = volume
+                    self.envelope_timer = self.get_envelope_period()
+
+    def get_pattern(self):
+        """
+        :return: The current output pattern in DAC levels, or None if the channel outputs nothing. The base channel
+        is silent.
+        """
+        return None
+
+    def get_volume_table(self):
+        return _VOLUME_TABLES[self.volume]
+
+    def render(self, count):
+        """
+        Synthesize count samples from the current state
+        :return: bytes of unsigned 8 bit samples
+        """
+        chunks = []
+        while count > 0:
+            run = max(1, self.next_event(count))
+            pattern = self.get_pattern() if self.enabled else None
+            if pattern is None:
+                chunks.append(bytes((_SILENCE,)) * run)
+            else:
+                chunks.append(_take(pattern, self.phase, run).translate(self.get_volume_table()))
+                self.phase = (self.phase + run) % len(pattern)
+            self.advance(run)
+            count -= run
+        return b''.join(chunks)
+
+    def render_frame(self, count, writes):
+        """
+        Synthesize a frame, applying the register writes recorded during it in one pass
+        :param count: Number of samples in the frame
+        :param writes: List of (sample, register index, value) in the order they happened
+        :return: bytes of unsigned 8 bit samples
+        """
+        chunks = []
+        position = 0
+        for sample, index, value in writes:
+            if sample > position:
+                chunks.append(self.render(sample - position))
+                position = sample
+            self.write(index, value)
+        if count > position:
+            chunks.append(self.render(count - position))
+        return b''.join(chunks)
+
+
+class SquareChannel(Channel):
+    """
+    Channels 1 and 2, square waves with a selectable duty cycle. Channel 1 also has a frequency sweep.
+    """
+    def __init__(self, sample_rate, has_sweep=False):
+        super().__init__(sample_rate)
+        self.has_sweep = has_sweep
+        self.sweep_timer = 0
+
+    def reset(self, sample_rate):
+        self.__init__(sample_rate, self.has_sweep)
+
+    def get_sweep_period(self):
+        # Like the hardware, a period of 0 reloads the timer with 8 but does not step the sweep
+        period = (self.registers[0] >> 4) & 0x07
+        return (period or 8) * (self.sample_rate // Capabilities.sweep_hz)
+
+    def trigger(self):
+        super().trigger()
+        if self.has_sweep:
+            self.sweep_timer = self.get_sweep_period()
+            if self.registers[0] & 0x07:
+                self.sweep()
+
+    def sweep(self):
+        """
+        Step the frequency sweep, disabling the channel if it overflows
+        """
+        frequency = self.get_frequency()
+        delta = frequency >> (self.registers[0] & 0x07)
+        frequency = frequency - delta if self.registers[0] & 0x08 else frequency + delta
+        if frequency > 0x7FF:
+            self.enabled = False
+        elif self.registers[0] & 0x07:
+            self.registers[3] = frequency & 0xFF
+            self.registers[4] = (self.registers[4] & ~0x07) | (frequency >> 8)
+
+    def next_event(self, count):
+        count = super().next_event(count)
+        if self.sweep_timer and self.sweep_timer < count:
+            count = self.sweep_timer
+        return count
+
+    def advance(self, count):
+        super().advance(count)
+        if self.sweep_timer:
+            self.sweep_timer -= count
+            if not self.sweep_timer:
+                self.sweep_timer = self.get_sweep_period()
+                if self.registers[0] & 0x70:
+                    self.sweep()
+
+    def get_pattern(self):
+        step_hz = 1048576 / (2048 - self.get_frequency())
+        return _build_pattern(_DUTY_SEQUENCES[self.registers[1] >> 6], step_hz, self.sample_rate)
+
+
+class WaveChannel(Channel):
+    """
+    Channel 3, plays back the 32 4 bit samples of wave RAM (FF30-FF3F)
+    """
+    max_length = 256
+
+    # NR32 output level as a right shift of the wave samples, None is mute
+    OUTPUT_SHIFTS = (None, 0, 1, 2)
+
+    def __init__(self, sample_rate):
+        super().__init__(sample_rate)
+        self.wave_ram = bytearray(16)
+
+    def dac_enabled(self):
+        return bool(self.registers[0] & 0x80)
+
+    def get_envelope_period(self):
+        return 0
+
+    def write(self, index, value):
+        if index >= 8:
+            self.wave_ram[index - 8] = value
+            return
+        super().write(index, value)
+        if index == 0 and not self.dac_enabled():
+            self.enabled = False
+
+    def get_volume_table(self):
+        return _VOLUME_TABLES[15]
+
+    def get_pattern(self):
+        shift = self.OUTPUT_SHIFTS[(self.registers[2] >> 5) & 0x03]
+        if shift is None:
+            return None
+        sequence = bytes((self.wave_ram[i >> 1] >> (0 if i & 1 else 4) & 0x0F) >> shift for i in range(32))
+        step_hz = 2097152 / (2048 - self.get_frequency())
+        return _build_pattern(sequence, step_hz, self.sample_rate)
+
+
+class NoiseChannel(Channel):
+    """
+    Channel 4, white noise from a 15 or 7 bit LFSR
+    """
+    def get_pattern(self):
+        polynomial = self.registers[3]
+        shift = polynomial >> 4
+        if shift >= 14:
+            # The LFSR receives no clocks
+            return None
+        divisor = (polynomial & 0x07) or 0.5
+        step_hz = 524288 / divisor / (2 << shift)
+        return _build_pattern(_noise_sequence(bool(polynomial & 0x08)), step_hz, self.sample_rate)
+
+
+class Sound:
+    """
+    The GameBoy Audio Processing Unit.
+    Register writes are recorded with the cycle they happened on, and nothing is emulated until the end of the frame.
+    Each channel then synthesizes the whole frame in one pass, applying its writes in order, and the channels are mixed
+    to signed 16 bit stereo.
+    """
+    NR50_ADDR = 0xFF24  # Channel control / ON-OFF / Volume (R/W)
+    NR51_ADDR = 0xFF25  # Selection of Sound output terminal (R/W)
+    NR52_ADDR = 0xFF26  # Sound on/off
+
+    # The channel registers, NR10 through NR44
+    CHANNEL_REGS_ADDR = 0xFF10
+    CHANNEL_REGS_SIZE = 5
+
+    WAVE_RAM_ADDR = 0xFF30
+    WAVE_RAM_SIZE = 0x10
+
+    def __init__(self, memory_space, cpu, scheduler):
+        self.memory = memory_space
+        self.cpu = cpu
+
+        self.sample_rate = int(cpu.clock_mhz * 1000000) // Capabilities.cycles_per_sample
+
+        self.channels = [SquareChannel(self.sample_rate, True),
+                         SquareChannel(self.sample_rate),
+                         WaveChannel(self.sample_rate),
+                         NoiseChannel(self.sample_rate)]
+
+        # Maps an address to a (channel index, register index) pair
+        self.register_map = {}
+        for channel in range(Capabilities.num_channels):
+            for index in range(self.CHANNEL_REGS_SIZE):
+                self.register_map[self.CHANNEL_REGS_ADDR + channel * self.CHANNEL_REGS_SIZE + index] = (channel, index)
+        for index in range(self.WAVE_RAM_SIZE):
+            self.register_map[self.WAVE_RAM_ADDR + index] = (2, 8 + index)
+
+        for address in list(self.register_map) + [self.NR50_ADDR, self.NR51_ADDR, self.NR52_ADDR]:
+            memory_space.io_write_handlers[address] = self.record_write
+
+        # (cycle, address, value) of each register write since the last frame
+        self.writes = []
+
+        # Sample position of the start of the current frame
+        self.sample_pos = 0
+
+        # Mixer state
+        self.nr50 = 0
+        self.nr51 = 0
+        self.powered = False
+
+        # Signed 16 bit stereo samples (left, right interleaved) of the last synthesized frame
+        self.frame_samples = array('h')
+
+        # Audio outputs (see pygb.sound.sink) which receive each synthesized frame
+        self.sinks = []
+
+        scheduler.rebase_handlers.append(self.rebase)
+
+    def reset(self, gb_type):
+        # The CPU has already been reset for this GameBoy type, the sample rate follows its clock
+        self.sample_rate = int(self.cpu.clock_mhz * 1000000) // Capabilities.cycles_per_sample
+        self.reload_registers()
+
+    def reload_registers(self):
+        """
+        Reset the channels and pick up the register state in memory, without triggering anything. Used at power on
+        and when a saved state is loaded.
+        """
+        for channel in self.channels:
+            channel.reset(self.sample_rate)
+
+        mem = self.memory.mem
+        for address, (channel, index) in self.register_map.items():
+            value = mem[address]
+            if index == 4:
+                value &= ~0x80
+            self.channels[channel].write(index, value)
+        self.nr50 = mem[self.NR50_ADDR]
+        self.nr51 = mem[self.NR51_ADDR]
+        self.powered = bool(mem[self.NR52_ADDR] & 0x80)
+
+        self.writes = []
+        self.sample_pos = self.cpu.cycles // Capabilities.cycles_per_sample
+        self.frame_samples = array('h')
+
+    def rebase(self, delta):
+        # Rebase deltas are a multiple of the sample length
+        self.sample_pos -= delta // Capabilities.cycles_per_sample
+        self.writes = [(cycles - delta, address, value) for cycles, address, value in self.writes]
+
+    def record_write(self, address, byte):
+        self.writes.append((self.cpu.cycles, address, byte))
+
+    def mix(self, buffers, start, end, out):
+        """
+        Mix a run of the channel buffers to stereo using the current NR50/NR51 state
+        """
+        count = end - start
+        if not count:
+            return
+        silence = bytes((_SILENCE,)) * count
+        for side, shift in ((0, 4), (1, 0)):
+            inputs = [buffers[i][start:end] if self.powered and self.nr51 & (1 << (i + shift)) else silence
+                      for i in range(Capabilities.num_channels)]
+            totals = map(operator.add, map(operator.add, inputs[0], inputs[1]),
+                         map(operator.add, inputs[2], inputs[3]))
+            table = _MIX_TABLES[(self.nr50 >> shift) & 0x07]
+            out[start * 2 + side:end * 2:2] = array('h', map(table.__getitem__, totals))
+
+    def end_frame(self):
+        """
+        Synthesize all the audio since the last call
+        :return: The frame as signed 16 bit interleaved stereo samples
+        """
+        end = self.cpu.cycles // Capabilities.cycles_per_sample
+        count = max(0, end - self.sample_pos)
+
+        channel_writes = [[] for _ in self.channels]
+        mixer_writes = []
+        for cycles, address, value in self.writes:
+            sample = min(max(0, cycles // Capabilities.cycles_per_sample - self.sample_pos), count)
+            target = self.register_map.get(address)
+            if target is not None:
+                channel_writes[target[0]].append((sample, target[1], value))
+            else:
+                if address == self.NR52_ADDR:
+                    for writes in channel_writes:
+                        writes.append((sample, Channel.POWER, value))
+                mixer_writes.append((sample, address, value))
+        self.writes = []
+
+        buffers = [channel.render_frame(count, writes) for channel, writes in zip(self.channels, channel_writes)]
+
+        out = array('h', bytes(count * 4))
+        position = 0
+        for sample, address, value in mixer_writes:
+            self.mix(buffers, position, sample, out)
+            position = sample
+            if address == self.NR50_ADDR:
+                self.nr50 = value
+            elif address == self.NR51_ADDR:
+                self.nr51 = value
+            else:
+                self.powered = bool(value & 0x80)
+        self.mix(buffers, position, count, out)
+
+        self.sample_pos = end
+        self.frame_samples = out
+        for sink in self.sinks:
+            sink.write_frame(out)
+        return out
@@ -0,0 +1,207 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import struct
+
+from pygb.memory.memory import MemoryPool, MemorySizes
+
+
+class SaveStateException(Exception):
+    """
+    Save state exception
+    """
+    pass
+
+
+class SaveState:
+    """
+    Snapshots of a whole GameBoy in a versioned binary layout.
+    Every scalar is packed by a single struct call, followed by the 64KB memory space as one slice copy, so a snapshot
+    takes microseconds and can be written into the same preallocated buffer every frame.
+    Audio channels are not saved, on load they pick up the sound registers as if freshly powered.
+    The Color GameBoy VRAM and internal RAM banks follow the memory space, zero filled on the other models.
+    """
+    MAGIC = b'PGBS'
+    VERSION = 2
+
+    # Header: magic, version, gb type, memory mode
+    # CPU: af, bc, de, hl, sp, pc, IME, cycles
+    # Video: mode, LY, frame count, mode end cycle
+    # Timer: DIV base cycle, TIMA anchor cycle, TIMA, TMA, TAC
+    # Joypad: pressed, select
+    # Serial: transfer end cycle, has transfer
+    # Color: double speed, speed switch armed, VRAM bank, internal RAM bank, HDMA source, destination, blocks left
+    SCALARS = struct.Struct('<4sHBB' +
+                            'HHHHHHBq' +
+                            'BBQq' +
+                            'qqBBB' +
+                            'BB' +
+                            'q?' +
+                            '??BBHHB')
+
+    MEMORY_OFFSET = SCALARS.size
+    BANKS_OFFSET = MEMORY_OFFSET + MemoryPool.MAX_POOL_SIZE
+    VRAM_BANKS_SIZE = MemorySizes.video_ram_size * MemorySizes.vram_bank_count
+    WRAM_BANKS_SIZE = MemorySizes.wram_bank_size * MemorySizes.wram_bank_count
+    SIZE = BANKS_OFFSET + VRAM_BANKS_SIZE + WRAM_BANKS_SIZE
+
+    # The cartridge header, which must match the loaded rom
+    ROM_HEADER_START = 0x0134
+    ROM_HEADER_END = 0x0150
+
+    @staticmethod
+    def allocate():
+        return bytearray(SaveState.SIZE)
+
+    @staticmethod
+    def save(gb, buffer=None):
+        """
+        Snapshot a GameBoy
+        :param gb: The GameBoy
+        :param buffer: Writable buffer of SaveState.SIZE bytes to reuse, allocated if None
+        :return: The buffer
+        """
+        if buffer is None:
+            buffer = bytearray(SaveState.SIZE)
+
+        SaveState.pack_scalars(gb, buffer)
+        view = memoryview(buffer)
+        view[SaveState.MEMORY_OFFSET:SaveState.BANKS_OFFSET] = gb.memory.mv
+        memory = gb.memory
+        if memory.vram_banks is not None:
+            memory.sync_banks()
+            offset = SaveState.BANKS_OFFSET
+            for bank in memory.vram_banks + memory.wram_banks:
+                view[offset:offset + len(bank)] = bank
+                offset += len(bank)
+        return buffer
+
+    @staticmethod
+    def pack_scalars(gb, buffer, offset=0):
+        """
+        Pack every scalar of a GameBoy, the part of a snapshot which is not the memory space
+        :param gb: The GameBoy
+        :param buffer: Writable buffer with at least SCALARS.size bytes from offset
+        """
+        reg = gb.cpu.registers
+        video = gb.video
+        timer = gb.timer
+        transfer_end = gb.serial.transfer_end
+        color = gb.color
+        SaveState.SCALARS.pack_into(buffer, offset,
+                                    SaveState.MAGIC, SaveState.VERSION, gb.game_boy_type, gb.memory.memory_mode,
+                                    reg.get_af(), reg.get_bc(), reg.get_de(), reg.get_hl(), reg.get_sp(),
+                                    reg.get_pc(), gb.cpu.interrupts.IME, gb.cpu.cycles,
+                                    video.mode_flag, video.mode_LY_counter, video.frame_count, video.mode_end,
+                                    timer.div_base, timer.tima_anchor, timer.tima, timer.tma, timer.tac,
+                                    gb.joypad.pressed, gb.joypad.select,
+                                    transfer_end or 0, transfer_end is not None,
+                                    gb.cpu.speed_shift == 1, color.speed_armed == 1, gb.memory.vram_bank,
+                                    gb.memory.wram_bank, color.hdma_source, color.hdma_dest, color.hdma_blocks)
+
+    @staticmethod
+    def load(gb, data):
+        """
+        Restore a GameBoy from a snapshot. The same rom must be loaded.
+        :param gb: The GameBoy
+        :param data: A buffer previously filled by save
+        """
+        if len(data) < SaveState.SIZE:
+            raise SaveStateException('Save state is truncated, {} of {} bytes'.format(len(data), SaveState.SIZE))
+
+        (magic, version, gb_type, memory_mode,
+         af, bc, de, hl, sp, pc, ime, cycles,
+         mode, ly, frame_count, mode_end,
+         div_base, tima_anchor, tima, tma, tac,
+         pressed, select,
+         transfer_end, has_transfer,
+         double_speed, speed_armed, vram_bank, wram_bank, hdma_source, hdma_dest, hdma_blocks) = \
+            SaveState.SCALARS.unpack_from(data, 0)
+
+        if magic != SaveState.MAGIC:
+            raise SaveStateException('Not a save state')
+        if version != SaveState.VERSION:
+            raise SaveStateException('Unsupported save state version {}'.format(version))
+
+        view = memoryview(data)
+        memory = gb.memory
+        header = view[SaveState.MEMORY_OFFSET + SaveState.ROM_HEADER_START:
+                      SaveState.MEMORY_OFFSET + SaveState.ROM_HEADER_END]
+        if header != memory.mv[SaveState.ROM_HEADER_START:SaveState.ROM_HEADER_END]:
+            raise SaveStateException('Save state is for a different rom')
+
+        gb.game_boy_type = gb_type
+        memory.memory_mode = memory_mode
+        memory.mv[:] = view[SaveState.MEMORY_OFFSET:SaveState.BANKS_OFFSET]
+        if memory.vram_banks is not None:
+            offset = SaveState.BANKS_OFFSET
+            for bank in memory.vram_banks + memory.wram_banks:
+                bank[:] = view[offset:offset + len(bank)]
+                offset += len(bank)
+            # The selected banks are already in the memory space
+            memory.vram_bank = vram_bank
+            memory.wram_bank = wram_bank
+        memory.oam_dirty = True
+        memory.mark_all_dirty()
+
+        reg = gb.cpu.registers
+        reg.set_af(af)
+        reg.set_bc(bc)
+        reg.set_de(de)
+        reg.set_hl(hl)
+        reg.set_sp(sp)
+        reg.set_pc(pc)
+        gb.cpu.interrupts.IME = ime
+        # Events the state does not own, like run limits or the profiler, stay the same distance away. The ones it
+        # owns are re-scheduled from the restored state below.
+        gb.scheduler.move(cycles - gb.cpu.cycles)
+        gb.cpu.cycles = cycles
+        # Before the timer is rescheduled, its periods depend on the speed
+        gb.color.set_speed(double_speed, int(speed_armed))
+
+        video = gb.video
+        video.mode_flag = mode
+        video.mode_LY_counter = ly
+        video.frame_count = frame_count
+        video.mode_end = mode_end
+        video.restore_mode()
+
+        timer = gb.timer
+        timer.div_base = div_base
+        timer.tima_anchor = tima_anchor
+        timer.tima = tima
+        timer.tma = tma
+        timer.tac = tac
+        timer.schedule()
+
+        gb.joypad.pressed = pressed
+        gb.joypad.select = select
+
+        gb.serial.restore_transfer(transfer_end if has_transfer else None)
+
+        gb.color.restore_hdma(hdma_source, hdma_dest, hdma_blocks)
+
+        gb.sound.reload_registers()
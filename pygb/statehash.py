@@ -0,0 +1,257 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import sys
+import struct
+import hashlib
+import argparse
+import contextlib
+
+from pygb.memory.memory import MemoryPool, MemoryLocations
+from pygb.state import SaveState
+
+
+class StateHashException(Exception):
+    """
+    State hash stream exception
+    """
+    pass
+
+
+class StateHasher:
+    """
+    A digest of the whole machine every frame, for catching nondeterminism and regressions against a golden run.
+    Each memory page keeps its own digest, and only the pages written since the last frame are hashed again. The frame
+    digest covers the table of page digests, every scalar of the machine (registers, video, timer, ...) and the Color
+    GameBoy banks which are not selected.
+    """
+    DIGEST_SIZE = 8
+
+    # Pages the sub systems store into directly, without going through the tracked writes, so they are always hashed
+    ALWAYS_DIRTY_START = MemoryLocations.sprite_attrib_mem_addr >> 8
+
+    # Echo ram is a copy of internal ram, it adds nothing to the digest
+    ECHO_START = MemoryLocations.echo_internal_addr >> 8
+    ECHO_END = MemoryLocations.sprite_attrib_mem_addr >> 8
+
+    def __init__(self, gb, stream=None):
+        """
+        :param gb: The GameBoy to hash
+        :param stream: Binary file to write the digest stream to, or None to only keep the latest digest
+        """
+        self.gb = gb
+        self.writer = HashStreamWriter(stream) if stream is not None else None
+        self.page_digests = bytearray(MemoryPool.PAGE_COUNT * self.DIGEST_SIZE)
+        self.scalars = bytearray(SaveState.SCALARS.size)
+        self.digest = None
+        self.frames = 0
+        self.pages_hashed = 0
+        self.attached = False
+
+    def attach(self):
+        """
+        Start hashing at every frame boundary
+        """
+        if not self.attached:
+            self.gb.memory.track_dirty_pages(True)
+            self.gb.video.frame_handlers.append(self.frame)
+            self.attached = True
+        return self
+
+    def detach(self):
+        if self.attached:
+            self.gb.memory.track_dirty_pages(False)
+            self.gb.video.frame_handlers.remove(self.frame)
+            self.attached = False
+        if self.writer is not None:
+            self.writer.flush()
+
+    def update_pages(self):
+        memory = self.gb.memory
+        dirty = memory.dirty_pages
+        dirty[self.ALWAYS_DIRTY_START:] = b'\x01' * (MemoryPool.PAGE_COUNT - self.ALWAYS_DIRTY_START)
+        dirty[self.ECHO_START:self.ECHO_END] = bytes(self.ECHO_END - self.ECHO_START)
+
+        mv = memory.mv
+        digests = self.page_digests
+        size = self.DIGEST_SIZE
+        page = dirty.find(1)
+        while page != -1:
+            start = page * MemoryPool.PAGE_SIZE
+            digests[page * size:(page + 1) * size] = \
+                hashlib.blake2b(mv[start:start + MemoryPool.PAGE_SIZE], digest_size=size).digest()
+            self.pages_hashed += 1
+            page = dirty.find(1, page + 1)
+        dirty[:] = bytes(MemoryPool.PAGE_COUNT)
+
+    def compute(self):
+        """
+        :return: The digest of the machine as it is now
+        """
+        self.update_pages()
+        SaveState.pack_scalars(self.gb, self.scalars)
+        digest = hashlib.blake2b(self.page_digests, digest_size=self.DIGEST_SIZE)
+        digest.update(self.scalars)
+        self.update_banks(digest)
+        return digest.digest()
+
+    def update_banks(self, digest):
+        """
+        The Color GameBoy banks which are not selected live outside the memory space, where dirty tracking does not
+        see them. They are 36KB between them, cheap enough to hash whole every frame.
+        """
+        memory = self.gb.memory
+        if memory.vram_banks is None:
+            return
+        for bank, data in enumerate(memory.vram_banks):
+            if bank != memory.vram_bank:
+                digest.update(data)
+        for bank, data in enumerate(memory.wram_banks):
+            if bank != memory.wram_bank:
+                digest.update(data)
+
+    def frame(self):
+        self.digest = self.compute()
+        if self.writer is not None:
+            self.writer.write(self.gb.video.frame_count, self.digest)
+        self.frames += 1
+
+
+class HashStreamWriter:
+    """
+    Digest stream: a header, then a fixed size record per frame of frame number and digest.
+    Fixed size records let two streams be compared a block at a time.
+    """
+    HEADER = struct.Struct('<4sBB')
+    MAGIC = b'PGBH'
+    VERSION = 1
+
+    def __init__(self, stream, digest_size=StateHasher.DIGEST_SIZE):
+        self.stream = stream
+        self.record = struct.Struct('<I{}s'.format(digest_size))
+        stream.write(self.HEADER.pack(self.MAGIC, self.VERSION, digest_size))
+
+    def write(self, frame, digest):
+        self.stream.write(self.record.pack(frame, digest))
+
+    def flush(self):
+        self.stream.flush()
+
+
+def read_header(stream):
+    header = stream.read(HashStreamWriter.HEADER.size)
+    if len(header) != HashStreamWriter.HEADER.size:
+        raise StateHashException('Hash stream is truncated')
+    magic, version, digest_size = HashStreamWriter.HEADER.unpack(header)
+    if magic != HashStreamWriter.MAGIC:
+        raise StateHashException('Not a hash stream')
+    if version != HashStreamWriter.VERSION:
+        raise StateHashException('Unsupported hash stream version {}'.format(version))
+    return struct.Struct('<I{}s'.format(digest_size))
+
+
+def compare_streams(path_a, path_b, block_records=4096):
+    """
+    Find the first frame where two digest streams differ
+    :return: None if they match, else (index, record_a, record_b). A record is (frame, digest) or None past the end.
+    """
+    with open(path_a, 'rb') as a, open(path_b, 'rb') as b:
+        record = read_header(a)
+        if read_header(b).size != record.size:
+            raise StateHashException('Hash streams use different digest sizes')
+
+        index = 0
+        block_size = record.size * block_records
+        while True:
+            block_a = a.read(block_size)
+            block_b = b.read(block_size)
+            if block_a == block_b:
+                if not block_a:
+                    return None
+                index += len(block_a) // record.size
+                continue
+
+            # Only a differing block is walked record by record
+            for offset in range(0, max(len(block_a), len(block_b)), record.size):
+                rec_a = block_a[offset:offset + record.size]
+                rec_b = block_b[offset:offset + record.size]
+                if rec_a != rec_b:
+                    return (index + offset // record.size,
+                            record.unpack(rec_a) if len(rec_a) == record.size else None,
+                            record.unpack(rec_b) if len(rec_b) == record.size else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Record and compare per frame state digests.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    record_parser = subparsers.add_parser('record', help='Run a rom headless and record its digest stream')
+    record_parser.add_argument('rom', help='Rom file')
+    record_parser.add_argument('output', help='Digest stream file to write')
+    record_parser.add_argument('--frames', dest='frames', action='store', type=int, default=600,
+                               help='Number of frames to run')
+    record_parser.add_argument('--movie', dest='movie', action='store', default='', help='Input movie to play back')
+
+    compare_parser = subparsers.add_parser('compare', help='Report the first frame two digest streams differ on')
+    compare_parser.add_argument('a', help='Golden digest stream')
+    compare_parser.add_argument('b', help='Digest stream to check')
+
+    args = parser.parse_args(argv)
+    if args.command == 'record':
+        import pygb.settings
+        pygb.settings.DEBUG = False
+        from pygb.gameboy import GameBoy
+        from pygb.utility import GBTypes
+
+        gb = GameBoy(GBTypes.gameboy_classic)
+        with contextlib.redirect_stdout(io.StringIO()):
+            gb.load_rom(args.rom)
+        if len(args.movie) > 0:
+            gb.joypad.play(args.movie)
+        with open(args.output, 'wb') as f:
+            hasher = StateHasher(gb, f).attach()
+            gb.run_frames(args.frames)
+            hasher.detach()
+        print('Recorded {} frames, {} pages hashed'.format(hasher.frames, hasher.pages_hashed))
+        return 0
+    elif args.command == 'compare':
+        difference = compare_streams(args.a, args.b)
+        if difference is None:
+            print('Streams match')
+            return 0
+        index, rec_a, rec_b = difference
+        print('Streams differ at record {}: {} != {}'.format(
+            index,
+            'frame {} {}'.format(rec_a[0], rec_a[1].hex()) if rec_a else 'end of stream',
+            'frame {} {}'.format(rec_b[0], rec_b[1].hex()) if rec_b else 'end of stream'))
+        return 1
+    parser.print_help()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
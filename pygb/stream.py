@@ -0,0 +1,407 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import re
+import io
+import sys
+import base64
+import struct
+import asyncio
+import hashlib
+import argparse
+import contextlib
+import concurrent.futures
+
+# The emulator is only imported by main and the server, after DEBUG has been turned off
+
+
+class StreamException(Exception):
+    """
+    Frame stream exception
+    """
+    pass
+
+
+class MessageTypes:
+    HELLO = 0x00      # width, height as two little endian shorts
+    KEYFRAME = 0x01   # the whole front buffer
+    DELTA = 0x02      # runs of XOR against the previous frame
+    UNCHANGED = 0x03  # no payload
+    INPUT = 0x10      # client to server, one Buttons bitmask byte
+
+
+def write_varint(out, value):
+    """
+    Append an unsigned LEB128 varint
+    """
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, offset):
+    """
+    :return: (value, offset after it)
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+# Runs of changed bytes in an XOR delta
+_CHANGED_RUN = re.compile(b'[^\x00]+')
+
+
+def encode_delta(previous, frame):
+    """
+    Encode a frame against the one before it. The XOR of the two is done on whole buffers as ints, and the runs of
+    changed bytes are found by a regex, so no Python loop touches individual pixels.
+    Payload: repeated (bytes skipped, run length, run of XOR bytes), the counts as LEB128.
+    :return: (message type, payload)
+    """
+    if previous == frame:
+        return MessageTypes.UNCHANGED, b''
+    size = len(frame)
+    xor = (int.from_bytes(previous, 'little') ^ int.from_bytes(frame, 'little')).to_bytes(size, 'little')
+    payload = bytearray()
+    position = 0
+    for match in _CHANGED_RUN.finditer(xor):
+        write_varint(payload, match.start() - position)
+        write_varint(payload, match.end() - match.start())
+        payload += match.group()
+        position = match.end()
+    if len(payload) >= size:
+        return MessageTypes.KEYFRAME, bytes(frame)
+    return MessageTypes.DELTA, bytes(payload)
+
+
+def pack_message(message_type, payload):
+    header = bytearray((message_type,))
+    write_varint(header, len(payload))
+    return bytes(header) + payload
+
+
+class FrameDecoder:
+    """
+    Rebuilds frames from stream messages, the client side of encode_delta
+    """
+    def __init__(self):
+        self.frame = None
+        self.width = 0
+        self.height = 0
+
+    def apply(self, message_type, payload):
+        """
+        :return: The current frame, or None before the first keyframe
+        """
+        if message_type == MessageTypes.HELLO:
+            self.width, self.height = struct.unpack('<HH', payload)
+        elif message_type == MessageTypes.KEYFRAME:
+            self.frame = bytearray(payload)
+        elif message_type == MessageTypes.DELTA:
+            if self.frame is None:
+                raise StreamException('Delta before the first keyframe')
+            frame = self.frame
+            position = 0
+            offset = 0
+            while offset < len(payload):
+                skip, offset = read_varint(payload, offset)
+                length, offset = read_varint(payload, offset)
+                position += skip
+                xor = int.from_bytes(payload[offset:offset + length], 'little')
+                run = (int.from_bytes(frame[position:position + length], 'little') ^ xor).to_bytes(length, 'little')
+                frame[position:position + length] = run
+                position += length
+                offset += length
+        elif message_type != MessageTypes.UNCHANGED:
+            raise StreamException('Unknown message type {}'.format(message_type))
+        return self.frame
+
+
+class StreamClient:
+    """
+    One viewer. Frames are queued for its writer, when it falls behind the oldest are dropped and the next frame
+    goes out as a keyframe.
+    """
+    QUEUE_SIZE = 2
+
+    def __init__(self, reader, writer, websocket):
+        self.reader = reader
+        self.writer = writer
+        self.websocket = websocket
+        self.queue = asyncio.Queue(self.QUEUE_SIZE)
+        self.last_sequence = None
+        self.bytes_sent = 0
+
+    def offer(self, item):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(item)
+
+    async def send(self, message_type, payload):
+        data = pack_message(message_type, payload)
+        if self.websocket:
+            data = websocket_frame(data)
+        self.writer.write(data)
+        self.bytes_sent += len(data)
+        await self.writer.drain()
+
+    async def read_message(self):
+        """
+        :return: The next input message bytes from the client, None once it disconnects
+        """
+        if not self.websocket:
+            try:
+                return await self.reader.readexactly(2)
+            except asyncio.IncompleteReadError:
+                return None
+        while True:
+            opcode, payload = await read_websocket_frame(self.reader)
+            if opcode is None or opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                self.writer.write(websocket_frame(payload, 0xA))
+                continue
+            if opcode in (0x1, 0x2, 0x0):
+                return payload
+
+
+WEBSOCKET_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# Clients only send two byte input messages, a longer frame is refused instead of read into memory
+MAX_CLIENT_PAYLOAD = 1024
+
+
+def websocket_frame(payload, opcode=0x2):
+    """
+    An unmasked, unfragmented server to client WebSocket frame
+    """
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 0x10000:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_websocket_frame(reader, max_length=MAX_CLIENT_PAYLOAD):
+    """
+    :param max_length: Largest payload accepted, StreamException is raised past it
+    :return: (opcode, unmasked payload), (None, None) if the connection closed
+    """
+    try:
+        first, second = await reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', await reader.readexactly(8))[0]
+        if length > max_length:
+            raise StreamException('WebSocket frame of {} bytes is too large'.format(length))
+        mask = await reader.readexactly(4) if second & 0x80 else None
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None, None
+    if mask is not None:
+        payload = bytes(byte ^ mask[i & 3] for i, byte in enumerate(payload))
+    return first & 0x0F, payload
+
+
+async def websocket_handshake(reader, writer, request_line):
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    key = headers.get('sec-websocket-key')
+    if key is None:
+        writer.write(b'HTTP/1.1 400 Bad Request\r\n\r\n')
+        raise StreamException('Not a WebSocket request: {}'.format(request_line.strip()))
+    accept = base64.b64encode(hashlib.sha1(key.encode('ascii') + WEBSOCKET_GUID).digest())
+    writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                 b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+    await writer.drain()
+
+
+class FrameStreamServer:
+    """
+    Streams the frames of an AsyncGameBoy session to any number of viewers and takes their joypad input.
+    Plain TCP clients and WebSocket clients share the port. A TCP client opens with the line PYGB, a connection
+    opening with an HTTP GET is upgraded to a WebSocket.
+    Server messages are a type byte, a LEB128 payload length and the payload. Client messages are two bytes,
+    MessageTypes.INPUT and a Buttons bitmask, sent as WebSocket binary messages on a WebSocket.
+    Each frame is delta encoded once, on an executor so the event loop thread keeps emulating, and shared by every
+    viewer which is up to date. An unchanged frame costs a two byte marker.
+    """
+    TCP_HELLO = b'PYGB'
+
+    def __init__(self, session, host='127.0.0.1', port=0, executor=None):
+        """
+        :param session: The AsyncGameBoy to stream
+        :param executor: concurrent.futures executor to encode on, a single worker thread if None
+        """
+        self.session = session
+        self.host = host
+        self.port = port
+        self.executor = executor or concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.owns_executor = executor is None
+        self.clients = []
+        self.server = None
+        self.pump_task = None
+        self.frames = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.frames = self.session.frames()
+        self.pump_task = asyncio.ensure_future(self.pump())
+        return self
+
+    async def close(self):
+        if self.frames is not None:
+            self.frames.close()
+        if self.pump_task is not None:
+            self.pump_task.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for client in self.clients:
+            client.writer.close()
+        if self.owns_executor:
+            self.executor.shutdown(wait=False)
+
+    async def pump(self):
+        """
+        Encode each new frame and hand it to the viewers
+        """
+        loop = asyncio.get_event_loop()
+        previous = None
+        sequence = 0
+        async for frame in self.frames:
+            if previous is None:
+                encoded = (MessageTypes.KEYFRAME, frame)
+            else:
+                encoded = await loop.run_in_executor(self.executor, encode_delta, previous, frame)
+            sequence += 1
+            for client in self.clients:
+                client.offer((sequence, frame, encoded))
+            previous = frame
+
+    async def handle_connection(self, reader, writer):
+        try:
+            first = await reader.readline()
+            websocket = first.startswith(b'GET ')
+            if websocket:
+                await websocket_handshake(reader, writer, first)
+            elif first.strip() != self.TCP_HELLO:
+                raise StreamException('Unknown protocol')
+        except (ConnectionError, StreamException):
+            writer.close()
+            return
+
+        from pygb.video.video import Capabilities as VideoCapabilities
+
+        client = StreamClient(reader, writer, websocket)
+        self.clients.append(client)
+        sender = asyncio.ensure_future(self.send_frames(client))
+        try:
+            await client.send(MessageTypes.HELLO, struct.pack('<HH', VideoCapabilities.screen_width,
+                                                              VideoCapabilities.screen_height))
+            while True:
+                message = await client.read_message()
+                if message is None:
+                    break
+                for i in range(0, len(message) - 1, 2):
+                    if message[i] == MessageTypes.INPUT:
+                        self.session.send_input(message[i + 1])
+        except (ConnectionError, StreamException, asyncio.CancelledError):
+            # The viewer went away, or the server is shutting down
+            pass
+        finally:
+            sender.cancel()
+            self.clients.remove(client)
+            writer.close()
+
+    async def send_frames(self, client):
+        try:
+            while True:
+                sequence, frame, encoded = await client.queue.get()
+                if client.last_sequence is not None and sequence == client.last_sequence + 1:
+                    await client.send(*encoded)
+                else:
+                    await client.send(MessageTypes.KEYFRAME, frame)
+                client.last_sequence = sequence
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+
+async def serve(rom, host, port, speed):
+    import pygb.settings
+    pygb.settings.DEBUG = False
+    from pygb.gameboy import GameBoy
+    from pygb.utility import GBTypes
+    from pygb.aio import AsyncGameBoy
+
+    gb = GameBoy(GBTypes.gameboy_classic)
+    with contextlib.redirect_stdout(io.StringIO()):
+        gb.load_rom(rom)
+    session = AsyncGameBoy(gb, speed)
+    server = await FrameStreamServer(session, host, port).start()
+    print('Streaming {} on {}:{}'.format(rom, host, server.port))
+    try:
+        await session.run()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a rom headless and stream its frames over TCP/WebSocket.')
+    parser.add_argument('--rom', dest='rom', action='store', required=True, help='The rom to load')
+    parser.add_argument('--host', dest='host', action='store', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', dest='port', action='store', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--speed', dest='speed', action='store', type=float, default=1.0,
+                        help='Emulation speed as a multiple of real time, 0 for uncapped')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.get_event_loop().run_until_complete(serve(args.rom, args.host, args.port, args.speed))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
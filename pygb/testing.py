@@ -0,0 +1,267 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import io
+import sys
+import json
+import re
+import time
+import argparse
+import contextlib
+from xml.etree import ElementTree
+
+from pygb.batch import BatchJob, BatchResult, run_batch, find_roms, get_worker_gameboy, detach
+from pygb.serial.link import CaptureLink
+from pygb.memory.memory import MemoryLocations
+
+
+class TestResult(BatchResult):
+    """
+    The outcome of a test rom, on top of the batch metrics
+    """
+    OUTCOME_PASSED = 'passed'
+    OUTCOME_FAILED = 'failed'
+    OUTCOME_HUNG = 'hung'
+    OUTCOME_TIMEOUT = 'timeout'
+    OUTCOME_ERROR = 'error'
+
+    def __init__(self, job_id, rom):
+        super().__init__(job_id, rom)
+        self.outcome = None
+        self.message = ''
+
+    @classmethod
+    def crashed(cls, job):
+        result = super().crashed(job)
+        result.outcome = cls.OUTCOME_ERROR
+        result.message = result.error
+        return result
+
+
+class TestRomMonitor:
+    """
+    Watches a running test rom for the end of the test. Blargg's roms print their report over the serial port, and
+    the newer ones also write it to cartridge ram behind a signature. Either way they end up spinning on one
+    instruction, which is how a rom that finished without reporting is caught.
+    """
+    PASSED_TEXT = 'Passed'
+    FAILED_TEXT = 'Failed'
+
+    # Blargg's ram report: a status byte, the DE B0 61 signature, then zero terminated text
+    RAM_STATUS_ADDR = MemoryLocations.switch_ram_bank_addr
+    RAM_SIGNATURE = b'\xDE\xB0\x61'
+    RAM_STATUS_RUNNING = 0x80
+
+    # Consecutive checks on a jump-to-self before the rom counts as hung
+    HUNG_CHECKS = 3
+
+    def __init__(self, gb, capture):
+        self.gb = gb
+        self.capture = capture
+        self.outcome = None
+        self.message = ''
+        self.hung_checks = 0
+
+    def is_jump_to_self(self):
+        """
+        :return: True if the next instruction is JR -2 or a JP to its own address
+        """
+        mem = self.gb.memory.mem
+        pc = self.gb.cpu.registers.get_pc()
+        if pc > 0xFFFC:
+            return False
+        if mem[pc] == 0x18 and mem[pc + 1] == 0xFE:
+            return True
+        return mem[pc] == 0xC3 and mem[pc + 1] | (mem[pc + 2] << 8) == pc
+
+    def get_ram_report(self):
+        mem = self.gb.memory.mem
+        start = self.RAM_STATUS_ADDR
+        if mem[start + 1:start + 4] != self.RAM_SIGNATURE or mem[start] == self.RAM_STATUS_RUNNING:
+            return None
+        end = mem.find(0, start + 4, start + 0x1000)
+        text = mem[start + 4:end if end != -1 else start + 0x1000].decode('ascii', 'replace')
+        return mem[start], text
+
+    def check(self, gb):
+        """
+        Predicate for GameBoy.run_until, True once the test has reported or stopped making progress
+        """
+        text = self.capture.get_text()
+        if self.PASSED_TEXT in text:
+            self.outcome = TestResult.OUTCOME_PASSED
+        elif self.FAILED_TEXT in text:
+            self.outcome = TestResult.OUTCOME_FAILED
+        else:
+            report = self.get_ram_report()
+            if report is not None:
+                status, self.message = report
+                self.outcome = TestResult.OUTCOME_PASSED if status == 0 else TestResult.OUTCOME_FAILED
+            elif self.is_jump_to_self():
+                self.hung_checks += 1
+                if self.hung_checks >= self.HUNG_CHECKS:
+                    self.outcome = TestResult.OUTCOME_HUNG
+            else:
+                self.hung_checks = 0
+        if self.outcome is not None and not self.message:
+            self.message = text.strip()
+        return self.outcome is not None
+
+
+def run_test_rom(job):
+    """
+    Run a single test rom in this process, the batch runner for run_tests
+    :param job: BatchJob, max_cycles bounds the test
+    :return: TestResult
+    """
+    result = TestResult(job.job_id, job.rom)
+    log = io.StringIO()
+    start_time = time.perf_counter()
+    gb = None
+    try:
+        with contextlib.redirect_stdout(log):
+            gb = get_worker_gameboy(job.gb_type)
+            gb.load_rom(job.rom)
+            capture = gb.serial.connect(CaptureLink())
+            monitor = TestRomMonitor(gb, capture)
+
+            instructions = gb.cpu.instructions
+            run = gb.run_until(monitor.check, job.max_cycles)
+            result.instructions = gb.cpu.instructions - instructions
+            result.cycles = run.cycles
+            result.frames = run.frames
+            result.stop_reason = run.stop_reason
+            result.serial = capture.get_text()
+
+            if monitor.outcome is None:
+                result.outcome = TestResult.OUTCOME_TIMEOUT
+                result.message = 'No result after {} cycles'.format(run.cycles)
+            else:
+                result.outcome = monitor.outcome
+                result.message = monitor.message
+    except Exception as e:
+        result.status = TestResult.STATUS_ERROR
+        result.stop_reason = 'error'
+        result.error = '{}: {}'.format(type(e).__name__, e)
+        result.outcome = TestResult.OUTCOME_ERROR
+        result.message = result.error
+    finally:
+        if gb is not None:
+            detach(gb)
+    result.seconds = time.perf_counter() - start_time
+    result.log = log.getvalue()
+    return result
+
+
+def run_tests(roms, max_cycles, workers=None):
+    """
+    Run test roms in parallel worker processes
+    :param roms: Rom paths
+    :param max_cycles: Cycle limit of each rom
+    :param workers: Number of processes, defaults to the CPU count
+    :return: List of TestResult, in rom order
+    """
+    jobs = [BatchJob(rom, max_cycles=max_cycles, job_id=os.path.splitext(os.path.basename(rom))[0]) for rom in roms]
+    return run_batch(jobs, workers, runner=run_test_rom, result_type=TestResult)
+
+
+# Control characters are not allowed in XML 1.0, rom titles are often padded with zeros
+_XML_INVALID = re.compile('[\x00-\x08\x0B\x0C\x0E-\x1F]')
+
+
+def xml_text(text):
+    return _XML_INVALID.sub('', text)
+
+
+def write_junit(results, path, suite_name='pygb'):
+    suite = ElementTree.Element('testsuite', {
+        'name': suite_name,
+        'tests': str(len(results)),
+        'failures': str(sum(1 for r in results if r.outcome in (TestResult.OUTCOME_FAILED,
+                                                                TestResult.OUTCOME_HUNG,
+                                                                TestResult.OUTCOME_TIMEOUT))),
+        'errors': str(sum(1 for r in results if r.outcome == TestResult.OUTCOME_ERROR)),
+        'time': '{:.3f}'.format(sum(r.seconds for r in results)),
+    })
+    for result in results:
+        case = ElementTree.SubElement(suite, 'testcase', {
+            'classname': suite_name,
+            'name': result.job_id,
+            'file': result.rom,
+            'time': '{:.3f}'.format(result.seconds),
+        })
+        properties = ElementTree.SubElement(case, 'properties')
+        for name, value in (('cycles', result.cycles), ('instructions', result.instructions),
+                            ('instructions_per_second', int(result.get_instructions_per_second()))):
+            ElementTree.SubElement(properties, 'property', {'name': name, 'value': str(value)})
+
+        if result.outcome == TestResult.OUTCOME_ERROR:
+            ElementTree.SubElement(case, 'error', {'message': xml_text(result.message)}).text = xml_text(result.log)
+        elif result.outcome != TestResult.OUTCOME_PASSED:
+            ElementTree.SubElement(case, 'failure', {'message': result.outcome}).text = xml_text(result.message)
+        if result.serial:
+            ElementTree.SubElement(case, 'system-out').text = xml_text(result.serial)
+    ElementTree.ElementTree(suite).write(path, encoding='utf-8', xml_declaration=True)
+
+
+def write_json(results, path):
+    with open(path, 'w') as f:
+        json.dump([result.to_dict() for result in results], f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run test roms in parallel and report the results.')
+    parser.add_argument('roms', nargs='+', help='Test rom files or directories of test roms')
+    parser.add_argument('--cycles', dest='cycles', action='store', type=int, default=4194304 * 60,
+                        help='Cycle limit of each rom, a minute of emulated time by default')
+    parser.add_argument('--workers', dest='workers', action='store', type=int, default=None,
+                        help='Number of worker processes')
+    parser.add_argument('--junit', dest='junit', action='store', default='', help='Write a JUnit XML report here')
+    parser.add_argument('--json', dest='json', action='store', default='', help='Write a JSON report here')
+    args = parser.parse_args(argv)
+
+    roms = find_roms(args.roms)
+    if not roms:
+        parser.error('No test roms found')
+
+    results = run_tests(roms, args.cycles, args.workers)
+    for result in results:
+        print('{:<8} {:<40} {:>12} cycles {:>9.0f} instr/s  {}'.format(
+            result.outcome.upper(), result.job_id, result.cycles, result.get_instructions_per_second(),
+            result.message.splitlines()[-1] if result.message else ''))
+    passed = sum(1 for result in results if result.outcome == TestResult.OUTCOME_PASSED)
+    print('{} of {} passed'.format(passed, len(results)))
+
+    if len(args.junit) > 0:
+        write_junit(results, args.junit)
+    if len(args.json) > 0:
+        write_json(results, args.json)
+    return 0 if passed == len(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -58,11 +58,47 @@ def get_size_to_pretty(the_size, in_bits=False):
     return '%d%s' % (the_size, 'Bits' if in_bits else 'Bytes')
 
 
+class MethodHooks:
+    """
+    Mixin for sub systems whose hot methods other parts of the emulator wrap on one instance, dirty page tracking or
+    the debugger for instance. A wrapper is a callable taking the method it wraps and returning the replacement.
+    Wrappers are applied in the order they were added, the first one innermost, and the chain is rebuilt whenever one
+    is added or removed, so each user only ever takes out its own. Without wrappers the class method is used as is.
+    Classes set self.method_hooks = {} in __init__.
+    """
+    def add_hook(self, name, wrapper):
+        self.method_hooks.setdefault(name, []).append(wrapper)
+        self.apply_hooks(name)
+
+    def remove_hook(self, name, wrapper):
+        """
+        Take a wrapper out of the chain. Removing one which is not in place does nothing.
+        """
+        wrappers = self.method_hooks.get(name)
+        if wrappers and wrapper in wrappers:
+            wrappers.remove(wrapper)
+            self.apply_hooks(name)
+
+    def apply_hooks(self, name):
+        wrappers = self.method_hooks.get(name)
+        if not wrappers:
+            self.method_hooks.pop(name, None)
+            self.__dict__.pop(name, None)
+            return
+        method = getattr(type(self), name).__get__(self)
+        for wrapper in wrappers:
+            method = wrapper(method)
+        setattr(self, name, method)
+
+
 class RomInfo:
     """
     Rom Information,
     """
 
+    # Artefact cache entry name, bumped whenever the parse changes
+    CACHE_NAME = 'rom_info-v2'
+
     # A bank is 16kb wide, so just divide the rom size kb by 16kb to get the number of banks
     rom_sizes_bits_banks = {
         0x00: (256000, 2),
@@ -125,11 +161,20 @@ class RomInfo:
         return '%d - %s =\t%s =\t%d banks' % \
                (index, get_size_to_pretty(num_bits_banks[0], True), get_size_to_pretty(num_bytes, False), num_bits_banks[1])
 
+    @classmethod
+    def parse(cls, rom_bytes):
+        """
+        :return: RomInfo of the rom header
+        """
+        rom_info = cls()
+        rom_info.get_rom_info(rom_bytes)
+        return rom_info
+
     def get_rom_info(self, rom_bytes):
         # Rom Name
         self.rom_name = rom_bytes[0x0134:0x0142 + 1].decode()
-        # Is Color GB?
-        self.is_color = rom_bytes[0x0143] == 0x80
+        # Is Color GB? Bit 7 is set on both color compatible (0x80) and color only (0xC0) roms
+        self.is_color = (rom_bytes[0x0143] & 0x80) != 0
         # Licensee Code (new): This id is only set if 0x014B doesn't contain the code
         new_licensee_code = struct.unpack_from('H', rom_bytes, 0x0144)[0]
         # Is Super GB?
@@ -0,0 +1,207 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import ctypes
+import contextlib
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+
+import pygb.settings
+from pygb.utility import GBTypes
+from pygb.video.video import Capabilities as VideoCapabilities
+
+
+class VecGameBoyException(Exception):
+    """
+    Vectorized environment exception
+    """
+    pass
+
+
+def env_worker(conn, index, rom, gb_type, frames, ram, ram_ranges):
+    """
+    Worker process body. Owns one GameBoy and serves commands from the parent until told to close.
+    Observations are copied straight into this environment's slice of the shared arrays.
+    """
+    frame_size = VideoCapabilities.screen_width * VideoCapabilities.screen_height
+    ram_size = sum(end - start for start, end in ram_ranges)
+    frame_out = memoryview(frames).cast('B')[index * frame_size:(index + 1) * frame_size]
+    ram_out = memoryview(ram).cast('B')[index * ram_size:(index + 1) * ram_size]
+
+    # Workers step headless and as fast as possible, never trace instructions
+    pygb.settings.DEBUG = False
+    from pygb.gameboy import GameBoy
+
+    gb = GameBoy(gb_type)
+    with contextlib.redirect_stdout(io.StringIO()):
+        gb.load_rom(rom)
+
+    def observe():
+        frame_out[:] = gb.video.front_buffer
+        offset = 0
+        mem = gb.memory.mem
+        for start, end in ram_ranges:
+            ram_out[offset:offset + end - start] = mem[start:end]
+            offset += end - start
+        return {'frame': gb.video.frame_count, 'cycles': gb.cpu.cycles}
+
+    try:
+        while True:
+            command, arg = conn.recv()
+            try:
+                if command == 'step':
+                    gb.joypad.set_buttons(arg)
+                    gb.run_frames(1)
+                    conn.send(observe())
+                elif command == 'reset':
+                    gb.reset()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        gb.load_rom(rom)
+                    conn.send(observe())
+                elif command == 'close':
+                    conn.send(None)
+                    return
+                else:
+                    raise VecGameBoyException('Unknown command {}'.format(command))
+            except Exception as e:
+                conn.send({'error': '{}: {}'.format(type(e).__name__, e)})
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        conn.close()
+
+
+class VecGameBoy:
+    """
+    K GameBoys running in worker processes, stepped in lockstep a frame at a time.
+    Frames and the selected ram ranges of every environment are written into shared memory, only the
+    small info dicts travel through the pipes.
+    """
+    def __init__(self, roms, num_envs=None, ram_ranges=((0xC000, 0xE000),), gb_type=GBTypes.gameboy_classic,
+                 context=None):
+        """
+        :param roms: A rom path used by every environment, or a list with one rom path per environment
+        :param num_envs: Number of environments when a single rom path is given
+        :param ram_ranges: (start, end) address ranges of MemoryPool.mem to publish every step
+        :param gb_type: GBTypes of every environment
+        :param context: multiprocessing context, the platform default if None
+        """
+        if isinstance(roms, str):
+            roms = [roms] * (num_envs or 1)
+        elif num_envs is not None and num_envs != len(roms):
+            raise VecGameBoyException('num_envs does not match the number of roms')
+
+        self.num_envs = len(roms)
+        self.ram_ranges = tuple((start, end) for start, end in ram_ranges)
+        self.frame_size = VideoCapabilities.screen_width * VideoCapabilities.screen_height
+        self.ram_size = sum(end - start for start, end in self.ram_ranges)
+        for start, end in self.ram_ranges:
+            if not 0 <= start < end <= 0x10000:
+                raise VecGameBoyException('Invalid ram range {:04X}-{:04X}'.format(start, end))
+
+        # One flat shared block per observation, each environment owns a contiguous slice
+        self.shared_frames = RawArray(ctypes.c_ubyte, self.num_envs * self.frame_size)
+        self.shared_ram = RawArray(ctypes.c_ubyte, max(1, self.num_envs * self.ram_size))
+
+        frames_view = memoryview(self.shared_frames).cast('B')
+        ram_view = memoryview(self.shared_ram).cast('B')
+        shape = (VideoCapabilities.screen_height, VideoCapabilities.screen_width)
+        self.frames = [frames_view[i * self.frame_size:(i + 1) * self.frame_size].cast('B', shape)
+                       for i in range(self.num_envs)]
+        self.ram_views = [ram_view[i * self.ram_size:(i + 1) * self.ram_size] for i in range(self.num_envs)]
+
+        context = context or multiprocessing.get_context()
+        self.connections = []
+        self.processes = []
+        for index, rom in enumerate(roms):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=env_worker, daemon=True,
+                                      args=(child_conn, index, rom, gb_type, self.shared_frames, self.shared_ram,
+                                            self.ram_ranges))
+            process.start()
+            child_conn.close()
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def broadcast(self, command, args):
+        """
+        Send every worker its command before waiting on any of them, so the environments run in parallel
+        """
+        if self.closed:
+            raise VecGameBoyException('VecGameBoy is closed')
+        try:
+            for conn, arg in zip(self.connections, args):
+                conn.send((command, arg))
+            infos = [conn.recv() for conn in self.connections]
+        except (EOFError, OSError) as e:
+            raise VecGameBoyException('A worker process died: {}'.format(e))
+        for index, info in enumerate(infos):
+            if 'error' in info:
+                raise VecGameBoyException('Environment {} failed: {}'.format(index, info['error']))
+        return infos
+
+    def reset(self):
+        """
+        Reload the rom in every environment
+        :return: (frames, ram_views, infos)
+        """
+        infos = self.broadcast('reset', [None] * self.num_envs)
+        return self.frames, self.ram_views, infos
+
+    def step(self, actions):
+        """
+        Hold the given buttons and run every environment for one frame
+        :param actions: One Buttons bitmask per environment
+        :return: (frames, ram_views, infos). The views alias shared memory and are overwritten by the next step.
+        """
+        if len(actions) != self.num_envs:
+            raise VecGameBoyException('Expected {} actions, got {}'.format(self.num_envs, len(actions)))
+        infos = self.broadcast('step', actions)
+        return self.frames, self.ram_views, infos
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for conn in self.connections:
+            try:
+                conn.send(('close', None))
+                conn.recv()
+            except (EOFError, OSError):
+                pass
+            conn.close()
+        for process in self.processes:
+            process.join(1.0)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,201 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from pygb.memory.memory import MemoryLocations
+
+
+def _spread_bits(byte, flipped=False):
+    """
+    Spread the 8 bits of a tile byte into the low bit of 8 bytes, so a whole tile row can be worked on as a
+    single integer. The left most pixel (bit 7) ends up in the most significant byte unless flipped.
+    """
+    value = 0
+    for bit in range(8):
+        if byte & (0x80 >> bit):
+            shift = bit if flipped else 7 - bit
+            value |= 1 << (shift * 8)
+    return value
+
+# Tile row decode tables. A row of pixels is SPREAD[low] | (SPREAD[high] << 1), one color index per byte.
+_SPREAD = [_spread_bits(b) for b in range(256)]
+_SPREAD_FLIPPED = [_spread_bits(b, True) for b in range(256)]
+
+# One bytes.translate table per palette register value, mapping color index 0-3 to a shade
+_PALETTES = [bytes(((pal >> (i * 2)) & 0x03) if i < 4 else 0 for i in range(256)) for pal in range(256)]
+
+# Low bit of every byte in a row of 8 pixels
+_ROW_LOW_BITS = 0x0101010101010101
+
+
+class SpriteEngine:
+    """
+    Sprite (OBJ) rendering.
+    OAM is only scanned when it changes (a write or a DMA transfer) or when the sprite size changes. The scan builds a
+    table with an entry per screen line, holding the (up to 10) sprites visible on that line in draw order. Rendering
+    a line is then a table lookup, and each sprite is composited 8 pixels at a time using integer masks.
+    """
+    # Bytes per OAM entry: Y, X, tile number, attributes
+    OAM_ENTRY_SIZE = 4
+
+    # Sprite attribute flags
+    ATTR_BG_PRIORITY = 0x80  # 0=OBJ above BG, 1=OBJ behind BG colors 1-3
+    ATTR_Y_FLIP = 0x40
+    ATTR_X_FLIP = 0x20
+    ATTR_PALETTE = 0x10  # 0=OBP0, 1=OBP1
+
+    # LCDC bits which affect sprites
+    LCDC_OBJ_ENABLE = 0x02
+    LCDC_OBJ_SIZE = 0x04  # 0=8x8, 1=8x16
+
+    OBP0_ADDR = 0xFF48  # Object Palette 0 Data (R/W)
+    OBP1_ADDR = 0xFF49  # Object Palette 1 Data (R/W)
+
+    # Sprite positions are offset so they can be partially off the top and left of the screen
+    SPRITE_Y_OFFSET = 16
+
+    def __init__(self, memory_space, caps):
+        self.memory = memory_space
+        self.caps = caps
+
+        # For each screen line, a tuple of OAM indices in draw order (lowest priority first)
+        self.line_table = [()] * caps.screen_height
+
+        # The sprite height the line table was last built for
+        self.table_height = 0
+
+        # Scratch lines padded by a sprite width on both sides, so sprites hanging off the screen need no clipping
+        self.pad = caps.max_sprite_width
+        self.line = bytearray(caps.screen_width + self.pad * 2)
+        self.bg_line = bytearray(caps.screen_width + self.pad * 2)
+
+    def reset(self):
+        self.line_table = [()] * self.caps.screen_height
+        self.table_height = 0
+
+    def get_sprite_height(self, lcdc):
+        if lcdc & self.LCDC_OBJ_SIZE:
+            return self.caps.max_sprite_height
+        return self.caps.min_sprite_height
+
+    def update(self, lcdc):
+        """
+        Rebuild the line table if OAM or the sprite size changed since it was last built
+        :param lcdc: The current LCD control register value
+        """
+        sprite_height = self.get_sprite_height(lcdc)
+        if self.memory.oam_dirty or sprite_height != self.table_height:
+            self.build_line_table(sprite_height)
+
+    def build_line_table(self, sprite_height):
+        """
+        Walk OAM once and record which sprites land on each screen line.
+        Like the hardware, only the first 10 sprites in OAM order are selected for a line, even if some of them are
+        off screen horizontally. The selected sprites are then ordered by priority: lower X wins, and on a tie the
+        lower OAM index wins.
+        :param sprite_height: 8 or 16
+        """
+        mem = self.memory.mem
+        screen_height = self.caps.screen_height
+        per_line = self.caps.max_sprites_per_line
+        lines = [[] for _ in range(screen_height)]
+
+        address = MemoryLocations.sprite_attrib_mem_addr
+        for index in range(self.caps.max_sprites):
+            top = mem[address] - self.SPRITE_Y_OFFSET
+            bottom = top + sprite_height
+            if bottom > 0 and top < screen_height:
+                entry = (mem[address + 1], index)
+                for ly in range(max(top, 0), min(bottom, screen_height)):
+                    entries = lines[ly]
+                    if len(entries) < per_line:
+                        entries.append(entry)
+            address += self.OAM_ENTRY_SIZE
+
+        # Draw order is the reverse of priority, so the highest priority sprite is drawn last
+        self.line_table = [tuple(index for _, index in sorted(entries, reverse=True)) if entries else ()
+                           for entries in lines]
+        self.table_height = sprite_height
+        self.memory.oam_dirty = False
+
+    def render_line(self, ly, lcdc, frame_line, bg_line):
+        """
+        Composite the sprites of a line over the already rendered background
+        :param ly: The screen line
+        :param lcdc: The current LCD control register value
+        :param frame_line: Writable view of the line in the frame buffer (shades)
+        :param bg_line: Background color indices of the line, used for BG priority
+        """
+        draw_order = self.line_table[ly]
+        if not draw_order or not lcdc & self.LCDC_OBJ_ENABLE:
+            return
+
+        mem = self.memory.mem
+        pad = self.pad
+        width = self.caps.screen_width
+        sprite_height = self.table_height
+        line = self.line
+        line[pad:pad + width] = frame_line
+
+        # Mask of background pixels which are not color 0, only needed if a sprite sits behind the background
+        bg_line_set = False
+        palettes = (_PALETTES[mem[self.OBP0_ADDR]], _PALETTES[mem[self.OBP1_ADDR]])
+
+        for index in draw_order:
+            address = MemoryLocations.sprite_attrib_mem_addr + index * self.OAM_ENTRY_SIZE
+            # The padded line index is the OAM X position, X=0 and X>=168 are completely off screen
+            x = mem[address + 1]
+            if x == 0 or x >= width + pad:
+                continue
+
+            attributes = mem[address + 3]
+            row = ly - (mem[address] - self.SPRITE_Y_OFFSET)
+            if attributes & self.ATTR_Y_FLIP:
+                row = sprite_height - 1 - row
+            tile = mem[address + 2]
+            if sprite_height == self.caps.max_sprite_height:
+                tile &= 0xFE
+            tile_address = MemoryLocations.video_ram_addr + tile * 16 + row * 2
+
+            spread = _SPREAD_FLIPPED if attributes & self.ATTR_X_FLIP else _SPREAD
+            pixels = spread[mem[tile_address]] | (spread[mem[tile_address + 1]] << 1)
+            if not pixels:
+                continue
+
+            # 0xFF in every byte holding a non transparent pixel
+            mask = ((pixels | (pixels >> 1)) & _ROW_LOW_BITS) * 0xFF
+            if attributes & self.ATTR_BG_PRIORITY:
+                if not bg_line_set:
+                    self.bg_line[pad:pad + width] = bg_line
+                    bg_line_set = True
+                bg = int.from_bytes(self.bg_line[x:x + 8], 'big')
+                mask &= ~(((bg | (bg >> 1)) & _ROW_LOW_BITS) * 0xFF)
+
+            palette = palettes[1 if attributes & self.ATTR_PALETTE else 0]
+            shades = int.from_bytes(pixels.to_bytes(8, 'big').translate(palette), 'big')
+            current = int.from_bytes(line[x:x + 8], 'big')
+            line[x:x + 8] = ((current & ~mask) | (shades & mask)).to_bytes(8, 'big')
+
+        frame_line[:] = line[pad:pad + width]
@@ -26,6 +26,7 @@ SOFTWARE.
 
 from pygb.utility import gb_type_select_var
 from pygb.memory.memory import MemoryLocations, MemorySizes
+from pygb.video.sprites import SpriteEngine
 
 class Capabilities:
     """
@@ -48,6 +49,14 @@ class Capabilities:
     max_sprite_height = 16
     min_sprite_width = 8
     min_sprite_height = 8
+    max_sprites = 40
+    max_sprites_per_line = 10
+
+    # Timings, in CPU cycles. A line is 456 cycles and a frame 154 lines (70224 cycles, 59.73Hz).
+    oam_read_cycles = 80
+    oam_vram_read_cycles = 172
+    hblank_cycles = 204
+    cycles_per_line = oam_read_cycles + oam_vram_read_cycles + hblank_cycles
 
 class Video:
     # The LCD controller is in the H-Blank period and
@@ -70,6 +79,8 @@ class Video:
     # CGB Mode: Cannot access Palette Data (FF69,FF6B) either.
     VIDEO_MODE_OAM_VRAM_READ = 3
 
+    LCDC_ADDR = 0xFF40 # LCD Control (R/W)
+
     # Specifies the position in the 256x256 pixels BG map (32x32 tiles) which is to be displayed at the upper/left
     # LCD display position. Values in range from 0-255 may be used for X/Y each, the video controller automatically
     # wraps back to the upper (left) position in BG map when drawing exceeds the lower (right) border of the BG map
@@ -94,26 +105,51 @@ class Video:
     WY_ADDR = 0xFF4A # Window Y Position (R/W)
     WX_ADDR = 0xFF4B # Window X Position minus 7 (R/W)
 
-    LY_VBLANK_RANGE = list(range(144, 153))
+    LY_VBLANK_RANGE = list(range(144, 154))
 
     """
     The GameBoy Graphics Processing
     """
-    def __init__(self, memory_space):
+    def __init__(self, memory_space, interrupts, scheduler):
         self.memory = memory_space
+        self.interrupts = interrupts
+        self.scheduler = scheduler
 
         self.horiz_sync_hz = Capabilities.horiz_sync_khz * 1000
         self.vert_sync_hz = Capabilities.vert_sync_hz
 
         # Current Front Buffer (Pixel Presentation)
         self.front_buffer = None
+        self.front_view = None
 
+        # Background color indices (not shades) of the line being drawn, sprites behind the BG need these
+        self.bg_line = bytearray(Capabilities.screen_width)
+
+        self.sprites = SpriteEngine(memory_space, Capabilities)
 
         self.mode_flag = self.VIDEO_MODE_HBLANK
         self.mode_LY_counter = 0
 
-        # Temp to get things moving along, a bad mode cycle tick
-        self.oam_counter = 0
+        # Number of frames completed, incremented on entering V-Blank
+        self.frame_count = 0
+
+        # Callables run at the start of every V-Blank, once the frame is complete
+        self.frame_handlers = []
+
+        # Callables taking the cycle, run at the start of every H-Blank of a visible line (Color GameBoy HDMA)
+        self.hblank_handlers = []
+
+        # Length in cycles and end of mode handler, indexed by mode
+        self.mode_cycles = (Capabilities.hblank_cycles,
+                            Capabilities.cycles_per_line,
+                            Capabilities.oam_read_cycles,
+                            Capabilities.oam_vram_read_cycles)
+        self.mode_handlers = (self.hblank, self.vblank, self.oam_read, self.oam_vram_read)
+
+        # The cycle the current mode ends on, and its scheduler event
+        self.mode_end = 0
+        self.mode_event = None
+        scheduler.rebase_handlers.append(self.rebase)
 
     def reset(self, gb_type):
         self.horiz_sync_hz = gb_type_select_var(gb_type,
@@ -128,47 +164,82 @@ class Video:
                                                 Capabilities.vert_sync_hz)
 
         self.front_buffer = bytearray(Capabilities.screen_width * Capabilities.screen_height)
+        self.front_view = memoryview(self.front_buffer)
+        self.sprites.reset()
 
-        self.mode_flag = self.VIDEO_MODE_HBLANK
         self.mode_LY_counter = 0
+        self.frame_count = 0
+        self.memory.write_byte(self.LY_ADDR, self.mode_LY_counter)
 
-        self.oam_counter = 0
-
-    def step(self):
-        if self.mode_flag == self.VIDEO_MODE_HBLANK:
-            self.hblank()
-        elif self.mode_flag == self.VIDEO_MODE_VBLANK:
-            self.vblank()
-        elif self.mode_flag == self.VIDEO_MODE_OAM_READ:
-            self.oam_read()
-        elif self.mode_flag == self.VIDEO_MODE_OAM_VRAM_READ:
-            self.oam_vram_read()
-
-    def hblank(self):
+        # The scheduler has just been reset, start the first line at cycle 0
+        self.start_mode(self.VIDEO_MODE_OAM_READ, 0)
+
+    def start_mode(self, mode, cycle):
+        """
+        Enter a video mode and schedule the end of it
+        :param mode: One of the VIDEO_MODE_ values
+        :param cycle: The cycle the mode starts on
+        """
+        self.mode_flag = mode
+        self.mode_end = cycle + self.mode_cycles[mode]
+        self.mode_event = self.scheduler.schedule(self.mode_end, self.mode_handlers[mode])
+
+    def restore_mode(self):
+        """
+        Re-schedule the end of the current mode, after a state load set the mode and its end
+        """
+        self.scheduler.cancel(self.mode_event)
+        self.mode_event = self.scheduler.schedule(self.mode_end, self.mode_handlers[self.mode_flag])
+
+    def rebase(self, delta):
+        self.mode_end -= delta
+
+    def hblank(self, cycle):
+        """ End of H-Blank, move on to the next line """
         self.mode_LY_counter += 1
         self.memory.write_byte(self.LY_ADDR, self.mode_LY_counter)
 
         if self.mode_LY_counter in self.LY_VBLANK_RANGE:
-            self.mode_flag = self.VIDEO_MODE_VBLANK
-
-
-    def vblank(self):
+            # Enter V-Blank before the frame handlers run, so they see a consistent state
+            self.frame_count += 1
+            self.start_mode(self.VIDEO_MODE_VBLANK, cycle)
+            self.interrupts.request(self.memory, self.interrupts.INTERRUPT_VBLANK)
+            for handler in self.frame_handlers:
+                handler()
+        else:
+            self.start_mode(self.VIDEO_MODE_OAM_READ, cycle)
+
+    def vblank(self, cycle):
+        """ End of a V-Blank line """
         self.mode_LY_counter += 1
         self.memory.write_byte(self.LY_ADDR, self.mode_LY_counter)
 
         if self.mode_LY_counter == self.LY_VBLANK_RANGE[len(self.LY_VBLANK_RANGE) - 1] + 1:
             self.mode_LY_counter = 0
             self.memory.write_byte(self.LY_ADDR, self.mode_LY_counter)
-            self.mode_flag = self.VIDEO_MODE_OAM_READ
-
-    def oam_read(self):
-        self.oam_counter += 1
-        if self.oam_counter == 200:
-            self.mode_flag = self.VIDEO_MODE_OAM_VRAM_READ
-            self.oam_counter = 0
-
-    def oam_vram_read(self):
-        self.oam_counter += 1
-        if self.oam_counter == 200:
-            self.mode_flag = self.VIDEO_MODE_HBLANK
-            self.oam_counter = 0
+            self.start_mode(self.VIDEO_MODE_OAM_READ, cycle)
+        else:
+            self.start_mode(self.VIDEO_MODE_VBLANK, cycle)
+
+    def oam_read(self, cycle):
+        """ End of the OAM search """
+        self.start_mode(self.VIDEO_MODE_OAM_VRAM_READ, cycle)
+
+    def oam_vram_read(self, cycle):
+        """ End of the pixel transfer, the line is drawn """
+        self.render_scanline()
+        self.start_mode(self.VIDEO_MODE_HBLANK, cycle)
+        for handler in self.hblank_handlers:
+            handler(cycle)
+
+    def render_scanline(self):
+        """
+        Draw the current line into the front buffer, at the end of the OAM/VRAM read period
+        """
+        ly = self.mode_LY_counter
+        if ly >= Capabilities.screen_height:
+            return
+        lcdc = self.memory.read_byte(self.LCDC_ADDR)
+        self.sprites.update(lcdc)
+        start = ly * Capabilities.screen_width
+        self.sprites.render_line(ly, lcdc, self.front_view[start:start + Capabilities.screen_width], self.bg_line)
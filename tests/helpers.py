@@ -0,0 +1,75 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import os
+import tempfile
+import contextlib
+
+from pygb.gameboy import GameBoy
+from pygb.utility import GBTypes
+from pygb.cpu.assembler import build_rom
+
+# Copies the divider through a page of work ram with the timer running, so every frame leaves a different state
+COUNTER_SOURCE = """
+start:
+    LD A, 0x05
+    LDH (0xFF00+0x07), A
+    LD HL, 0xC000
+loop:
+    LDH A, (0xFF00+0x04)
+    LD B, A
+    LD (HL), B
+    INC A
+    LDH (0xFF00+0x80), A
+    INC L
+    JP loop
+"""
+
+
+def write_rom(source, **kwargs):
+    """
+    Assemble source into a rom file
+    :return: Path of the rom, the caller removes it
+    """
+    fd, path = tempfile.mkstemp(suffix='.gb', prefix='pygb-test-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(build_rom(source, **kwargs))
+    return path
+
+
+def make_gameboy(source=COUNTER_SOURCE, gb_type=GBTypes.gameboy_classic, cache=None, **kwargs):
+    """
+    A GameBoy running a rom assembled from source, the rom header print out suppressed
+    """
+    path = write_rom(source, **kwargs)
+    try:
+        gb = GameBoy(gb_type, cache)
+        with contextlib.redirect_stdout(io.StringIO()):
+            gb.load_rom(path)
+    finally:
+        os.remove(path)
+    return gb
@@ -0,0 +1,144 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import unittest
+
+from pygb.aio import AsyncGameBoy, Subscription
+from pygb.pacing import FramePacer
+
+from helpers import make_gameboy
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(asyncio.wait_for(coroutine, 30))
+    finally:
+        loop.close()
+
+
+async def collect(subscription):
+    items = []
+    async for item in subscription:
+        items.append(item)
+    return items
+
+
+class AsyncGameBoyTest(unittest.TestCase):
+    def make_session(self, **kwargs):
+        return AsyncGameBoy(make_gameboy(), FramePacer.UNCAPPED, **kwargs)
+
+    def test_sessions_interleave(self):
+        order = []
+        sessions = []
+        for name in 'ab':
+            session = self.make_session()
+            session.gb.video.frame_handlers.append(lambda name=name: order.append(name))
+            sessions.append(session)
+
+        async def scenario():
+            return await asyncio.gather(*(session.run(max_frames=5) for session in sessions))
+        self.assertEqual(run(scenario()), [5, 5])
+
+        # One slice each in turn, neither runs ahead
+        self.assertEqual(order, ['a', 'b'] * 5)
+
+    def test_subscriptions_end_with_run(self):
+        session = self.make_session()
+
+        async def scenario():
+            frames = asyncio.ensure_future(collect(session.frames()))
+            audio = asyncio.ensure_future(collect(session.audio()))
+            # Slow consumers fall behind, the session is not held up by them
+            await session.run(max_frames=3)
+            return await frames, await audio
+
+        frames, audio = run(scenario())
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(frames[-1], bytes(session.gb.video.front_buffer))
+        self.assertEqual(len(audio), 3)
+        self.assertEqual(session.frame_subscribers, [])
+        self.assertFalse(session.running)
+
+    def test_cycles_per_slice(self):
+        session = self.make_session(cycles_per_slice=1000)
+        session.gb.video.frame_handlers.append(session.stop)
+        frames = run(session.run())
+        self.assertEqual(frames, 1)
+
+    def test_input_at_slice_boundaries(self):
+        session = self.make_session()
+        held = []
+        session.gb.video.frame_handlers.append(lambda: held.append(session.gb.joypad.pressed))
+        session.send_input(0x01)
+        session.send_input(0x03)
+        run(session.run(max_frames=3))
+
+        # One queued state per slice, so a quick press is held for a frame instead of lost
+        self.assertEqual(held, [0x01, 0x03, 0x03])
+
+    def test_run_twice(self):
+        session = self.make_session()
+
+        async def scenario():
+            first = asyncio.ensure_future(session.run(max_frames=2))
+            await asyncio.sleep(0)
+            with self.assertRaises(RuntimeError):
+                await session.run(max_frames=1)
+            await first
+        run(scenario())
+
+
+class SubscriptionTest(unittest.TestCase):
+    def test_drops_oldest(self):
+        async def scenario():
+            subscription = Subscription(None, 2)
+            for item in range(5):
+                subscription.put(item)
+            self.assertEqual(subscription.dropped, 3)
+            self.assertEqual([await subscription.__anext__(), await subscription.__anext__()], [3, 4])
+
+            # Ending queues a marker like an item, iteration stops once it is reached
+            subscription.put(5)
+            subscription.end()
+            return await collect(subscription)
+        self.assertEqual(run(scenario()), [5])
+
+    def test_close(self):
+        session = AsyncGameBoy(make_gameboy(), FramePacer.UNCAPPED)
+
+        async def scenario():
+            subscription = session.frames()
+            subscription.close()
+            subscription.put(b'frame')
+            self.assertEqual(session.frame_subscribers, [])
+            self.assertTrue(subscription.queue.empty())
+        run(scenario())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.utility import RomInfo
+from pygb.cpu.assembler import assemble, build_rom, header_checksum, global_checksum, AssemblerException, \
+    TITLE_ADDR, HEADER_CHECKSUM_ADDR, GLOBAL_CHECKSUM_ADDR, ENTRY_ADDR, BANK_SIZE
+
+from helpers import COUNTER_SOURCE
+
+
+class AssembleTest(unittest.TestCase):
+    def test_instructions(self):
+        program = assemble("""
+start:
+    NOP
+    LD A, 0x05
+    LD HL, 0xC000
+    JR start
+    JP start
+""", origin=0x0200)
+        image, start = program.get_bytes()
+        self.assertEqual(start, 0x0200)
+        self.assertEqual(image, bytes((0x00, 0x3E, 0x05, 0x21, 0x00, 0xC0, 0x18, 0xF8, 0xC3, 0x00, 0x02)))
+        self.assertEqual(program.symbols['start'], 0x0200)
+
+    def test_directives(self):
+        program = assemble("""
+    .equ VALUE, 0x12
+    .db VALUE, "AB"
+    .dw 0x1234
+    .org 0x0300
+    .ds 3, 0xFF
+""")
+        self.assertEqual(program.chunks, ((0x0150, bytes((0x12, 0x41, 0x42, 0x34, 0x12))),
+                                          (0x0300, b'\xff\xff\xff')))
+
+    def test_errors(self):
+        for source in ('a:\na:', 'LD A, 0x100', 'FOO A', 'JR far\n.ds 200\nfar:', '.bogus 1'):
+            with self.assertRaises(AssemblerException):
+                assemble(source)
+
+
+class BuildRomTest(unittest.TestCase):
+    def test_header_checksum(self):
+        # The sum of the header bytes and the checksum, plus one for each header byte, is zero
+        rom = build_rom(COUNTER_SOURCE, title='CHECKSUM')
+        self.assertEqual((sum(rom[TITLE_ADDR:HEADER_CHECKSUM_ADDR + 1]) + HEADER_CHECKSUM_ADDR - TITLE_ADDR) & 0xFF, 0)
+        self.assertEqual(header_checksum(rom), rom[HEADER_CHECKSUM_ADDR])
+        self.assertEqual(header_checksum(bytes(0x150)), 0xE7)
+
+    def test_global_checksum(self):
+        rom = build_rom(COUNTER_SOURCE, title='CHECKSUM')
+        expected = sum(rom[:GLOBAL_CHECKSUM_ADDR]) + sum(rom[GLOBAL_CHECKSUM_ADDR + 2:])
+        self.assertEqual(int.from_bytes(rom[GLOBAL_CHECKSUM_ADDR:GLOBAL_CHECKSUM_ADDR + 2], 'big'), expected & 0xFFFF)
+        self.assertEqual(global_checksum(rom), expected & 0xFFFF)
+
+    def test_header(self):
+        rom = build_rom(COUNTER_SOURCE, title='header test', is_color=True, cart_type=0x01)
+        self.assertEqual(len(rom), 2 * BANK_SIZE)
+        self.assertEqual(rom[ENTRY_ADDR:ENTRY_ADDR + 4], bytes((0x00, 0xC3, 0x50, 0x01)))
+
+        info = RomInfo()
+        info.get_rom_info(rom)
+        self.assertEqual(info.rom_name.rstrip('\x00'), 'HEADER TEST')
+        self.assertTrue(info.is_color)
+        self.assertEqual(info.cart_type, 0x01)
+        self.assertEqual(info.rom_size, 0)
+
+    def test_rom_size(self):
+        rom = build_rom('start:\n    JP start\n.org 0x8000\n    NOP')
+        self.assertEqual(len(rom), 4 * BANK_SIZE)
+        self.assertEqual(rom[0x8000], 0x00)
+
+    def test_header_overlap(self):
+        with self.assertRaises(AssemblerException):
+            build_rom('.org 0x0100\n    NOP')
+
+
+if __name__ == '__main__':
+    unittest.main()
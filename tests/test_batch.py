@@ -0,0 +1,96 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import time
+import unittest
+
+from pygb.batch import BatchJob, BatchResult, run_batch
+
+
+def run_crashing_job(job):
+    """
+    Runner whose worker process dies on the 'crash' rom, every time it is run
+    """
+    if job.rom == 'crash':
+        os._exit(1)
+    result = BatchResult(job.job_id, job.rom)
+    result.log = str(os.getpid())
+    return result
+
+
+def run_slow_crashing_job(job):
+    """
+    Like run_crashing_job, with jobs long enough for the queue to still be full when the crash happens
+    """
+    time.sleep(0.02)
+    return run_crashing_job(job)
+
+
+class RunBatchTest(unittest.TestCase):
+    def test_results_in_job_order(self):
+        jobs = [BatchJob('rom{}'.format(index), max_frames=1) for index in range(6)]
+        results = run_batch(jobs, workers=2, runner=run_crashing_job)
+        self.assertEqual([result.rom for result in results], [job.rom for job in jobs])
+        self.assertTrue(all(result.status == BatchResult.STATUS_OK for result in results))
+
+    def test_only_crashing_job_is_charged(self):
+        jobs = [BatchJob('rom{}'.format(index), max_frames=1) for index in range(8)]
+        jobs.insert(3, BatchJob('crash', max_frames=1))
+        results = run_batch(jobs, workers=2, max_retries=1, runner=run_crashing_job)
+
+        self.assertEqual(len(results), len(jobs))
+        for job, result in zip(jobs, results):
+            self.assertEqual(result.rom, job.rom)
+            if job.rom == 'crash':
+                self.assertEqual(result.status, BatchResult.STATUS_CRASHED)
+            else:
+                self.assertEqual(result.status, BatchResult.STATUS_OK)
+
+    def test_crash_with_jobs_queued(self):
+        """
+        Jobs lost with the pool keep running in parallel, only the ones running alongside the crash are ever isolated
+        """
+        jobs = [BatchJob('rom{}'.format(index), max_frames=1) for index in range(60)]
+        jobs.insert(1, BatchJob('crash', max_frames=1))
+        results = run_batch(jobs, workers=4, max_retries=0, runner=run_slow_crashing_job)
+
+        self.assertEqual([result.status for result in results],
+                         [BatchResult.STATUS_CRASHED if job.rom == 'crash' else BatchResult.STATUS_OK for job in jobs])
+
+        # Run one by one, every job would have a process of its own
+        pids = set(result.log for result in results if result.status == BatchResult.STATUS_OK)
+        self.assertGreater(len(pids), 1)
+        self.assertLessEqual(len(pids), 4 * 3 + 4)
+
+    def test_crash_without_retries(self):
+        results = run_batch([BatchJob('crash', max_frames=1), BatchJob('rom', max_frames=1)], workers=1,
+                            max_retries=0, runner=run_crashing_job)
+        self.assertEqual([result.status for result in results], [BatchResult.STATUS_CRASHED, BatchResult.STATUS_OK])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pygb.cache import ArtefactCache, get_rom_hash
+from pygb.utility import GBTypes, RomInfo
+
+from helpers import make_gameboy
+
+
+class CountingCache(ArtefactCache):
+    """
+    Counts the walks of the cache directory
+    """
+    def __init__(self, root, max_bytes):
+        super().__init__(root, max_bytes)
+        self.walks = 0
+
+    def get_entries(self):
+        self.walks += 1
+        return super().get_entries()
+
+
+class ArtefactCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='pygb-cache-')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        cache = ArtefactCache(self.directory)
+        rom_hash = get_rom_hash(b'rom')
+        self.assertIsNone(cache.get(rom_hash, 'info'))
+        cache.put(rom_hash, 'info', {'title': 'TETRIS'})
+        self.assertEqual(cache.get(rom_hash, 'info'), {'title': 'TETRIS'})
+
+        # Another instance on the same directory sees it
+        self.assertEqual(ArtefactCache(self.directory).get(rom_hash, 'info'), {'title': 'TETRIS'})
+
+    def test_get_or_create_builds_once(self):
+        cache = ArtefactCache(self.directory)
+        calls = []
+
+        def factory():
+            calls.append(None)
+            return [1, 2, 3]
+
+        self.assertEqual(cache.get_or_create('ab' * 20, 'list', factory), [1, 2, 3])
+        self.assertEqual(cache.get_or_create('ab' * 20, 'list', factory), [1, 2, 3])
+        self.assertEqual(len(calls), 1)
+
+    def test_damaged_entry_is_a_miss(self):
+        cache = ArtefactCache(self.directory)
+        cache.put('cd' * 20, 'value', 1)
+        with open(cache.get_path('cd' * 20, 'value'), 'wb') as f:
+            f.write(b'not a pickle')
+        self.assertIsNone(cache.get('cd' * 20, 'value'))
+
+    def test_evicts_least_recently_used(self):
+        cache = ArtefactCache(self.directory, max_bytes=3500)
+        value = bytes(1000)
+        for index in range(3):
+            cache.put(get_rom_hash(bytes([index])), 'data', value)
+            # Older entries get older modification times
+            os.utime(cache.get_path(get_rom_hash(bytes([index])), 'data'), (index, index))
+        cache.get(get_rom_hash(bytes([0])), 'data')
+
+        cache.put(get_rom_hash(bytes([3])), 'data', value)
+        present = [cache.get(get_rom_hash(bytes([index])), 'data') is not None for index in range(4)]
+        self.assertEqual(present, [True, False, True, True])
+        self.assertLessEqual(cache.total_bytes, 3500)
+
+    def test_walks_only_when_trimming(self):
+        cache = CountingCache(self.directory, max_bytes=10000)
+        for index in range(5):
+            cache.put(get_rom_hash(bytes([index])), 'data', bytes(100))
+        self.assertEqual(cache.walks, 1)
+
+        # Replacing an entry does not count it twice
+        cache.put(get_rom_hash(bytes([0])), 'data', bytes(100))
+        total = sum(entry[1] for entry in ArtefactCache(self.directory).get_entries())
+        self.assertEqual(cache.total_bytes, total)
+
+        cache.put(get_rom_hash(b'big'), 'data', bytes(20000))
+        self.assertEqual(cache.walks, 2)
+        self.assertLessEqual(cache.total_bytes, 10000)
+
+    def test_clear_one_rom(self):
+        cache = ArtefactCache(self.directory)
+        cache.put('ef' * 20, 'a', 1)
+        cache.put('ef' * 20, 'b', 2)
+        cache.put('01' * 20, 'a', 3)
+        cache.clear('ef' * 20)
+        self.assertIsNone(cache.get('ef' * 20, 'a'))
+        self.assertEqual(cache.get('01' * 20, 'a'), 3)
+
+    def test_gameboy_reuses_artefacts(self):
+        cache = ArtefactCache(self.directory)
+        gb = make_gameboy(gb_type=GBTypes.gameboy_classic, cache=cache)
+        # Loading a rom stores its header, the disassembly is only built when asked for
+        self.assertIsNone(gb.disassembly)
+        self.assertEqual(cache.get(gb.rom_hash, RomInfo.CACHE_NAME).rom_name, gb.rom_info.rom_name)
+
+        disassembly = gb.get_disassembly()
+        self.assertIs(gb.get_disassembly(), disassembly)
+        self.assertEqual(len(cache.get_entries()), 2)
+
+        # The next load of the rom finds both
+        other = make_gameboy(cache=ArtefactCache(self.directory))
+        self.assertIsNotNone(other.disassembly)
+        self.assertEqual(other.get_disassembly().instructions, disassembly.instructions)
+
+    def test_gameboy_without_cache(self):
+        gb = make_gameboy()
+        self.assertIsNone(gb.rom_hash)
+        self.assertEqual(gb.get_disassembly().rom_hash, get_rom_hash(gb.rom_bytes))
+
+if __name__ == '__main__':
+    unittest.main()
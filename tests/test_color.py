@@ -0,0 +1,205 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import os
+import tempfile
+import unittest
+import contextlib
+
+from pygb.gameboy import GameBoy
+from pygb.utility import GBTypes
+from pygb.statehash import StateHasher
+from pygb.memory.color import ColorHardware
+from pygb.cpu.assembler import assemble, build_rom, header_checksum, COLOR_ADDR, HEADER_CHECKSUM_ADDR
+
+from helpers import COUNTER_SOURCE, make_gameboy
+
+# A general VRAM DMA of 4 blocks from C000 to 8000, then two speed switches
+STALL_SOURCE = """
+start:
+    LD A, 0xC0
+    LDH (0xFF00+0x51), A
+    LD A, 0x00
+    LDH (0xFF00+0x52), A
+    LDH (0xFF00+0x53), A
+    LDH (0xFF00+0x54), A
+    LD A, 0x03
+dma:
+    LDH (0xFF00+0x55), A
+    LD A, 0x01
+    LDH (0xFF00+0x4D), A
+switch_double:
+    STOP
+    LDH (0xFF00+0x4D), A
+switch_normal:
+    STOP
+done:
+    JP done
+"""
+STALL_SYMBOLS = assemble(STALL_SOURCE).symbols
+
+
+class ColorBanksTest(unittest.TestCase):
+    def setUp(self):
+        self.gb = make_gameboy(gb_type=GBTypes.gameboy_color)
+        self.memory = self.gb.memory
+
+    def test_vram_banks(self):
+        memory = self.memory
+        memory.write_byte(0x8000, 0x11)
+        memory.select_vram_bank(1)
+        self.assertEqual(memory.read_byte(0x8000), 0x00)
+        memory.write_byte(0x8000, 0x22)
+        memory.select_vram_bank(0)
+        self.assertEqual(memory.read_byte(0x8000), 0x11)
+        self.assertEqual(memory.get_vram_bank(1)[0], 0x22)
+
+    def test_wram_banks(self):
+        memory = self.memory
+        memory.select_wram_bank(2)
+        memory.write_byte(0xD000, 0x33)
+        self.assertEqual(memory.read_byte(0xF000), 0x33)
+        memory.select_wram_bank(0)
+        self.assertEqual(memory.wram_bank, 1)
+        self.assertEqual(memory.read_byte(0xD000), 0x00)
+        memory.select_wram_bank(2)
+        self.assertEqual(memory.read_byte(0xD000), 0x33)
+
+    def test_state_keeps_banks(self):
+        memory = self.memory
+        memory.write_byte(0x8000, 0x11)
+        memory.select_vram_bank(1)
+        memory.write_byte(0x8000, 0x22)
+        state = self.gb.save_state()
+
+        memory.write_byte(0x8000, 0x44)
+        memory.select_vram_bank(0)
+        memory.write_byte(0x8000, 0x55)
+        self.gb.load_state(state)
+        self.assertEqual(memory.vram_bank, 1)
+        self.assertEqual(memory.read_byte(0x8000), 0x22)
+        self.assertEqual(memory.get_vram_bank(0)[0], 0x11)
+
+
+class ColorRomTest(unittest.TestCase):
+    def load(self, color_flag):
+        rom = bytearray(build_rom(COUNTER_SOURCE))
+        rom[COLOR_ADDR] = color_flag
+        rom[HEADER_CHECKSUM_ADDR] = header_checksum(rom)
+        fd, path = tempfile.mkstemp(suffix='.gbc', prefix='pygb-test-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(rom)
+            gb = GameBoy(GBTypes.gameboy_classic)
+            with contextlib.redirect_stdout(io.StringIO()):
+                gb.load_rom(path)
+        finally:
+            os.remove(path)
+        return gb
+
+    def test_color_modes(self):
+        for color_flag, gb_type in ((0x00, GBTypes.gameboy_classic), (0x80, GBTypes.gameboy_color),
+                                    (0xC0, GBTypes.gameboy_color)):
+            gb = self.load(color_flag)
+            self.assertEqual(gb.game_boy_type, gb_type)
+            self.assertEqual(gb.memory.vram_banks is not None, gb_type == GBTypes.gameboy_color)
+            gb.run_frames(1)
+
+
+class StallTest(unittest.TestCase):
+    """
+    VRAM DMA and the speed switch hold the CPU for the same number of normal speed cycles in either speed
+    """
+    def setUp(self):
+        self.gb = make_gameboy(STALL_SOURCE, gb_type=GBTypes.gameboy_color)
+        self.cpu = self.gb.cpu
+
+    def step_to(self, label):
+        while self.cpu.registers.get_pc() != STALL_SYMBOLS[label]:
+            self.cpu.step()
+
+    def step_cycles(self):
+        cycles = self.cpu.cycles
+        self.cpu.step()
+        return self.cpu.cycles - cycles
+
+    def test_dma_normal_speed(self):
+        self.step_to('dma')
+        self.assertEqual(self.step_cycles(), 12 + 4 * ColorHardware.HDMA_BLOCK_CYCLES)
+
+    def test_dma_double_speed(self):
+        self.cpu.set_double_speed(True)
+        self.step_to('dma')
+        self.assertEqual(self.step_cycles(), 6 + 4 * ColorHardware.HDMA_BLOCK_CYCLES)
+        self.assertIsNone(self.cpu.stalled)
+
+    def test_speed_switch(self):
+        self.step_to('switch_double')
+        self.assertEqual(self.step_cycles(), 4 + ColorHardware.SPEED_SWITCH_CYCLES)
+        self.assertEqual(self.cpu.speed_shift, 1)
+
+        # Runs at double speed, the stall is not halved with it
+        self.step_to('switch_normal')
+        self.assertEqual(self.step_cycles(), 2 + ColorHardware.SPEED_SWITCH_CYCLES)
+        self.assertEqual(self.cpu.speed_shift, 0)
+
+
+class StateHasherTest(unittest.TestCase):
+    def run_digests(self, gb_type, frames=5):
+        gb = make_gameboy(gb_type=gb_type)
+        hasher = StateHasher(gb).attach()
+        digests = []
+        gb.video.frame_handlers.append(lambda: digests.append(hasher.digest))
+        gb.run_frames(frames)
+        hasher.detach()
+        return digests
+
+    def test_deterministic(self):
+        for gb_type in (GBTypes.gameboy_classic, GBTypes.gameboy_color):
+            digests = self.run_digests(gb_type)
+            self.assertEqual(digests, self.run_digests(gb_type))
+            self.assertEqual(len(set(digests)), len(digests))
+
+    def test_unselected_banks(self):
+        gb = make_gameboy(gb_type=GBTypes.gameboy_color)
+        hasher = StateHasher(gb).attach()
+        digest = hasher.compute()
+        self.assertEqual(hasher.compute(), digest)
+
+        # Only the banks put aside differ, the memory space is the same
+        gb.memory.vram_banks[1][0] = 0x11
+        self.assertNotEqual(hasher.compute(), digest)
+        gb.memory.vram_banks[1][0] = 0x00
+        gb.memory.wram_banks[3][0] = 0x22
+        self.assertNotEqual(hasher.compute(), digest)
+        gb.memory.wram_banks[3][0] = 0x00
+        self.assertEqual(hasher.compute(), digest)
+        hasher.detach()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.debugger import Debugger, Hit
+from pygb.cpu.assembler import assemble
+
+from helpers import COUNTER_SOURCE, make_gameboy
+
+LOOP = assemble(COUNTER_SOURCE).symbols['loop']
+
+
+class DebuggerTest(unittest.TestCase):
+    def setUp(self):
+        self.gb = make_gameboy()
+        self.debugger = Debugger(self.gb)
+
+    def assert_unhooked(self):
+        self.assertNotIn('step', self.gb.cpu.__dict__)
+        self.assertNotIn('write_byte', self.gb.memory.__dict__)
+        self.assertNotIn('write_short', self.gb.memory.__dict__)
+        self.assertEqual(self.gb.cpu.method_hooks, {})
+        self.assertEqual(self.gb.memory.method_hooks, {})
+
+    def test_breakpoint(self):
+        point = self.debugger.add_breakpoint(LOOP)
+        hit = self.debugger.cont(max_frames=1)
+        self.assertEqual(hit.reason, Hit.BREAKPOINT)
+        self.assertEqual(self.gb.cpu.registers.get_pc(), LOOP)
+
+        # Resuming runs the instruction under the breakpoint and comes back round to it
+        hit = self.debugger.cont(max_frames=1)
+        self.assertEqual(hit.reason, Hit.BREAKPOINT)
+        self.assertEqual(point.hits, 2)
+
+        self.debugger.clear()
+        self.assertIsNone(self.debugger.cont(max_frames=1))
+        self.assert_unhooked()
+
+    def test_watchpoint(self):
+        self.debugger.add_watchpoint(0xC001)
+        hit = self.debugger.cont(max_frames=1)
+        self.assertEqual(hit.reason, Hit.WRITE)
+        self.assertEqual(hit.address, 0xC001)
+        self.assertEqual(hit.value, self.gb.memory.mem[0xC001])
+
+        self.debugger.clear()
+        self.assert_unhooked()
+
+    def check_dirty_tracking(self):
+        memory = self.gb.memory
+        memory.dirty_pages[:] = bytes(memory.PAGE_COUNT)
+        self.debugger.step(20)
+        self.assertEqual(memory.dirty_pages[0xC0], 1)
+
+    def test_watch_then_dirty_tracking(self):
+        memory = self.gb.memory
+        point = self.debugger.add_watchpoint(0xD000)
+        memory.track_dirty_pages(True)
+
+        # Taking the watch out leaves the tracked writes in place
+        self.debugger.remove(point.point_id)
+        self.check_dirty_tracking()
+
+        memory.track_dirty_pages(False)
+        self.assert_unhooked()
+
+    def test_dirty_tracking_then_watch(self):
+        memory = self.gb.memory
+        memory.track_dirty_pages(True)
+        self.debugger.add_watchpoint(0xD000)
+
+        # Stopping tracking leaves the watch in place
+        self.check_dirty_tracking()
+        memory.track_dirty_pages(False)
+        self.debugger.add_watchpoint(0xC000)
+        hit = self.debugger.cont(max_frames=1)
+        self.assertEqual(hit.address, 0xC000)
+
+        self.debugger.clear()
+        self.assert_unhooked()
+
+    def test_double_speed_with_breakpoint(self):
+        cpu = self.gb.cpu
+        self.debugger.add_breakpoint(LOOP)
+        self.debugger.cont(max_frames=1)
+        state = self.gb.save_state()
+        cycles = cpu.cycles
+        self.debugger.step(1)
+        normal = cpu.cycles - cycles
+
+        self.gb.load_state(state)
+        cpu.set_double_speed(True)
+        cycles = cpu.cycles
+        self.debugger.step(1)
+        self.assertEqual(cpu.cycles - cycles, normal >> 1)
+
+        # Either one going away leaves the other working
+        self.debugger.clear()
+        self.assertIn('step', cpu.__dict__)
+        self.debugger.add_breakpoint(LOOP)
+        cpu.set_double_speed(False)
+        hit = self.debugger.cont(max_frames=1)
+        self.assertEqual(hit.reason, Hit.BREAKPOINT)
+
+        self.debugger.clear()
+        self.assert_unhooked()
+
+
+if __name__ == '__main__':
+    unittest.main()
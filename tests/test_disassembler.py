@@ -0,0 +1,111 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.cpu.assembler import build_rom
+from pygb.cpu.disassembler import Disassembler, Flow
+
+# Runs off the end of bank 0 into the switchable bank, which runs off the end of the rom area
+FALL_THROUGH_SOURCE = """
+start:
+    JP 0x3FFD
+.org 0x3FFD
+    NOP
+    NOP
+    NOP
+.org 0x4000
+    INC C
+    JP 0x7FFE
+.org 0x7FFE
+    NOP
+    NOP
+"""
+
+# Selects bank 2 before running off the end of bank 0
+BANK_SELECT_SOURCE = """
+start:
+    LD A, 0x02
+    LD (0x2000), A
+    JP 0x3FFF
+.org 0x3FFF
+    NOP
+.org 0x4000
+    INC C
+    RET
+.org 0x8000
+    INC B
+    JP 0x4000
+"""
+
+
+def disassemble_source(source):
+    return Disassembler(build_rom(source, cart_type=0x01)).run()
+
+
+class DisassemblerTest(unittest.TestCase):
+    def test_falls_through_into_bank_one(self):
+        disassembly = disassemble_source(FALL_THROUGH_SOURCE)
+        instructions = disassembly.instructions
+        self.assertNotIn((0, 0x4000), instructions)
+        self.assertEqual(instructions[(1, 0x4000)][1], 'INC C')
+        self.assertEqual(instructions[(1, 0x4001)][3], (1, 0x7FFE))
+
+        # The block ending at the bank boundary leads into bank 1
+        self.assertEqual(disassembly.blocks[(0, 0x3FFD)], (0x4000, ((1, 0x4000),)))
+        self.assertIn((1, 0x4000), disassembly.blocks)
+
+    def test_stops_at_end_of_rom_area(self):
+        disassembly = disassemble_source(FALL_THROUGH_SOURCE)
+        self.assertIn((1, 0x7FFF), disassembly.instructions)
+        self.assertEqual(disassembly.blocks[(1, 0x7FFE)], (0x8000, ()))
+        self.assertFalse(any(address >= 0x8000 for _, address in disassembly.instructions))
+
+    def test_falls_through_into_selected_bank(self):
+        disassembly = disassemble_source(BANK_SELECT_SOURCE)
+        instructions = disassembly.instructions
+        self.assertEqual(instructions[(2, 0x4000)][1], 'INC B')
+        self.assertNotIn((1, 0x4000), instructions)
+        self.assertEqual(instructions[(2, 0x4001)][2], Flow.JUMP)
+        self.assertEqual(instructions[(2, 0x4001)][3], (2, 0x4000))
+
+    def test_bank_offsets(self):
+        disassembler = Disassembler(build_rom(BANK_SELECT_SOURCE, cart_type=0x01))
+        self.assertEqual(disassembler.get_offset((0, 0x3FFF)), 0x3FFF)
+        self.assertEqual(disassembler.get_offset((2, 0x4000)), 0x8000)
+        self.assertEqual(disassembler.resolve(0x4000, 3), (3, 0x4000))
+        self.assertIsNone(disassembler.resolve(0x4000, 4))
+        self.assertIsNone(disassembler.resolve(0x8000, 1))
+
+    def test_listing_labels_functions(self):
+        disassembly = disassemble_source(FALL_THROUGH_SOURCE)
+        listing = disassembly.get_listing()
+        self.assertIn('func_00_0100:', listing)
+        self.assertIn('00:0100 func_00_0100', disassembly.get_symbols())
+
+
+if __name__ == '__main__':
+    unittest.main()
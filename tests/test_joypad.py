@@ -0,0 +1,174 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pygb.cpu.interrupt import Interrupts
+from pygb.joypad import movie
+from pygb.joypad.joypad import Buttons, Joypad
+from pygb.joypad.movie import Capabilities, MovieException, MovieReader, MovieWriter
+
+from helpers import make_gameboy
+
+
+class MovieTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.pgbm', prefix='pygb-test-')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write_movie(self, frames):
+        writer = MovieWriter(self.path, flags=3)
+        for buttons in frames:
+            writer.add_frame(buttons)
+        writer.close()
+
+    def read_movie(self):
+        reader = MovieReader(self.path)
+        frames = []
+        while True:
+            buttons = reader.next_frame()
+            if buttons is None:
+                break
+            frames.append(buttons)
+        reader.close()
+        return reader, frames
+
+
+class MovieTest(MovieTestCase):
+    def test_round_trip(self):
+        # Long holds need more than one varint byte, short ones exercise the run boundaries
+        frames = [0] * 3 + [Buttons.A] * 200 + [Buttons.A | Buttons.RIGHT] + [0] * 20000 + [Buttons.START]
+        self.write_movie(frames)
+        reader, read_back = self.read_movie()
+        self.assertEqual(read_back, frames)
+        self.assertEqual(reader.flags, 3)
+        self.assertEqual(reader.frame, len(frames))
+
+    def test_writer_merges_runs(self):
+        writer = MovieWriter(self.path)
+        writer.add_frame(Buttons.B, 5)
+        writer.add_frame(Buttons.B, 5)
+        writer.close()
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read()[Capabilities.header.size:], bytes((Buttons.B, 10)))
+
+    def test_truncated_record(self):
+        with open(self.path, 'wb') as f:
+            f.write(Capabilities.header.pack(Capabilities.magic, Capabilities.version, 0, 0))
+            f.write(bytes((Buttons.A, 0x80)))
+        reader = MovieReader(self.path)
+        with self.assertRaises(MovieException):
+            reader.next_frame()
+        reader.close()
+
+    def check_header_error(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        opened = []
+
+        def open_tracked(*args, **kwargs):
+            f = io.open(*args, **kwargs)
+            opened.append(f)
+            return f
+
+        with mock.patch.object(movie, 'open', open_tracked, create=True):
+            with self.assertRaises(MovieException):
+                MovieReader(self.path)
+        self.assertEqual(len(opened), 1)
+        self.assertTrue(opened[0].closed)
+
+    def test_header_errors_close_the_file(self):
+        self.check_header_error(b'PGB')
+        self.check_header_error(Capabilities.header.pack(b'NOPE', Capabilities.version, 0, 0))
+        self.check_header_error(Capabilities.header.pack(Capabilities.magic, Capabilities.version + 1, 0, 0))
+
+
+class JoypadTest(MovieTestCase):
+    def setUp(self):
+        super().setUp()
+        self.gb = make_gameboy()
+        self.memory = self.gb.memory
+        self.joypad = self.gb.joypad
+        self.memory.write_byte(Interrupts.INTERRUPT_FLAG_ADDR, 0)
+
+    def read_p1(self, select):
+        self.memory.write_byte(Joypad.P1_ADDR, select)
+        return self.memory.read_byte(Joypad.P1_ADDR)
+
+    def interrupt_requested(self):
+        return bool(self.memory.read_byte(Interrupts.INTERRUPT_FLAG_ADDR) & Interrupts.INTERRUPT_JOYPAD)
+
+    def test_p1_select(self):
+        self.joypad.set_buttons(Buttons.LEFT | Buttons.DOWN | Buttons.A | Buttons.START)
+        # A group is selected by a 0 bit, so writing the buttons bit reads the directions
+        self.assertEqual(self.read_p1(Joypad.P1_SELECT_BUTTONS), 0xC0 | Joypad.P1_SELECT_BUTTONS | 0x05)
+        self.assertEqual(self.read_p1(Joypad.P1_SELECT_DIRECTIONS), 0xC0 | Joypad.P1_SELECT_DIRECTIONS | 0x06)
+        # Both groups selected read as the combined lines, neither as all released
+        self.assertEqual(self.read_p1(0x00), 0xC0 | 0x04)
+        self.assertEqual(self.read_p1(Joypad.P1_SELECT_MASK), 0xC0 | Joypad.P1_SELECT_MASK | 0x0F)
+
+    def test_interrupt_on_selected_press(self):
+        self.read_p1(Joypad.P1_SELECT_BUTTONS)  # directions selected
+        self.joypad.set_buttons(Buttons.A)
+        self.assertFalse(self.interrupt_requested())
+
+        self.joypad.set_buttons(Buttons.A | Buttons.UP)
+        self.assertTrue(self.interrupt_requested())
+
+        # Held or released buttons do not request it again
+        self.memory.write_byte(Interrupts.INTERRUPT_FLAG_ADDR, 0)
+        self.joypad.set_buttons(Buttons.UP)
+        self.joypad.set_buttons(0)
+        self.assertFalse(self.interrupt_requested())
+
+    def test_movie_playback(self):
+        self.write_movie([Buttons.A, Buttons.A, Buttons.B])
+        self.joypad.play(self.path)
+        held = []
+        for _ in range(5):
+            self.joypad.frame()
+            held.append(self.joypad.pressed)
+        self.assertEqual(held, [Buttons.A, Buttons.A, Buttons.B, 0, 0])
+        self.assertIsNone(self.joypad.movie)
+
+    def test_movie_plays_at_frame_boundaries(self):
+        self.write_movie([Buttons.START] * 3)
+        self.joypad.play(self.path)
+        self.gb.run_frames(2)
+        self.assertEqual(self.joypad.pressed, Buttons.START)
+        self.assertEqual(self.joypad.movie.frame, 2)
+        self.joypad.movie.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
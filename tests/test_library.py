@@ -0,0 +1,93 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pygb.library import RomLibrary, MIN_PARALLEL
+from pygb.cpu.assembler import build_rom, GLOBAL_CHECKSUM_ADDR
+
+
+class RomLibraryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='pygb-library-')
+        self.roms = os.path.join(self.directory, 'roms')
+        os.mkdir(self.roms)
+        self.library = RomLibrary(os.path.join(self.directory, 'library.sqlite3'))
+
+    def tearDown(self):
+        self.library.close()
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.roms, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_scan_and_find(self):
+        self.write('tetris.gb', build_rom('start:\n    JP start\n', title='tetris'))
+        self.write('color.gbc', build_rom('start:\n    JP start\n', title='colors', is_color=True))
+        bad = bytearray(build_rom('start:\n    JP start\n', title='broken'))
+        bad[GLOBAL_CHECKSUM_ADDR] ^= 0xFF
+        self.write('broken.gb', bad)
+        self.write('tiny.gb', b'\x00' * 16)
+        self.write('notes.txt', b'not a rom')
+
+        stats = self.library.scan([self.roms], workers=1)
+        self.assertEqual((stats.added, stats.errors), (4, 1))
+        self.assertEqual(self.library.count(), 4)
+
+        self.assertEqual([row['title'] for row in self.library.find(title='TET')], ['TETRIS'])
+        self.assertEqual([row['title'] for row in self.library.find(is_color=True)], ['COLORS'])
+        bad_paths = sorted(os.path.basename(row['path']) for row in self.library.find(bad=True))
+        self.assertEqual(bad_paths, ['broken.gb', 'tiny.gb'])
+
+    def test_rescan_only_reads_changes(self):
+        path = self.write('a.gb', build_rom('start:\n    JP start\n', title='a'))
+        self.write('b.gb', build_rom('start:\n    JP start\n', title='b'))
+        self.library.scan([self.roms], workers=1)
+
+        stats = self.library.scan([self.roms], workers=1)
+        self.assertEqual((stats.added, stats.updated, stats.unchanged), (0, 0, 2))
+
+        os.remove(path)
+        stats = self.library.scan([self.roms], workers=1)
+        self.assertEqual(stats.removed, 1)
+        self.assertEqual(self.library.count(), 1)
+
+    def test_parallel_scan(self):
+        for index in range(MIN_PARALLEL + 8):
+            self.write('rom{}.gb'.format(index), build_rom('start:\n    JP start\n', title='rom{}'.format(index)))
+        stats = self.library.scan([self.roms], workers=2)
+        self.assertEqual((stats.added, stats.errors), (MIN_PARALLEL + 8, 0))
+        self.assertEqual(len(self.library.find(title='ROM1')), 1 + 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.serial.link import SerialLink, CaptureLink, LocalLink
+
+from helpers import make_gameboy
+
+# Sends 'A' on the internal clock, then waits
+SEND_SOURCE = """
+start:
+    LD A, 0x41
+    LDH (0xFF00+0x01), A
+    LD A, 0x81
+    LDH (0xFF00+0x02), A
+loop:
+    JP loop
+"""
+
+# Waits for the other side to clock 'B' out
+RECEIVE_SOURCE = """
+start:
+    LD A, 0x42
+    LDH (0xFF00+0x01), A
+    LD A, 0x80
+    LDH (0xFF00+0x02), A
+loop:
+    JP loop
+"""
+
+
+class SerialLinkTest(unittest.TestCase):
+    def test_base_link_is_unplugged(self):
+        self.assertEqual(SerialLink().exchange(0x12), 0xFF)
+
+    def test_capture_link(self):
+        link = CaptureLink()
+        self.assertEqual(link.exchange(ord('h')), 0xFF)
+        link.exchange(ord('i'))
+        self.assertEqual(link.get_text(), 'hi')
+        link.clear()
+        self.assertEqual(link.get_text(), '')
+
+    def test_transfer_from_rom(self):
+        gb = make_gameboy(SEND_SOURCE)
+        capture = gb.serial.connect(CaptureLink())
+        gb.run_frames(1)
+        self.assertEqual(capture.get_text(), 'A')
+        # Nothing answered, the rom reads the byte of an unplugged cable
+        self.assertEqual(gb.memory.mem[0xFF01], 0xFF)
+
+    def test_local_link(self):
+        sender = make_gameboy(SEND_SOURCE)
+        receiver = make_gameboy(RECEIVE_SOURCE)
+        LocalLink.connect(sender.serial, receiver.serial)
+        receiver.run_frames(1)
+        sender.run_frames(1)
+        self.assertEqual(sender.memory.mem[0xFF01], 0x42)
+        self.assertEqual(receiver.memory.mem[0xFF01], 0x41)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.pacing import FramePacer
+
+
+class FakeVideo:
+    # A round frame period of 20ms
+    vert_sync_hz = 50.0
+
+    def __init__(self):
+        self.frame_handlers = []
+
+
+class FakeClock:
+    """
+    Time only moves when the emulation works or the pacer sleeps. Sleeps can be made to overshoot.
+    """
+    def __init__(self):
+        self.now = 100.0
+        self.oversleep = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds + self.oversleep
+
+
+class FramePacerTest(unittest.TestCase):
+    def setUp(self):
+        self.video = FakeVideo()
+        self.time = FakeClock()
+        self.pacer = FramePacer(self.video, clock=self.time.clock, sleep=self.time.sleep).attach()
+
+    def run_frame(self, work):
+        self.time.now += work
+        for handler in self.video.frame_handlers:
+            handler()
+
+    def test_sleeps_the_rest_of_the_frame(self):
+        self.run_frame(0.0)
+        for _ in range(5):
+            self.run_frame(0.005)
+        self.assertEqual(len(self.time.sleeps), 5)
+        for seconds in self.time.sleeps:
+            self.assertAlmostEqual(seconds, 0.015)
+        self.assertAlmostEqual(self.time.now, 100.1)
+
+    def test_oversleep_is_made_up(self):
+        self.run_frame(0.0)
+        self.time.oversleep = 0.004
+        self.run_frame(0.005)
+        self.time.oversleep = 0.0
+        self.run_frame(0.005)
+        self.run_frame(0.005)
+
+        # The frame after the oversleep gets 4ms less, and the schedule is back on its due times
+        self.assertAlmostEqual(self.time.sleeps[0], 0.015)
+        self.assertAlmostEqual(self.time.sleeps[1], 0.011)
+        self.assertAlmostEqual(self.time.sleeps[2], 0.015)
+        self.assertAlmostEqual(self.time.now, 100.06)
+
+    def test_late_frames_catch_up(self):
+        self.run_frame(0.0)
+        self.run_frame(0.03)
+        self.run_frame(0.005)
+        self.assertEqual(self.pacer.late_frames, 1)
+        self.assertEqual(self.pacer.resyncs, 0)
+        # Due at 100.04, the second frame only sleeps what is left
+        self.assertAlmostEqual(self.time.sleeps[0], 0.005)
+
+    def test_resync_when_too_far_behind(self):
+        self.run_frame(0.0)
+        self.run_frame(FramePacer.MAX_LAG + 0.1)
+        self.assertEqual(self.pacer.resyncs, 1)
+        self.assertEqual(self.time.sleeps, [])
+
+        # A new schedule from the late frame, no burst of unslept frames
+        self.run_frame(0.005)
+        self.assertAlmostEqual(self.time.sleeps[0], 0.015)
+
+    def test_uncapped(self):
+        self.pacer.set_speed(FramePacer.UNCAPPED)
+        for _ in range(10):
+            self.run_frame(0.001)
+        self.assertEqual(self.time.sleeps, [])
+        self.assertEqual(self.pacer.get_stats()['frames'], 10)
+
+    def test_turbo(self):
+        self.pacer.set_speed(4.0)
+        self.run_frame(0.0)
+        self.run_frame(0.001)
+        self.assertAlmostEqual(self.time.sleeps[0], 0.004)
+
+    def test_set_speed_starts_a_new_schedule(self):
+        self.run_frame(0.0)
+        self.run_frame(0.005)
+        self.pacer.set_speed(2.0)
+
+        # The first frame at the new speed only anchors, then frames are 10ms apart from it
+        self.run_frame(0.005)
+        self.assertEqual(len(self.time.sleeps), 1)
+        self.run_frame(0.002)
+        self.assertAlmostEqual(self.time.sleeps[1], 0.008)
+
+    def test_negative_speed(self):
+        with self.assertRaises(ValueError):
+            self.pacer.set_speed(-1.0)
+
+    def test_stats(self):
+        self.run_frame(0.0)
+        for _ in range(4):
+            self.run_frame(0.01)
+        stats = self.pacer.get_stats()
+        self.assertEqual(stats['frames'], 5)
+        self.assertAlmostEqual(stats['slept'], 0.04)
+        self.assertAlmostEqual(stats['idle'], 0.5)
+        # Counted from the first frame boundary
+        self.assertAlmostEqual(stats['fps'], 5 / 0.08)
+
+    def test_detach(self):
+        self.pacer.detach()
+        self.assertEqual(self.video.frame_handlers, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
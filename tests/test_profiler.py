@@ -0,0 +1,216 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.cpu.assembler import assemble
+from pygb.cpu.instructions.instructions import Instruction, instructions
+from pygb.cpu.registers import IReg
+from pygb.profiler import Profiler, SymbolTable, ProfilerException, CALL_OPCODES, RET_OPCODES
+
+from helpers import make_gameboy
+
+# Nested calls from the main loop, and a V-Blank routine which takes a while. Interrupts only come in after
+# instructions without operands, the CPU dispatches them before it steps over the operand.
+CALLS_SOURCE = """
+    .org 0x0040
+vblank:
+    DEC C
+    JR NZ, vblank
+    RETI
+
+    .org 0x0150
+start:
+    DI
+    LD A, 0x01
+    LDH (0xFF00+0xFF), A
+    EI
+main:
+    CALL outer
+    JP main
+outer:
+    CALL inner
+    RET
+inner:
+    DEC B
+    JR NZ, inner
+    RET
+"""
+CALLS_SYMBOLS = assemble(CALLS_SOURCE).symbols
+
+
+def push_pc(reg, mem, return_address):
+    sp = (reg.get_sp() - 2) & 0xFFFF
+    # Little endian, as read_short reads it back
+    mem.write_byte(sp, return_address & 0xFF)
+    mem.write_byte(sp + 1, return_address >> 8)
+    reg.set_sp(sp)
+
+
+def call_nn(inst, reg, mem):
+    push_pc(reg, mem, (reg.get_pc() + 2) & 0xFFFF)
+    reg.set_pc(mem.read_short(reg.get_pc()))
+
+
+def ret(inst, reg, mem):
+    reg.set_pc(mem.read_short(reg.get_sp()))
+    reg.set_sp((reg.get_sp() + 2) & 0xFFFF)
+
+
+def install_calls(gb):
+    """
+    The CPU does not implement calls or interrupt dispatch yet, plug in enough of them for the profiler to wrap
+    :return: The instructions replaced, to put back
+    """
+    interrupts = gb.cpu.interrupts
+
+    def reti(inst, reg, mem):
+        ret(inst, reg, mem)
+        interrupts.IME = 1
+
+    def vblank():
+        interrupts.IME = 0
+        push_pc(gb.cpu.registers, gb.memory, gb.cpu.registers.get_pc())
+        gb.cpu.registers.set_pc(interrupts.VBLANK_START_ADDR)
+
+    replaced = {}
+    for opcode, instruction in ((0xCD, Instruction('CALL 0x%04X', 24, call_nn, (IReg.REGISTER_PC, True), None, 2, True)),
+                                (0xC9, Instruction('RET', 16, ret, None, None, 0, True)),
+                                (0xD9, Instruction('RETI', 16, reti, None, None, 0, True))):
+        replaced[opcode] = instructions[opcode]
+        instructions[opcode] = instruction
+    interrupts.vblank = vblank
+    return replaced
+
+
+def make_symbols():
+    table = SymbolTable()
+    table.parse('00:{:04X} {}'.format(address, name) for name, address in CALLS_SYMBOLS.items()
+                if not name.endswith('_loop'))
+    return table
+
+
+class SymbolTableTest(unittest.TestCase):
+    def test_parse_and_lookup(self):
+        table = SymbolTable()
+        table.parse([
+            '; File generated by rgblink',
+            '00:0150 Start',
+            '00:0160 Start.loop',
+            '00:0200 Other ; trailing comment',
+            '',
+            '01:4000 BankedFunc',
+            'not a symbol',
+        ])
+        self.assertIsNone(table.lookup(0, 0x0100))
+        self.assertEqual(table.lookup(0, 0x0150), 'Start')
+        # Local labels count towards their function
+        self.assertEqual(table.lookup(0, 0x0165), 'Start')
+        self.assertEqual(table.lookup(0, 0x0300), 'Other')
+        self.assertEqual(table.lookup(1, 0x5000), 'BankedFunc')
+        self.assertIsNone(table.lookup(2, 0x4000))
+
+    def test_bad_line(self):
+        with self.assertRaises(ProfilerException):
+            SymbolTable().parse(['zz:0150 Start'])
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.gb = make_gameboy(CALLS_SOURCE)
+        self.replaced = install_calls(self.gb)
+        self.saved = {opcode: instructions[opcode].execute for opcode in CALL_OPCODES + RET_OPCODES}
+
+    def tearDown(self):
+        # Put the shared table back even if a test failed half way
+        for opcode, execute in self.saved.items():
+            instructions[opcode].execute = execute
+        for opcode, instruction in self.replaced.items():
+            instructions[opcode] = instruction
+        Profiler.wrapping = None
+
+    def run_profiler(self, frames=20):
+        profiler = Profiler(self.gb, interval=64, symbols=make_symbols()).attach()
+        try:
+            self.gb.run_frames(frames)
+        finally:
+            profiler.detach()
+        return profiler
+
+    def test_shadow_stack(self):
+        profiler = self.run_profiler()
+        lines = profiler.get_collapsed()
+        stacks = {line.rsplit(' ', 1)[0] for line in lines}
+        self.assertIn('outer;inner', stacks)
+        self.assertIn('outer', stacks)
+
+        # V-Blank lands on top of whatever was running, the nested calls are still below it
+        self.assertIn('outer;inner;vblank', stacks)
+        for stack in stacks:
+            self.assertTrue(stack.startswith(('outer', 'main', 'start', 'vblank')), stack)
+            self.assertNotIn('inner;outer', stack)
+
+        total = sum(int(line.rsplit(' ', 1)[1]) for line in lines)
+        self.assertEqual(total, sum(profiler.samples.values()))
+        self.assertEqual(lines, sorted(lines))
+
+    def test_flat(self):
+        profiler = self.run_profiler()
+        flat = {name: (count, total) for name, count, total in profiler.get_flat()}
+        self.assertGreater(flat['inner'][0], flat['outer'][0])
+        # Time in inner counts towards outer's total
+        self.assertGreaterEqual(flat['outer'][1], flat['inner'][1])
+        self.assertIn('samples, every 64 cycles', profiler.format_flat())
+
+    def test_detach_restores_instructions(self):
+        profiler = Profiler(self.gb, interval=64).attach()
+        self.assertNotEqual({opcode: instructions[opcode].execute for opcode in self.saved}, self.saved)
+        self.assertIn('vblank', self.gb.cpu.interrupts.__dict__)
+        profiler.detach()
+        self.assertEqual({opcode: instructions[opcode].execute for opcode in self.saved}, self.saved)
+        self.assertNotIn('vblank', self.gb.cpu.interrupts.__dict__)
+
+    def test_one_call_stack_profiler(self):
+        first = Profiler(self.gb, interval=64).attach()
+        other_gb = make_gameboy(CALLS_SOURCE)
+        install_calls(other_gb)
+        with self.assertRaises(ProfilerException):
+            Profiler(other_gb, interval=64).attach()
+
+        # Without call stacks nothing shared is touched
+        flat = Profiler(other_gb, interval=64, call_stacks=False).attach()
+        other_gb.run_frames(1)
+        flat.detach()
+        self.assertGreater(sum(flat.samples.values()), 0)
+
+        first.detach()
+        second = Profiler(other_gb, interval=64).attach()
+        second.detach()
+        self.assertEqual({opcode: instructions[opcode].execute for opcode in self.saved}, self.saved)
+
+
+if __name__ == '__main__':
+    unittest.main()
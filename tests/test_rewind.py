@@ -0,0 +1,73 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.rewind import RewindBuffer
+
+from helpers import make_gameboy
+
+
+class RewindBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.gb = make_gameboy()
+        self.states = []
+        # Runs before the rewind buffer captures, so both see the same frame
+        self.gb.video.frame_handlers.append(lambda: self.states.append(bytes(self.gb.save_state())))
+        self.rewind = RewindBuffer(self.gb, seconds=1.0, keyframe_interval=4).start()
+
+    def tearDown(self):
+        self.rewind.close()
+
+    def test_rewind_restores_frames(self):
+        self.gb.run_frames(10)
+        self.assertTrue(self.rewind.rewind(3))
+        self.assertEqual(self.gb.save_state(), self.states[-3])
+
+        # The restored frame is kept, going back one more lands on the frame before it
+        self.assertTrue(self.rewind.rewind(2))
+        self.assertEqual(self.gb.save_state(), self.states[-4])
+
+    def test_not_enough_history(self):
+        self.gb.run_frames(2)
+        self.assertFalse(self.rewind.rewind(3))
+        self.assertFalse(self.rewind.rewind(0))
+
+    def test_keeps_at_most_seconds(self):
+        self.gb.run_frames(100)
+        stats = self.rewind.get_stats()
+        self.assertLessEqual(stats['frames'], self.rewind.max_frames)
+        self.assertGreater(stats['frames'], 0)
+
+    def test_run_after_rewind(self):
+        self.gb.run_frames(5)
+        self.rewind.rewind(1)
+        result = self.gb.run_frames(2)
+        self.assertEqual(result.frames, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
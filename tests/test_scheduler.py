@@ -0,0 +1,143 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.scheduler import Scheduler
+
+from helpers import make_gameboy
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.ran = []
+
+    def record(self, name):
+        return lambda cycle: self.ran.append((name, cycle))
+
+    def test_order(self):
+        scheduler = self.scheduler
+        self.assertEqual(scheduler.deadline, Scheduler.NEVER)
+        scheduler.schedule(30, self.record('c'))
+        scheduler.schedule(10, self.record('a'))
+        scheduler.schedule(10, self.record('b'))
+        self.assertEqual(scheduler.deadline, 10)
+
+        scheduler.run_due(20)
+        self.assertEqual(self.ran, [('a', 10), ('b', 10)])
+        self.assertEqual(scheduler.deadline, 30)
+
+    def test_cancel(self):
+        scheduler = self.scheduler
+        event = scheduler.schedule(10, self.record('a'))
+        scheduler.schedule(20, self.record('b'))
+        scheduler.cancel(event)
+        scheduler.cancel(None)
+        self.assertEqual(scheduler.update_deadline(), 20)
+        scheduler.run_due(20)
+        self.assertEqual(self.ran, [('b', 20)])
+
+    def test_events_scheduled_by_events(self):
+        scheduler = self.scheduler
+
+        def chain(cycle):
+            self.ran.append(('chain', cycle))
+            if cycle < 30:
+                scheduler.schedule(cycle + 10, chain)
+        scheduler.schedule(10, chain)
+        scheduler.run_due(35)
+        self.assertEqual(self.ran, [('chain', 10), ('chain', 20), ('chain', 30)])
+        self.assertEqual(scheduler.deadline, Scheduler.NEVER)
+
+    def test_rebase(self):
+        scheduler = self.scheduler
+        deltas = []
+        scheduler.rebase_handlers.append(deltas.append)
+        scheduler.schedule(Scheduler.REBASE_THRESHOLD + 100, self.record('a'))
+
+        now = Scheduler.REBASE_THRESHOLD + 50
+        self.assertTrue(scheduler.needs_rebase(now))
+        delta = scheduler.get_rebase_delta(now)
+        self.assertEqual(delta % Scheduler.REBASE_ALIGN, 0)
+        scheduler.rebase(delta)
+        now -= delta
+        self.assertFalse(scheduler.needs_rebase(now))
+        self.assertEqual(deltas, [delta])
+        self.assertEqual(scheduler.offset, delta)
+        self.assertEqual(scheduler.deadline - now, 50)
+
+    def test_move(self):
+        scheduler = self.scheduler
+        scheduler.schedule(100, self.record('a'))
+        scheduler.move(-60)
+        self.assertEqual(scheduler.deadline, 40)
+        self.assertEqual(scheduler.offset, 60)
+
+    def test_move_inside_run_due(self):
+        scheduler = self.scheduler
+
+        def load(cycle):
+            # Sets the counter back by 10, as loading a state would, then schedules against the new counter
+            scheduler.move(-10)
+            scheduler.schedule(6, self.record('due'))
+            scheduler.schedule(7, self.record('later'))
+        scheduler.schedule(10, load)
+        scheduler.schedule(15, self.record('kept'))
+        scheduler.run_due(16)
+        self.assertEqual(self.ran, [('kept', 5), ('due', 6)])
+        self.assertEqual(scheduler.deadline, 7)
+
+    def test_reset_inside_run_due(self):
+        scheduler = self.scheduler
+        scheduler.schedule(10, lambda cycle: scheduler.reset())
+        scheduler.schedule(10, self.record('stale'))
+        scheduler.run_due(10)
+        self.assertEqual(self.ran, [])
+
+
+class GameBoyRebaseTest(unittest.TestCase):
+    def test_rebase_is_invisible(self):
+        """
+        A rebase part way through changes none of what the game sees
+        """
+        gb_a = make_gameboy()
+        gb_b = make_gameboy()
+        gb_a.run_frames(3)
+        gb_b.run_frames(3)
+        gb_b.rebase()
+        self.assertLess(gb_b.cpu.cycles, gb_a.cpu.cycles)
+
+        for i in range(3):
+            gb_a.run_frames(1)
+            gb_b.run_frames(1)
+            self.assertEqual(gb_a.memory.mem, gb_b.memory.mem)
+            self.assertEqual(gb_a.cpu.cycles - gb_b.cpu.cycles, gb_b.scheduler.offset)
+            self.assertEqual(gb_a.timer.read_div(0), gb_b.timer.read_div(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
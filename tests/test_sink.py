@@ -0,0 +1,109 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+from array import array
+
+from pygb.sound.sink import AudioRingBuffer, Resampler, AudioSink, PipeSink, AudioSinkException
+
+
+class AudioRingBufferTest(unittest.TestCase):
+    def test_wraps_around(self):
+        ring = AudioRingBuffer(8)
+        self.assertTrue(ring.push(array('h', range(6))))
+        self.assertEqual(ring.pop(), array('h', range(6)))
+        self.assertTrue(ring.push(array('h', range(10, 16))))
+        self.assertEqual(ring.get_fill(), 6)
+        self.assertEqual(ring.pop(), array('h', range(10, 16)))
+        self.assertEqual(ring.pop(), array('h'))
+
+    def test_overrun_drops_block(self):
+        ring = AudioRingBuffer(8)
+        self.assertTrue(ring.push(array('h', range(6))))
+        self.assertFalse(ring.push(array('h', range(4))))
+        self.assertEqual(ring.overruns, 1)
+        self.assertEqual(ring.dropped_samples, 4)
+        self.assertEqual(ring.pop(), array('h', range(6)))
+
+
+class ResamplerTest(unittest.TestCase):
+    def test_same_rate_passes_through(self):
+        samples = array('h', range(20))
+        self.assertIs(Resampler(44100, 44100).process(samples), samples)
+
+    def test_output_rate_across_blocks(self):
+        resampler = Resampler(44150, 48000)
+        total = 0
+        for _ in range(100):
+            total += len(resampler.process(array('h', bytes(735 * 2 * 2)))) // 2
+        self.assertAlmostEqual(total, 73500 * 48000 / 44150, delta=2)
+
+    def test_interpolates_each_channel(self):
+        resampler = Resampler(1000, 2000)
+        # Left rises by 100 a frame, right falls by 100
+        samples = array('h')
+        for i in range(5):
+            samples.extend((i * 100, -i * 100))
+        out = resampler.process(samples)
+        self.assertEqual(list(out[0::2]), [0, 50, 100, 150, 200, 250, 300, 350])
+        self.assertEqual(list(out[1::2]), [0, -50, -100, -150, -200, -250, -300, -350])
+
+        # The last frame was held back, and continues the line with the next block
+        out = resampler.process(array('h', (500, -500)))
+        self.assertEqual(list(out), [400, -400, 450, -450])
+
+
+class AudioSinkTest(unittest.TestCase):
+    def test_base_sink_drops_samples(self):
+        sink = AudioSink(44100).start()
+        sink.write_frame(array('h', bytes(100)))
+        sink.close()
+        self.assertEqual(sink.get_stats()['samples_written'], 50)
+
+    def test_unsupported_rate(self):
+        with self.assertRaises(AudioSinkException):
+            AudioSink(44100, 22050)
+
+    def test_pipe_sink_writes_little_endian(self):
+        class Stream:
+            def __init__(self):
+                self.data = b''
+
+            def write(self, data):
+                self.data += data
+
+            def flush(self):
+                pass
+
+        stream = Stream()
+        sink = PipeSink(44100, 44100, stream).start()
+        sink.write_frame(array('h', (1, -2)))
+        sink.close()
+        self.assertEqual(stream.data, b'\x01\x00\xfe\xff')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.sound.sound import Capabilities, Channel, SquareChannel
+
+SILENCE = 128
+
+
+class ChannelTest(unittest.TestCase):
+    def test_base_channel_is_silent(self):
+        channel = Channel(44100)
+        channel.write(2, 0xF0)
+        channel.write(4, 0x80)
+        self.assertTrue(channel.enabled)
+        self.assertEqual(channel.render(100), bytes((SILENCE,)) * 100)
+
+    def test_square_wave(self):
+        channel = SquareChannel(44100)
+        channel.write(1, 0x80)
+        channel.write(2, 0xF0)
+        channel.write(3, 0x00)
+        channel.write(4, 0x87)
+        samples = channel.render(441)
+        self.assertEqual(len(samples), 441)
+        self.assertEqual(len(set(samples)), 2)
+
+    def test_length_counter_stops_channel(self):
+        channel = SquareChannel(44100)
+        # A length of one 256Hz tick
+        channel.write(1, 0x80 | 0x3F)
+        channel.write(2, 0xF0)
+        channel.write(4, 0xC7)
+        samples = channel.render(400)
+        self.assertFalse(channel.enabled)
+        self.assertNotEqual(samples[:100], bytes((SILENCE,)) * 100)
+        self.assertEqual(samples[200:], bytes((SILENCE,)) * 200)
+
+    def test_render_frame_applies_writes_in_place(self):
+        channel = SquareChannel(44100)
+        channel.write(1, 0x80)
+        channel.write(3, 0x00)
+        samples = channel.render_frame(200, [(100, 2, 0xF0), (100, 4, 0x87)])
+        self.assertEqual(len(samples), 200)
+        self.assertEqual(samples[:100], bytes((SILENCE,)) * 100)
+        self.assertNotEqual(samples[100:], bytes((SILENCE,)) * 100)
+
+    def test_sweep_period_0_keeps_the_timer_running(self):
+        channel = SquareChannel(44100, has_sweep=True)
+        tick = 44100 // Capabilities.sweep_hz
+        channel.write(0, 0x00)
+        channel.write(1, 0x80)
+        channel.write(2, 0xF0)
+        channel.write(3, 0x00)
+        channel.write(4, 0x84)
+        self.assertEqual(channel.sweep_timer, 8 * tick)
+
+        # The timer keeps counting down 8 ticks without changing the frequency, then picks up the new period
+        channel.write(0, 0x11)
+        channel.render(8 * tick - 1)
+        self.assertEqual(channel.get_frequency(), 0x400)
+        channel.render(1)
+        self.assertEqual(channel.get_frequency(), 0x600)
+        self.assertEqual(channel.sweep_timer, tick)
+        channel.render(tick)
+        self.assertFalse(channel.enabled)
+
+
+if __name__ == '__main__':
+    unittest.main()
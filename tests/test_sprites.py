@@ -0,0 +1,173 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.memory.memory import MemoryLocations
+from pygb.video.sprites import SpriteEngine
+
+from helpers import make_gameboy
+
+OAM = MemoryLocations.sprite_attrib_mem_addr
+VRAM = MemoryLocations.video_ram_addr
+
+LCDC_8X8 = SpriteEngine.LCDC_OBJ_ENABLE
+LCDC_8X16 = SpriteEngine.LCDC_OBJ_ENABLE | SpriteEngine.LCDC_OBJ_SIZE
+
+# Background shade left in the frame line before the sprites are drawn
+BG_SHADE = 2
+
+
+class SpriteTestCase(unittest.TestCase):
+    def setUp(self):
+        self.gb = make_gameboy()
+        self.memory = self.gb.memory
+        self.sprites = self.gb.video.sprites
+        # Hide every sprite, then identity palette so shades equal color indices
+        self.memory.mem[OAM:OAM + 40 * SpriteEngine.OAM_ENTRY_SIZE] = bytes(40 * SpriteEngine.OAM_ENTRY_SIZE)
+        self.memory.mem[SpriteEngine.OBP0_ADDR] = 0xE4
+        self.memory.oam_dirty = True
+
+    def set_sprite(self, index, y, x, tile=0, attributes=0):
+        address = OAM + index * SpriteEngine.OAM_ENTRY_SIZE
+        self.memory.mem[address:address + 4] = bytes((y, x, tile, attributes))
+        self.memory.oam_dirty = True
+
+    def set_tile_row(self, tile, row, low, high):
+        address = VRAM + tile * 16 + row * 2
+        self.memory.mem[address:address + 2] = bytes((low, high))
+
+    def render(self, ly, lcdc=LCDC_8X8, bg_line=None):
+        self.sprites.update(lcdc)
+        frame_line = bytearray([BG_SHADE] * 160)
+        self.sprites.render_line(ly, lcdc, frame_line, bg_line or bytes(160))
+        return list(frame_line[:8])
+
+
+class LineTableTest(SpriteTestCase):
+    def test_ten_per_line_in_oam_order(self):
+        # Twelve sprites on line 0, the last two in OAM order are dropped even though they have the lowest X
+        for index in range(12):
+            self.set_sprite(index, 16, 100 - index * 8)
+        self.sprites.update(LCDC_8X8)
+        self.assertEqual(sorted(self.sprites.line_table[0]), list(range(10)))
+
+    def test_off_screen_x_still_counts(self):
+        self.set_sprite(0, 16, 0)
+        for index in range(1, 11):
+            self.set_sprite(index, 16, 8 + index)
+        self.sprites.update(LCDC_8X8)
+        self.assertEqual(len(self.sprites.line_table[0]), 10)
+        self.assertIn(0, self.sprites.line_table[0])
+        self.assertNotIn(10, self.sprites.line_table[0])
+
+    def test_priority_order(self):
+        # Drawn lowest priority first, lower X wins and the lower index breaks ties
+        self.set_sprite(0, 16, 30)
+        self.set_sprite(1, 16, 10)
+        self.set_sprite(2, 16, 30)
+        self.set_sprite(3, 16, 10)
+        self.sprites.update(LCDC_8X8)
+        self.assertEqual(self.sprites.line_table[0], (2, 0, 3, 1))
+
+    def test_sprite_height(self):
+        self.set_sprite(0, 20, 8)
+        self.sprites.update(LCDC_8X8)
+        self.assertEqual([ly for ly in range(20) if self.sprites.line_table[ly]], list(range(4, 12)))
+
+        # Switching the size rebuilds the table without OAM changing
+        self.sprites.update(LCDC_8X16)
+        self.assertEqual([ly for ly in range(30) if self.sprites.line_table[ly]], list(range(4, 20)))
+
+    def test_partially_above_screen(self):
+        self.set_sprite(0, 4, 8)
+        self.sprites.update(LCDC_8X16)
+        self.assertEqual([ly for ly in range(20) if self.sprites.line_table[ly]], list(range(0, 4)))
+
+    def test_oam_write_marks_dirty(self):
+        self.sprites.update(LCDC_8X8)
+        self.assertFalse(self.memory.oam_dirty)
+        self.assertEqual(self.sprites.line_table[0], ())
+
+        self.memory.write_byte(OAM, 16)
+        self.memory.write_byte(OAM + 1, 8)
+        self.assertTrue(self.memory.oam_dirty)
+        self.sprites.update(LCDC_8X8)
+        self.assertEqual(self.sprites.line_table[0], (0,))
+
+    def test_dma_marks_dirty(self):
+        self.sprites.update(LCDC_8X8)
+        source = MemoryLocations.internal_ram_addr
+        self.memory.mem[source:source + 8] = bytes((0, 0, 0, 0, 16, 8, 0, 0))
+        self.memory.write_byte(0xFF46, source >> 8)
+        self.assertTrue(self.memory.oam_dirty)
+        self.sprites.update(LCDC_8X8)
+        self.assertEqual(self.sprites.line_table[0], (1,))
+
+
+class RenderLineTest(SpriteTestCase):
+    def setUp(self):
+        super().setUp()
+        # Tile 1: left half color 1 on the first row, color 2 across the last row
+        self.set_tile_row(1, 0, 0xF0, 0x00)
+        self.set_tile_row(1, 7, 0x00, 0xFF)
+        self.set_sprite(0, 16, 8, tile=1)
+
+    def test_color_0_is_transparent(self):
+        self.assertEqual(self.render(0), [1, 1, 1, 1, 2, 2, 2, 2])
+
+    def test_x_flip(self):
+        self.set_sprite(0, 16, 8, tile=1, attributes=SpriteEngine.ATTR_X_FLIP)
+        self.assertEqual(self.render(0), [2, 2, 2, 2, 1, 1, 1, 1])
+
+    def test_y_flip(self):
+        self.set_sprite(0, 16, 8, tile=1, attributes=SpriteEngine.ATTR_Y_FLIP)
+        self.memory.mem[SpriteEngine.OBP0_ADDR] = 0x0C  # color 1 as shade 3 to tell it from the background
+        self.assertEqual(self.render(0), [0] * 8)
+        self.assertEqual(self.render(7), [3, 3, 3, 3, 2, 2, 2, 2])
+
+    def test_behind_background(self):
+        self.set_sprite(0, 16, 8, tile=1, attributes=SpriteEngine.ATTR_BG_PRIORITY)
+        bg_line = bytes([1, 0, 3, 0] + [0] * 156)
+        self.assertEqual(self.render(0, bg_line=bg_line), [2, 1, 2, 1, 2, 2, 2, 2])
+
+    def test_objects_disabled(self):
+        self.sprites.update(LCDC_8X8)
+        frame_line = bytearray([BG_SHADE] * 160)
+        self.sprites.render_line(0, 0, frame_line, bytes(160))
+        self.assertEqual(frame_line, bytearray([BG_SHADE] * 160))
+
+    def test_8x16_ignores_tile_low_bit(self):
+        # Tile 3 in 8x16 mode is drawn from tiles 2 and 3
+        self.set_tile_row(2, 0, 0xFF, 0xFF)
+        self.set_tile_row(3, 0, 0x0F, 0x00)
+        self.set_sprite(0, 16, 8, tile=3)
+        self.assertEqual(self.render(0, lcdc=LCDC_8X16), [3] * 8)
+        self.assertEqual(self.render(8, lcdc=LCDC_8X16), [2, 2, 2, 2, 1, 1, 1, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.state import SaveState, SaveStateException
+from pygb.utility import GBTypes
+
+from helpers import make_gameboy
+
+
+class SaveStateTest(unittest.TestCase):
+    def test_round_trip(self):
+        gb = make_gameboy()
+        gb.run_frames(2)
+        state = gb.save_state()
+        self.assertEqual(len(state), SaveState.SIZE)
+
+        gb.run_frames(3)
+        expected = bytes(gb.save_state())
+
+        gb.load_state(state)
+        self.assertEqual(gb.save_state(), state)
+        gb.run_frames(3)
+        self.assertEqual(gb.save_state(), expected)
+
+    def test_round_trip_color(self):
+        gb = make_gameboy(gb_type=GBTypes.gameboy_color, is_color=True)
+        gb.run_frames(1)
+        state = gb.save_state()
+        gb.run_frames(2)
+        expected = bytes(gb.save_state())
+
+        gb.load_state(state)
+        gb.run_frames(2)
+        self.assertEqual(gb.save_state(), expected)
+
+    def test_load_keeps_run_limit(self):
+        gb = make_gameboy()
+        gb.run_frames(1)
+        state = gb.save_state()
+        gb.run_frames(1)
+
+        loads = []
+
+        def load_once():
+            if not loads:
+                loads.append(gb.cpu.cycles)
+                gb.load_state(state)
+
+        # Loading from a frame handler happens inside the scheduler, while it is running due events
+        gb.video.frame_handlers.append(load_once)
+        result = gb.run_cycles(200000)
+        gb.video.frame_handlers.remove(load_once)
+
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(result.stop_reason, result.STOP_CYCLES)
+        self.assertGreaterEqual(result.cycles, 200000)
+        self.assertLess(result.cycles, 200000 + 32)
+
+    def test_load_inside_run_matches_fresh_load(self):
+        gb = make_gameboy()
+        gb.run_frames(1)
+        state = bytes(gb.save_state())
+
+        loads = []
+
+        def load_once():
+            if not loads:
+                loads.append(gb.cpu.cycles)
+                gb.load_state(state)
+
+        gb.video.frame_handlers.append(load_once)
+        gb.run_frames(3)
+        gb.video.frame_handlers.remove(load_once)
+
+        other = make_gameboy()
+        other.load_state(state)
+        other.run_frames(2)
+        self.assertEqual(gb.memory.mem, other.memory.mem)
+        self.assertEqual(gb.cpu.registers.get_pc(), other.cpu.registers.get_pc())
+        self.assertEqual(gb.video.frame_count, other.video.frame_count)
+
+    def test_load_keeps_foreign_events(self):
+        gb = make_gameboy()
+        state = gb.save_state()
+        fired = []
+        event = gb.scheduler.schedule(gb.cpu.cycles + 1000, fired.append)
+        gb.run_cycles(500)
+        gb.load_state(state)
+        self.assertTrue(event[gb.scheduler.EVENT_ACTIVE])
+        gb.run_cycles(600)
+        self.assertEqual(len(fired), 1)
+
+    def test_rejects_other_rom(self):
+        state = make_gameboy().save_state()
+        other = make_gameboy('start:\n    JP start\n', title='other')
+        with self.assertRaises(SaveStateException):
+            other.load_state(state)
+
+    def test_rejects_truncated(self):
+        gb = make_gameboy()
+        with self.assertRaises(SaveStateException):
+            gb.load_state(gb.save_state()[:100])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,261 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import base64
+import struct
+import asyncio
+import hashlib
+import unittest
+
+from pygb.aio import Subscription
+from pygb.stream import MessageTypes, StreamException, FrameDecoder, FrameStreamServer, encode_delta, \
+    pack_message, write_varint, read_varint, websocket_frame, read_websocket_frame, websocket_handshake, \
+    WEBSOCKET_GUID, MAX_CLIENT_PAYLOAD
+
+FRAME_SIZE = 160 * 144
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(asyncio.wait_for(coroutine, 10))
+    finally:
+        loop.close()
+
+
+def make_reader(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+class FakeWriter:
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+
+def masked_frame(payload, opcode=0x2, mask=b'\x11\x22\x33\x44'):
+    """
+    A client to server WebSocket frame, which is always masked
+    """
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, 0x80 | length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+    return header + mask + bytes(byte ^ mask[i & 3] for i, byte in enumerate(payload))
+
+
+async def read_server_message(reader):
+    message_type = (await reader.readexactly(1))[0]
+    header = bytearray()
+    while True:
+        header += await reader.readexactly(1)
+        if not header[-1] & 0x80:
+            break
+    length, _ = read_varint(header, 0)
+    return message_type, await reader.readexactly(length)
+
+
+class VarintTest(unittest.TestCase):
+    def test_round_trip(self):
+        for value in (0, 1, 0x7F, 0x80, 0x3FFF, 0x4000, 1 << 35):
+            out = bytearray(b'\xAA')
+            write_varint(out, value)
+            self.assertEqual(read_varint(out, 1), (value, len(out)))
+
+    def test_encoding(self):
+        out = bytearray()
+        write_varint(out, 300)
+        self.assertEqual(out, b'\xAC\x02')
+
+
+class DeltaTest(unittest.TestCase):
+    def setUp(self):
+        self.first = os.urandom(FRAME_SIZE)
+        self.decoder = FrameDecoder()
+        self.decoder.apply(MessageTypes.KEYFRAME, self.first)
+
+    def test_unchanged(self):
+        self.assertEqual(encode_delta(self.first, self.first), (MessageTypes.UNCHANGED, b''))
+        self.assertEqual(self.decoder.apply(MessageTypes.UNCHANGED, b''), self.first)
+
+    def test_delta(self):
+        frame = bytearray(self.first)
+        frame[0] ^= 0xFF
+        frame[1000:1010] = bytes(10)
+        frame[-1] ^= 0x01
+        message_type, payload = encode_delta(self.first, bytes(frame))
+        self.assertEqual(message_type, MessageTypes.DELTA)
+        self.assertLess(len(payload), 40)
+        self.assertEqual(self.decoder.apply(message_type, payload), frame)
+
+    def test_keyframe_fallback(self):
+        frame = bytes(byte ^ 0x01 for byte in self.first)
+        message_type, payload = encode_delta(self.first, frame)
+        self.assertEqual(message_type, MessageTypes.KEYFRAME)
+        self.assertEqual(self.decoder.apply(message_type, payload), frame)
+
+    def test_delta_before_keyframe(self):
+        with self.assertRaises(StreamException):
+            FrameDecoder().apply(MessageTypes.DELTA, b'\x00\x01\x01')
+
+    def test_hello(self):
+        decoder = FrameDecoder()
+        self.assertIsNone(decoder.apply(MessageTypes.HELLO, struct.pack('<HH', 160, 144)))
+        self.assertEqual((decoder.width, decoder.height), (160, 144))
+
+    def test_pack_message(self):
+        self.assertEqual(pack_message(MessageTypes.DELTA, bytes(200)), b'\x02\xC8\x01' + bytes(200))
+
+
+class WebSocketTest(unittest.TestCase):
+    def test_server_frame_lengths(self):
+        self.assertEqual(websocket_frame(b'ab'), b'\x82\x02ab')
+        self.assertEqual(websocket_frame(bytes(300))[:4], b'\x82\x7E\x01\x2C')
+        self.assertEqual(websocket_frame(bytes(0x10000))[:10], b'\x82\x7F' + struct.pack('!Q', 0x10000))
+
+    def test_read_masked_frame(self):
+        opcode, payload = run(read_websocket_frame(make_reader(masked_frame(b'\x10\x05'))))
+        self.assertEqual((opcode, payload), (0x2, b'\x10\x05'))
+
+    def test_read_closed(self):
+        self.assertEqual(run(read_websocket_frame(make_reader(b'\x82'))), (None, None))
+
+    def test_payload_cap(self):
+        # The length alone is enough to refuse it, the payload is never waited for
+        header = struct.pack('!BBQ', 0x82, 0xFF, 1 << 40) + b'\x00\x00\x00\x00'
+        with self.assertRaises(StreamException):
+            run(read_websocket_frame(make_reader(header)))
+        with self.assertRaises(StreamException):
+            run(read_websocket_frame(make_reader(masked_frame(bytes(MAX_CLIENT_PAYLOAD + 1)))))
+
+    def test_handshake(self):
+        key = b'dGhlIHNhbXBsZSBub25jZQ=='
+        reader = make_reader(b'Host: localhost\r\nSec-WebSocket-Key: ' + key + b'\r\n\r\n')
+        writer = FakeWriter()
+        run(websocket_handshake(reader, writer, b'GET / HTTP/1.1\r\n'))
+        self.assertTrue(writer.data.startswith(b'HTTP/1.1 101'))
+        # The example from RFC 6455
+        self.assertIn(b'Sec-WebSocket-Accept: s3pPLMBiTxaQ9kYGzzhZRbK+xOo=\r\n', writer.data)
+        self.assertEqual(base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest()),
+                         b's3pPLMBiTxaQ9kYGzzhZRbK+xOo=')
+
+    def test_handshake_without_key(self):
+        writer = FakeWriter()
+        with self.assertRaises(StreamException):
+            run(websocket_handshake(make_reader(b'Host: localhost\r\n\r\n'), writer, b'GET / HTTP/1.1\r\n'))
+        self.assertTrue(writer.data.startswith(b'HTTP/1.1 400'))
+
+
+class FakeSession:
+    """
+    The parts of AsyncGameBoy the server uses, frames are pushed by the test
+    """
+    def __init__(self):
+        self.subscription = None
+        self.inputs = []
+
+    def frames(self):
+        self.subscription = Subscription(self, 4)
+        return self.subscription
+
+    def unsubscribe(self, subscription):
+        pass
+
+    def send_input(self, buttons):
+        self.inputs.append(buttons)
+
+
+class FrameStreamServerTest(unittest.TestCase):
+    def setUp(self):
+        self.session = FakeSession()
+
+    async def wait_for_inputs(self, count):
+        while len(self.session.inputs) < count:
+            await asyncio.sleep(0.01)
+
+    def test_tcp_client(self):
+        async def scenario():
+            server = await FrameStreamServer(self.session).start()
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+                writer.write(b'PYGB\n')
+                self.assertEqual(await read_server_message(reader), (MessageTypes.HELLO, struct.pack('<HH', 160, 144)))
+
+                decoder = FrameDecoder()
+                first = os.urandom(FRAME_SIZE)
+                self.session.subscription.put(first)
+                message = await read_server_message(reader)
+                self.assertEqual(message[0], MessageTypes.KEYFRAME)
+                self.assertEqual(decoder.apply(*message), first)
+
+                second = b'\x00' + first[1:]
+                self.session.subscription.put(second)
+                message = await read_server_message(reader)
+                self.assertEqual(message[0], MessageTypes.DELTA)
+                self.assertEqual(decoder.apply(*message), second)
+
+                writer.write(bytes((MessageTypes.INPUT, 0x05)))
+                await self.wait_for_inputs(1)
+                self.assertEqual(self.session.inputs, [0x05])
+                writer.close()
+            finally:
+                await server.close()
+        run(scenario())
+
+    def test_websocket_client(self):
+        async def scenario():
+            server = await FrameStreamServer(self.session).start()
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+                writer.write(b'GET / HTTP/1.1\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n\r\n')
+                self.assertTrue((await reader.readuntil(b'\r\n\r\n')).startswith(b'HTTP/1.1 101'))
+                opcode, payload = await read_websocket_frame(reader, max_length=1 << 20)
+                self.assertEqual(payload[0], MessageTypes.HELLO)
+
+                writer.write(masked_frame(bytes((MessageTypes.INPUT, 0x81))))
+                await self.wait_for_inputs(1)
+                self.assertEqual(self.session.inputs, [0x81])
+
+                # An oversized frame drops the connection
+                writer.write(struct.pack('!BBQ', 0x82, 0xFF, 1 << 40) + b'\x00\x00\x00\x00')
+                self.assertEqual(await reader.read(), b'')
+            finally:
+                await server.close()
+        run(scenario())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import unittest
+
+from pygb.batch import BatchJob, run_batch
+from pygb import testing
+
+from helpers import write_rom
+
+# Writes a blargg style report to cartridge ram, status 0 for passed, then spins
+REPORT_SOURCE = """
+start:
+    LD HL, 0x0000
+    LD B, 0x0A
+    LD (HL), B
+    LD HL, 0xA001
+    LD B, 0xDE
+    LD (HL), B
+    INC L
+    LD B, 0xB0
+    LD (HL), B
+    INC L
+    LD B, 0x61
+    LD (HL), B
+    INC L
+    LD B, 0x4F
+    LD (HL), B
+    INC L
+    LD B, 0x4B
+    LD (HL), B
+    LD HL, 0xA000
+    LD B, {status}
+    LD (HL), B
+done:
+    JP done
+"""
+
+HUNG_SOURCE = """
+start:
+    JP start
+"""
+
+
+def run_crashing_test_rom(job):
+    """
+    Runner whose worker process dies on roms named crash
+    """
+    if os.path.basename(job.rom).startswith('crash'):
+        os._exit(1)
+    return testing.run_test_rom(job)
+
+
+class RunTestsTest(unittest.TestCase):
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+
+    def make_rom(self, source):
+        path = write_rom(source, cart_type=0x03, ram_size=0x02)
+        self.paths.append(path)
+        return path
+
+    def test_outcomes(self):
+        roms = [self.make_rom(REPORT_SOURCE.format(status='0x00')),
+                self.make_rom(REPORT_SOURCE.format(status='0x01')),
+                self.make_rom(HUNG_SOURCE)]
+        results = testing.run_tests(roms, max_cycles=4194304, workers=2)
+        self.assertEqual([result.outcome for result in results],
+                         [testing.TestResult.OUTCOME_PASSED, testing.TestResult.OUTCOME_FAILED, testing.TestResult.OUTCOME_HUNG])
+        self.assertEqual(results[0].message, 'OK')
+
+    def test_missing_rom(self):
+        results = testing.run_tests([os.path.join(os.path.dirname(__file__), 'missing.gb')], max_cycles=1000, workers=1)
+        self.assertEqual(results[0].outcome, testing.TestResult.OUTCOME_ERROR)
+
+    def test_crash_only_fails_its_rom(self):
+        passing = self.make_rom(REPORT_SOURCE.format(status='0x00'))
+        jobs = [BatchJob(passing, max_cycles=4194304), BatchJob('crash.gb', max_cycles=4194304),
+                BatchJob(passing, max_cycles=4194304)]
+        results = run_batch(jobs, workers=2, max_retries=1, runner=run_crashing_test_rom, result_type=testing.TestResult)
+        self.assertEqual([result.outcome for result in results],
+                         [testing.TestResult.OUTCOME_PASSED, testing.TestResult.OUTCOME_ERROR, testing.TestResult.OUTCOME_PASSED])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import unittest
+
+from pygb.cpu.timer import Timer
+from pygb.cpu.interrupt import Interrupts
+
+from helpers import make_gameboy
+
+
+class TimerTest(unittest.TestCase):
+    def setUp(self):
+        self.gb = make_gameboy()
+        self.cpu = self.gb.cpu
+        self.timer = self.gb.timer
+        self.mem = self.gb.memory.mem
+
+        # Start from a fresh divider so tick boundaries fall on multiples of the period
+        self.timer.write_div(Timer.DIV_ADDR, 0)
+        self.mem[Interrupts.INTERRUPT_FLAG_ADDR] &= ~Interrupts.INTERRUPT_TIMER
+        self.base = self.cpu.cycles
+
+    def advance(self, cycles):
+        self.cpu.cycles += cycles
+        self.gb.scheduler.run_due(self.cpu.cycles)
+
+    def timer_requested(self):
+        return bool(self.mem[Interrupts.INTERRUPT_FLAG_ADDR] & Interrupts.INTERRUPT_TIMER)
+
+    def test_div(self):
+        self.assertEqual(self.timer.read_div(Timer.DIV_ADDR), 0)
+        self.advance(255)
+        self.assertEqual(self.timer.read_div(Timer.DIV_ADDR), 0)
+        self.advance(1)
+        self.assertEqual(self.timer.read_div(Timer.DIV_ADDR), 1)
+        self.advance(256 * 300)
+        self.assertEqual(self.timer.read_div(Timer.DIV_ADDR), 301 & 0xFF)
+
+        self.timer.write_div(Timer.DIV_ADDR, 0x12)
+        self.assertEqual(self.timer.read_div(Timer.DIV_ADDR), 0)
+
+    def test_tima_counts(self):
+        timer = self.timer
+        timer.write_tima(Timer.TIMA_ADDR, 0x10)
+        timer.write_tac(Timer.TAC_ADDR, Timer.TAC_ENABLE | 0x01)
+        self.advance(15)
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 0x10)
+        self.advance(1)
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 0x11)
+        self.advance(16 * 4)
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 0x15)
+
+        # Stopped, it holds its value
+        timer.write_tac(Timer.TAC_ADDR, 0x01)
+        self.advance(16 * 4)
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 0x15)
+
+    def test_overflow(self):
+        timer = self.timer
+        timer.write_tma(Timer.TMA_ADDR, 0x80)
+        timer.write_tima(Timer.TIMA_ADDR, 0xFE)
+        timer.write_tac(Timer.TAC_ADDR, Timer.TAC_ENABLE | 0x01)
+        self.assertEqual(timer.next_overflow, self.base + 32)
+        self.assertEqual(self.gb.scheduler.deadline, timer.next_overflow)
+
+        self.advance(31)
+        self.assertFalse(self.timer_requested())
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 0xFF)
+        self.advance(1)
+        self.assertTrue(self.timer_requested())
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 0x80)
+
+        # Reloads from TMA every time round
+        self.assertEqual(timer.next_overflow, self.base + 32 + 0x80 * 16)
+        self.advance(0x80 * 16 + 16)
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 0x81)
+
+    def test_overflow_not_yet_handled(self):
+        """
+        Reading TIMA past an overflow the scheduler has not run yet still counts on from TMA
+        """
+        timer = self.timer
+        timer.write_tma(Timer.TMA_ADDR, 0xF0)
+        timer.write_tima(Timer.TIMA_ADDR, 0xFF)
+        timer.write_tac(Timer.TAC_ADDR, Timer.TAC_ENABLE | 0x01)
+        self.cpu.cycles += 16 * 3
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 0xF2)
+
+    def test_reconfigure_keeps_count(self):
+        timer = self.timer
+        timer.write_tac(Timer.TAC_ADDR, Timer.TAC_ENABLE | 0x01)
+        self.advance(16 * 5)
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 5)
+
+        # Changing the clock pins the current value and reschedules the overflow
+        timer.write_tac(Timer.TAC_ADDR, Timer.TAC_ENABLE | 0x02)
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 5)
+        self.advance(64)
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 6)
+
+        # Ticks come off the divider, the first one at the new clock was at 128, not 64 cycles after the switch
+        self.assertEqual(timer.next_overflow, self.base + 128 + 64 * (0x100 - 6))
+
+    def test_double_speed(self):
+        timer = self.timer
+        self.cpu.set_double_speed(True)
+        timer.write_tac(Timer.TAC_ADDR, Timer.TAC_ENABLE | 0x01)
+        self.advance(8)
+        self.assertEqual(timer.read_tima(Timer.TIMA_ADDR), 1)
+        self.cpu.set_double_speed(False)
+
+
+if __name__ == '__main__':
+    unittest.main()
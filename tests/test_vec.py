@@ -0,0 +1,65 @@
+"""
+GameBoy Emulator Written in Python
+
+MIT License
+
+Copyright (c) 2017 Ryan Sheffer
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import unittest
+
+from pygb.vec import VecGameBoy, VecGameBoyException
+
+from helpers import write_rom, COUNTER_SOURCE
+
+
+class VecGameBoyTest(unittest.TestCase):
+    def setUp(self):
+        self.rom = write_rom(COUNTER_SOURCE)
+
+    def tearDown(self):
+        os.remove(self.rom)
+
+    def test_step_in_lockstep(self):
+        with VecGameBoy(self.rom, num_envs=2, ram_ranges=((0xC000, 0xC100),)) as env:
+            frames, ram_views, infos = env.reset()
+            self.assertEqual(len(frames), 2)
+            self.assertEqual(len(ram_views[0]), 0x100)
+
+            for _ in range(3):
+                frames, ram_views, infos = env.step([0, 0])
+            self.assertEqual([info['frame'] for info in infos], [3, 3])
+            self.assertEqual(bytes(ram_views[0]), bytes(ram_views[1]))
+            self.assertNotEqual(bytes(ram_views[0]), bytes(0x100))
+
+    def test_wrong_action_count(self):
+        with VecGameBoy(self.rom, num_envs=2) as env:
+            with self.assertRaises(VecGameBoyException):
+                env.step([0])
+
+    def test_invalid_ram_range(self):
+        with self.assertRaises(VecGameBoyException):
+            VecGameBoy(self.rom, ram_ranges=((0xE000, 0xC000),))
+
+
+if __name__ == '__main__':
+    unittest.main()